@@ -1,6 +1,43 @@
 import pytest
 import sys
 import os
+import time
 
 # Add the project root to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from quantum_crypto.classical_integration.network import Network
+from quantum_crypto.classical_integration.node import Node
+from quantum_crypto.classical_integration.storage import FileStorage
+
+def wait_for(condition, timeout=10.0):
+    """Poll `condition` until it holds or `timeout` seconds pass; returns its last value."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+def make_network(tmp_path, name, **options):
+    """A `Network` for a fresh node stored in `tmp_path`, not yet started."""
+    return Network(Node(storage=FileStorage(str(tmp_path / f'{name}.json'))), **options)
+
+@pytest.fixture
+def start_network(tmp_path):
+    """
+    Make networks that listen on a free localhost port (or with
+    `listen=False` only dial out); all are stopped after the test.
+    """
+    started = []
+
+    def start(name, listen=True, **options):
+        network = make_network(tmp_path, name, **options)
+        started.append(network)
+        if listen:
+            network.start_server(host='127.0.0.1', port=0)
+        return network
+
+    yield start
+    for network in started:
+        network.stop_server()
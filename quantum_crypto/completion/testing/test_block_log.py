@@ -0,0 +1,218 @@
+import json
+import os
+import pytest
+from quantum_crypto.classical_integration import sorted_index
+from quantum_crypto.classical_integration.block_index import HASH_ENTRY
+from quantum_crypto.classical_integration.block_log import BlockLog, FSYNC_NEVER, segment_name
+from quantum_crypto.classical_integration.sorted_index import SortedIndex
+from quantum_crypto.classical_integration.storage import Storage
+
+def _block(proof):
+    return {'transactions': [{'sender': 'alice', 'receiver': 'bob', 'amount': 10, 'signature': 'sig'}],
+            'quantum_proof': proof, 'timestamp': 1, 'previous_hash': 'prev'}
+
+def test_append_and_read(tmp_path):
+    """Test records round-trip through the log"""
+    log = BlockLog(str(tmp_path))
+    position = log.append(b"first")
+    log.append(b"second")
+    assert log.read(*position) == b"first"
+    assert list(log) == [b"first", b"second"]
+    assert log.count == 2
+    log.close()
+
+def test_torn_tail_is_truncated(tmp_path):
+    """Test recovery drops a partially written record"""
+    log = BlockLog(str(tmp_path))
+    log.append(b"complete")
+    log.close()
+    with open(os.path.join(str(tmp_path), segment_name(0)), 'ab') as f:
+        f.write(b"\x00\x00\x00\x20torn")
+
+    reopened = BlockLog(str(tmp_path))
+    assert list(reopened) == [b"complete"]
+    reopened.append(b"next")
+    assert list(reopened) == [b"complete", b"next"]
+    reopened.close()
+
+def test_segment_rollover(tmp_path):
+    """Test the log rolls into new segments past the size limit"""
+    log = BlockLog(str(tmp_path), fsync_policy=FSYNC_NEVER, segment_size=32)
+    for i in range(5):
+        log.append(b"x" * 20 + bytes([i]))
+    assert len(log.segments) > 1
+    log.close()
+    assert BlockLog(str(tmp_path)).count == 5
+
+def test_invalid_fsync_policy(tmp_path):
+    with pytest.raises(ValueError):
+        BlockLog(str(tmp_path), fsync_policy='sometimes')
+
+def test_legacy_json_import(tmp_path):
+    """Test a legacy blockchain.json is imported once"""
+    legacy_file = str(tmp_path / 'blockchain.json')
+    with open(legacy_file, 'w') as f:
+        json.dump([_block('proof0'), _block('proof1')], f, indent=4)
+
+    storage = Storage(legacy_file)
+    assert [b['block_height'] for b in storage.get_blockchain()] == [0, 1]
+    assert storage.get_last_block_hash() == 'proof1'
+    storage.append_block(_block('proof2'))
+    storage.close()
+
+    reopened = Storage(legacy_file)
+    assert len(reopened.get_blockchain()) == 3
+    assert reopened.get_last_block_hash() == 'proof2'
+
+def test_interrupted_legacy_import_resumes(tmp_path, monkeypatch):
+    """Test a crash part-way through the legacy import is finished on the next start"""
+    legacy_file = str(tmp_path / 'blockchain.json')
+    with open(legacy_file, 'w') as f:
+        json.dump([_block(f'proof{i}') for i in range(4)], f, indent=4)
+
+    write_block = Storage._write_block
+    def crash_at_third(self, block):
+        if block['block_height'] == 2:
+            raise OSError("power lost")
+        write_block(self, block)
+    monkeypatch.setattr(Storage, '_write_block', crash_at_third)
+    with pytest.raises(OSError):
+        Storage(legacy_file)
+    monkeypatch.undo()
+
+    storage = Storage(legacy_file)
+    assert [b['quantum_proof'] for b in storage.get_blockchain()] == [f'proof{i}' for i in range(4)]
+    assert not storage.tip.importing
+    storage.close()
+    assert len(Storage(legacy_file).get_blockchain()) == 4
+
+def test_block_lookup_by_height_and_hash(tmp_path):
+    """Test random access through the height and hash indexes"""
+    storage = Storage(str(tmp_path / 'chain.json'))
+    for i in range(5):
+        storage.append_block(_block(f'proof{i}'))
+
+    assert storage.get_block_by_height(3)['quantum_proof'] == 'proof3'
+    assert storage.get_block_by_height(5) is None
+    assert storage.get_block_by_hash('proof2')['block_height'] == 2
+    assert storage.get_block_by_hash('missing') is None
+    assert [b['block_height'] for b in storage.iter_blocks(1, 4)] == [1, 2, 3]
+    assert [b['block_height'] for b in storage.iter_blocks(3)] == [3, 4]
+
+def test_index_rebuilt_after_loss(tmp_path):
+    """Test indexes catch up with the log when their files lag behind"""
+    storage = Storage(str(tmp_path / 'chain.json'))
+    for i in range(3):
+        storage.append_block(_block(f'proof{i}'))
+    storage.close()
+    os.remove(str(tmp_path / 'chain.chain' / 'heights.idx'))
+    os.remove(str(tmp_path / 'chain.chain' / 'hashes.idx'))
+
+    reopened = Storage(str(tmp_path / 'chain.json'))
+    assert reopened.get_block_by_hash('proof1')['block_height'] == 1
+    assert reopened.get_block_by_height(2)['quantum_proof'] == 'proof2'
+
+def test_hash_index_is_read_from_runs(tmp_path, monkeypatch):
+    """Test opening keeps only the unsorted tail of the hash index in memory"""
+    monkeypatch.setattr(sorted_index, 'TAIL_LIMIT', 4)
+    storage = Storage(str(tmp_path / 'chain.json'))
+    for i in range(20):
+        storage.append_block(_block(f'proof{i}'))
+    storage.close()
+
+    reopened = Storage(str(tmp_path / 'chain.json'))
+    hashes = reopened.index._hashes
+    assert hashes.count - hashes.covered < 4
+    assert [reopened.height_of(f'proof{i}') for i in range(20)] == list(range(20))
+    assert reopened.height_of('missing') is None
+
+def test_sorted_index_truncates_across_runs(tmp_path, monkeypatch):
+    """Test truncation cuts into a run and leftovers of a crashed compaction are dropped"""
+    monkeypatch.setattr(sorted_index, 'TAIL_LIMIT', 4)
+    path = str(tmp_path / 'keys.idx')
+    index = SortedIndex(path, HASH_ENTRY)
+    for height in range(20):
+        index.append([(height % 3, height)])
+        index.compact()
+    index.truncate(9)
+    assert index.find(0) == [(0, 0), (0, 3), (0, 6)]
+    assert index.last(2) == (2, 8)
+    index.close()
+    open(path + '.0-4.run.tmp', 'wb').close()
+    open(path + '.50-60.run', 'wb').close()
+
+    reopened = SortedIndex(path, HASH_ENTRY)
+    assert reopened.count == 9
+    assert reopened.find(1, 1) == [(1, 4), (1, 7)]
+    assert reopened.count_of(2) == 3 and reopened.last(3) is None
+    assert not [name for name in os.listdir(str(tmp_path)) if name.endswith('.tmp') or '50-60' in name]
+
+def test_chain_tip_survives_restart(tmp_path):
+    """Test the tip record is kept in step with appends and restored on open"""
+    storage = Storage(str(tmp_path / 'chain.json'))
+    assert storage.get_tip() == {'height': -1, 'hash': 'GENESIS_HASH', 'timestamp': None}
+    for i in range(3):
+        storage.append_block(_block(f'proof{i}'))
+    assert storage.get_tip()['height'] == 2
+    storage.close()
+
+    reopened = Storage(str(tmp_path / 'chain.json'))
+    assert reopened.get_tip() == {'height': 2, 'hash': 'proof2', 'timestamp': 1}
+    assert reopened.append_block(_block('proof3'))['block_height'] == 3
+
+def test_stale_tip_is_rebuilt(tmp_path):
+    """Test a tip record lagging behind the log is repaired on open"""
+    storage = Storage(str(tmp_path / 'chain.json'))
+    storage.append_block(_block('proof0'))
+    tip_path = str(tmp_path / 'chain.chain' / 'tip.json')
+    with open(tip_path) as f:
+        stale_tip = f.read()
+    storage.append_block(_block('proof1'))
+    storage.close()
+    with open(tip_path, 'w') as f:
+        f.write(stale_tip)
+
+    reopened = Storage(str(tmp_path / 'chain.json'))
+    assert reopened.get_last_block_hash() == 'proof1'
+    assert reopened.log.count == 2
+
+def test_mapped_scan(tmp_path):
+    """Test the mmap scan yields lazy views over every stored block"""
+    storage = Storage(str(tmp_path / 'chain.json'))
+    for i in range(3):
+        storage.append_block(_block(f'proof{i}'))
+
+    total = sum(amount for view in storage.scan_blocks() for amount in view.iter_amounts())
+    assert total == 30
+    assert [view.quantum_proof for view in storage.scan_blocks()] == ['proof0', 'proof1', 'proof2']
+
+def test_transaction_index_recovers(tmp_path):
+    """Test the transaction index is rebuilt for blocks it missed"""
+    storage = Storage(str(tmp_path / 'chain.json'))
+    storage.append_block(_block('proof0'))
+    storage.append_block(_block('proof1'))
+    storage.close()
+    os.remove(str(tmp_path / 'chain.chain' / 'txids.idx'))
+
+    reopened = Storage(str(tmp_path / 'chain.json'))
+    assert len(reopened.get_address_history('alice')) == 2
+    assert reopened.tx_index.next_height == 2
+
+def test_transaction_index_is_read_from_runs(tmp_path, monkeypatch):
+    """Test txid and address lookups span run files and the tail, and survive a restart"""
+    monkeypatch.setattr(sorted_index, 'TAIL_LIMIT', 4)
+    storage = Storage(str(tmp_path / 'chain.json'))
+    blocks = [storage.append_block(_block(f'proof{i}')) for i in range(12)]
+    storage.close()
+
+    reopened = Storage(str(tmp_path / 'chain.json'))
+    txids = reopened.tx_index._txids
+    assert txids.count - txids.covered < 4
+    history = reopened.get_address_history('alice', limit=None)
+    assert [entry['block_height'] for entry in history] == list(range(11, -1, -1))
+    assert [entry['block_height'] for entry in reopened.get_address_history('bob', offset=3, limit=2)] == [8, 7]
+    assert reopened.tx_index.history_size('bob') == 12
+    assert reopened.tx_index.next_height == 12
+    reopened.tx_index.truncate(5)
+    assert reopened.tx_index.history_size('alice') == 5
+    assert reopened.tx_index.locate(history[0]['txid']) == (4, 0)  # every block repeats the same transaction
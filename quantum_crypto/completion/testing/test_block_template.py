@@ -0,0 +1,80 @@
+from quantum_crypto.classical_integration import node as node_module
+from quantum_crypto.classical_integration.block_template import BlockTemplate
+from quantum_crypto.classical_integration.mempool import Mempool
+from quantum_crypto.classical_integration.node import Node
+from quantum_crypto.classical_integration.serialization import encode_block
+from quantum_crypto.classical_integration.storage import FileStorage
+from quantum_crypto.classical_integration.transactions import create_transaction
+from quantum_crypto.quantum_currency.quantum_block import compute_block_proof
+from quantum_crypto.quantum_currency.quantum_merkle_tree import build_quantum_merkle_tree
+
+def tx(i, fee=0):
+    return create_transaction(f'sender{i}', 'bob', i + 1, f'sig{i}', fee)
+
+def test_running_totals_match_full_block():
+    """Test the running root, size and fees equal a from-scratch build"""
+    template = BlockTemplate(10)
+    transactions = [tx(i, fee=i) for i in range(7)]
+    for transaction in transactions:
+        assert template.add(transaction)
+    assert not template.add(transactions[0])
+
+    block = template.seal('GENESIS_HASH')
+    assert block['merkle_root'] == build_quantum_merkle_tree([t.txid for t in transactions])
+    assert block['quantum_proof'] == compute_block_proof(block)
+    assert template.fee_total == 21
+    empty = dict(block, transactions=[])
+    assert template.size == len(encode_block(block)) - len(encode_block(empty))
+
+    template.discard([transactions[2]])
+    block = template.seal('GENESIS_HASH')
+    assert template.size == len(encode_block(block)) - len(encode_block(empty))
+
+def test_template_capacity():
+    template = BlockTemplate(2)
+    assert template.add(tx(0)) and template.add(tx(1))
+    assert template.is_full() and not template.add(tx(2))
+
+def test_node_template_follows_fee_priority(tmp_path, monkeypatch):
+    """Test a better arrival displaces the worst entry of a full template, and refills go by fee"""
+    monkeypatch.setattr(node_module, 'BLOCK_SIZE', 2)
+    node = Node(storage=FileStorage(str(tmp_path / 'chain.json')))
+    for i in range(5):
+        node.add_transaction(tx(i, fee=i + 1))
+    assert [t.fee for t in node.template.transactions] == [4, 5]
+
+    assert [t.fee for t in node.create_block()['transactions']] == [4, 5]
+    assert [t.fee for t in node.template.transactions] == [3, 2]
+    assert [t.fee for t in node.create_block()['transactions']] == [3, 2]
+    assert [t.fee for t in node.create_block()['transactions']] == [1]
+    assert len(node.mempool) == 0 and len(node.template) == 0
+
+def test_displacing_keeps_sender_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(node_module, 'BLOCK_SIZE', 3)
+    node = Node(storage=FileStorage(str(tmp_path / 'chain.json')))
+    first = create_transaction('alice', 'bob', 1, 'a1', 1)
+    second = create_transaction('alice', 'bob', 2, 'a2', 50)
+    node.add_transaction(first)
+    node.add_transaction(second)
+    node.add_transaction(tx(0, fee=5))
+    # Dropping alice's cheap first transaction takes her second one out with it
+    node.add_transaction(tx(1, fee=10))
+    assert [t.fee for t in node.template.transactions] == [5, 10]
+    # ... and her next transaction cannot go in ahead of the first
+    node.add_transaction(create_transaction('alice', 'bob', 3, 'a3', 90))
+    assert [t.fee for t in node.template.transactions] == [5, 10]
+    block = node.create_block()
+    assert block['merkle_root'] == build_quantum_merkle_tree([t.txid for t in block['transactions']])
+
+def test_evicted_transactions_are_not_mined(tmp_path):
+    node = Node(storage=FileStorage(str(tmp_path / 'chain.json')), mempool=Mempool(max_count=2))
+    for i, fee in enumerate((1, 5, 9)):
+        node.add_transaction(tx(i, fee=fee))
+    assert [t.fee for t in node.mempool.transactions()] == [5, 9]
+    assert [t.fee for t in node.create_block()['transactions']] == [5, 9]
+
+def test_existing_mempool_seeds_template(tmp_path):
+    node = Node(storage=FileStorage(str(tmp_path / 'a.json')))
+    node.add_transaction(tx(0))
+    restarted = Node(storage=FileStorage(str(tmp_path / 'b.json')), mempool=node.mempool)
+    assert restarted.template.transactions == [tx(0)]
@@ -0,0 +1,114 @@
+import socket
+import pytest
+from quantum_crypto.classical_integration.compact_block import (
+    CompactBlock, PartialBlock, encode_getblocktxn, decode_getblocktxn, encode_blocktxn, decode_blocktxn
+)
+from quantum_crypto.classical_integration.protocol import (
+    ProtocolError, FrameDecoder, encode_message, decode_inv, CMD_CMPCTBLOCK, CMD_GETBLOCKTXN, CMD_GETDATA, INV_BLOCK
+)
+from quantum_crypto.classical_integration.transactions import create_transaction
+from quantum_crypto.quantum_currency.quantum_block import create_quantum_block, verify_block_commitments
+from .conftest import wait_for
+
+def make_block(count):
+    transactions = [create_transaction(f'user{i}', 'bob', i + 1, f'sig{i}') for i in range(count)]
+    block = create_quantum_block(transactions, 'GENESIS_HASH')
+    return block, transactions
+
+def test_compact_block_round_trip():
+    block, _ = make_block(20)
+    compact = CompactBlock.from_block(block, nonce=42)
+    payload = compact.encode()
+    assert len(payload) < 200 + 6 * 20
+    decoded = CompactBlock.decode(payload)
+    assert decoded.nonce == 42 and decoded.short_ids == compact.short_ids
+    assert decoded.header['merkle_root'] == block['merkle_root']
+    with pytest.raises(ProtocolError):
+        CompactBlock.decode(payload[:-1])
+
+def test_rebuild_from_pool_and_missing_transactions():
+    """Test only the transactions absent from the pool need fetching"""
+    block, transactions = make_block(10)
+    pool = transactions[:7] + [create_transaction('eve', 'bob', 1, 'other')]
+    partial = PartialBlock(CompactBlock.decode(CompactBlock.from_block(block).encode()), pool)
+    assert partial.missing() == [7, 8, 9]
+    with pytest.raises(ProtocolError):
+        partial.fill(transactions[7:9])
+    partial.fill(transactions[7:])
+    rebuilt = partial.to_block()
+    assert rebuilt['transactions'] == transactions
+    assert verify_block_commitments(rebuilt)
+
+def test_block_transaction_messages():
+    _, transactions = make_block(3)
+    assert decode_getblocktxn(encode_getblocktxn('QPROOF_x', [0, 5])) == ('QPROOF_x', [0, 5])
+    assert decode_blocktxn(encode_blocktxn('QPROOF_x', transactions)) == ('QPROOF_x', transactions)
+
+def test_block_relayed_compactly(start_network):
+    """Test a peer rebuilds a block from its mempool plus the few transactions it lacked"""
+    peer = start_network('peer')
+    miner = start_network('miner', listen=False)
+    miner.connect_to_peer('127.0.0.1', peer.listen_port)
+    assert wait_for(lambda: len(peer.peers) == 1)
+    relayed = [create_transaction(f'user{i}', 'bob', 1, f'sig{i}') for i in range(30)]
+    for tx in relayed:
+        miner.broadcast_transaction(tx)
+    assert wait_for(lambda: len(peer.node.mempool) == 30)
+    for i in range(2):  # never relayed, so the peer must fetch these
+        miner.node.add_transaction(create_transaction('carol', 'dave', i + 1, f'private{i}'))
+
+    block = miner.node.create_block()
+    miner.broadcast_block(block)
+    assert wait_for(lambda: peer.node.storage.get_tip()['hash'] == block['quantum_proof'])
+    stats = peer.relay_stats
+    assert stats['compact_blocks_received'] == 1
+    assert stats['compact_txs_missing'] == 2
+    assert stats['compact_fallbacks'] == 0
+    assert stats['objects_received'] == 30  # the relayed transactions; the block itself never crossed
+    assert wait_for(lambda: len(peer.node.mempool) == 0)
+
+def silent_announcer(network, block):
+    """A peer that announces `block` compactly and then never answers getblocktxn."""
+    sock = socket.create_connection(('127.0.0.1', network.listen_port))
+    sock.settimeout(5)
+    sock.sendall(encode_message(CMD_CMPCTBLOCK, CompactBlock.from_block(block).encode()))
+    return sock
+
+def read_commands(sock, count):
+    decoder, frames = FrameDecoder(), []
+    while len(frames) < count:
+        frames += decoder.feed(sock.recv(1 << 16))
+    return frames
+
+def test_stalled_blocktxn_falls_back_to_full_block(start_network):
+    """Test a peer that never sends the missing transactions is asked for the full block after the timeout"""
+    receiver = start_network('receiver', blocktxn_timeout=0.2)
+    block, _ = make_block(3)
+    sock = silent_announcer(receiver, block)
+    try:
+        (command, _), = read_commands(sock, 1)
+        assert command == CMD_GETBLOCKTXN
+        (command, payload), = read_commands(sock, 1)
+        assert command == CMD_GETDATA
+        assert decode_inv(payload) == [(INV_BLOCK, block['quantum_proof'].encode())]
+        assert receiver._partial_blocks == {}
+    finally:
+        sock.close()
+
+def test_second_announcer_replaces_a_stalled_partial(start_network):
+    """Test another peer's announcement of a pending block gets the full block from that peer"""
+    receiver = start_network('receiver')
+    holder = start_network('holder', listen=False)
+    block, transactions = make_block(3)
+    for tx in transactions:
+        holder.node.add_transaction(tx)
+    stored = holder.node.receive_block(dict(block))
+    sock = silent_announcer(receiver, block)
+    try:
+        assert wait_for(lambda: len(receiver._partial_blocks) == 1)
+        holder.connect_to_peer('127.0.0.1', receiver.listen_port)
+        holder.broadcast_block(stored)
+        assert wait_for(lambda: receiver.node.storage.get_tip()['hash'] == block['quantum_proof'])
+        assert receiver._partial_blocks == {} and receiver.relay_stats['compact_fallbacks'] == 1
+    finally:
+        sock.close()
@@ -0,0 +1,58 @@
+import zlib
+import pytest
+from quantum_crypto.classical_integration.compression import (
+    compress, decompress, encode_compressed, decode_compressed, negotiate, available_codecs
+)
+from quantum_crypto.classical_integration.protocol import (
+    ProtocolError, encode_version, decode_version, CMD_BLOCK
+)
+from quantum_crypto.classical_integration.transactions import create_transaction
+from .conftest import wait_for
+
+def test_version_and_negotiation():
+    assert decode_version(encode_version(['zstd', 'zlib'], 8333)) == (1, 8333, ['zstd', 'zlib'])
+    assert negotiate(['zstd', 'zlib'], ['zlib']) == 'zlib'
+    assert negotiate(['zlib'], []) is None
+    assert 'zlib' in available_codecs(('zstd', 'zlib'))
+
+def test_compressed_round_trip():
+    payload = b'pubkey_alice pubkey_bob ' * 500
+    message = encode_compressed('zlib', CMD_BLOCK, compress('zlib', payload))
+    assert len(message) < len(payload) // 10
+    assert decode_compressed(message, ['zlib'], 1 << 20) == (CMD_BLOCK, payload)
+    with pytest.raises(ProtocolError):
+        decode_compressed(message, ['zstd'], 1 << 20)  # a codec we never offered
+
+def test_zstd_round_trip():
+    pytest.importorskip('zstandard')
+    payload = b'x' * 10000
+    assert decompress('zstd', compress('zstd', payload), 1 << 20) == payload
+
+def test_decompression_bomb_rejected():
+    bomb = zlib.compress(b'\0' * (4 << 20))
+    with pytest.raises(ProtocolError):
+        decompress('zlib', bomb, 1 << 20)
+    with pytest.raises(ProtocolError):
+        decompress('zlib', b'not zlib', 1 << 20)
+
+def sync_fresh_node(start_network, codecs):
+    seed = start_network('seed', listen=False)
+    fresh = start_network('fresh', listen=False, compression_codecs=codecs)
+    for height in range(3):
+        for i in range(200):
+            seed.node.add_transaction(create_transaction(f'alice{i % 5}', f'bob{i % 3}', i + 1, f'sig{height}.{i}'))
+        seed.node.create_block()
+    seed.start_server(host='127.0.0.1', port=0)
+    fresh.connect_to_peer('127.0.0.1', seed.listen_port)
+    tip = seed.node.storage.get_tip()
+    assert wait_for(lambda: fresh.node.storage.get_tip() == tip)
+    return seed.peer_metrics()[0]
+
+def test_sync_traffic_is_compressed(start_network):
+    metrics = sync_fresh_node(start_network, ('zlib',))
+    assert metrics['compressed_messages'] >= 3  # one per block at least
+    assert metrics['compression_saved_bytes'] > metrics['sent_bytes']
+
+def test_compression_can_be_declined(start_network):
+    metrics = sync_fresh_node(start_network, ())
+    assert metrics['compressed_messages'] == 0
@@ -0,0 +1,113 @@
+import pytest
+from quantum_crypto.classical_integration import node as node_module
+from quantum_crypto.classical_integration.mempool import Mempool, ENTRY_OVERHEAD
+from quantum_crypto.classical_integration.node import Node
+from quantum_crypto.classical_integration.storage import FileStorage
+from quantum_crypto.classical_integration.transactions import Transaction, create_transaction
+
+def tx(sender, amount, fee=0):
+    return create_transaction(sender, 'bob', amount, f'sig-{sender}-{amount}', fee)
+
+def test_duplicates_rejected():
+    pool = Mempool()
+    first = tx('alice', 1)
+    assert pool.add(first)
+    assert not pool.add(dict(first.to_dict()))
+    assert len(pool) == 1
+    assert pool.get(first.txid) is first and first.txid in pool
+
+def test_fee_priority_respects_sender_order():
+    """Test higher fees go first but never ahead of the same sender's older transactions"""
+    pool = Mempool(policy='fee')
+    low = tx('alice', 1, fee=1)
+    high_after_low = tx('alice', 2, fee=50)
+    mid = tx('carol', 3, fee=10)
+    for transaction in (low, high_after_low, mid):
+        pool.add(transaction)
+    assert pool.select(3) == [mid, low, high_after_low]
+    assert pool.select(1) == [mid]  # selection does not consume
+
+def test_arrival_policy_is_fifo():
+    pool = Mempool(policy='arrival')
+    transactions = [tx('alice', 1, fee=1), tx('carol', 2, fee=99), tx('dave', 3)]
+    for transaction in transactions:
+        pool.add(transaction)
+    assert pool.select(10) == transactions
+
+def test_remove_promotes_next_from_sender():
+    pool = Mempool()
+    first, second = tx('alice', 1), tx('alice', 2)
+    pool.add(first)
+    pool.add(second)
+    pool.remove([first])
+    assert pool.select(5) == [second]
+    assert pool.transactions() == [second]
+
+def test_count_cap_evicts_lowest_fee_and_descendants():
+    pool = Mempool(max_count=3)
+    cheap = tx('alice', 1, fee=1)
+    child = tx('alice', 2, fee=100)
+    pool.add(cheap)
+    pool.add(child)
+    pool.add(tx('carol', 3, fee=5))
+    assert pool.add(tx('dave', 4, fee=5))
+    assert cheap.txid not in pool and child.txid not in pool
+    assert len(pool) == 2 and pool.evicted == 2
+    assert pool.add(tx('frank', 6, fee=7))
+    assert not pool.add(tx('erin', 5, fee=0))  # full of better transactions
+
+def test_memory_cap():
+    pool = Mempool(max_bytes=3 * (ENTRY_OVERHEAD + 40))
+    for i in range(10):
+        pool.add(tx(f'sender{i}', 1, fee=i + 1))
+    assert pool.total_bytes <= pool.max_bytes
+    assert {t.fee for t in pool.transactions()} >= {10}
+
+def test_create_block_honours_block_size(tmp_path, monkeypatch):
+    monkeypatch.setattr(node_module, 'BLOCK_SIZE', 3)
+    node = Node(storage=FileStorage(str(tmp_path / 'chain.json')))
+    for i in range(5):
+        node.add_transaction(tx(f'sender{i}', 1, fee=i + 1))
+    assert not node.add_transaction(tx('sender0', 1, fee=1))
+
+    block = node.create_block()
+    assert len(block['transactions']) == 3
+    assert len(node.mempool) == 2
+    assert node.storage.get_balance('sender2') == -4
+
+def test_node_keeps_an_empty_pool_it_is_given(tmp_path):
+    pool = Mempool(max_count=2)
+    node = Node(storage=FileStorage(str(tmp_path / 'chain.json')), mempool=pool)
+    assert node.mempool is pool
+    for i in range(3):
+        node.add_transaction(tx(f'sender{i}', 1, fee=i + 1))
+    assert len(node.mempool) == 2
+
+@pytest.mark.parametrize('bad', [
+    Transaction('alice', 'bob', -500, ''),
+    Transaction('alice', 'bob', 5, 'sig', fee=-1),
+    {'sender': '', 'receiver': 'bob', 'amount': 5, 'signature': 'sig'},
+])
+def test_node_validates_transactions(tmp_path, bad):
+    """Test transactions built without create_transaction get its checks on the way into the pool or a block"""
+    node = Node(storage=FileStorage(str(tmp_path / 'chain.json')))
+    with pytest.raises(ValueError):
+        node.add_transaction(bad)
+    assert len(node.mempool) == 0
+    with pytest.raises(ValueError):
+        node.receive_block({'transactions': [bad], 'quantum_proof': 'proof', 'timestamp': 1,
+                            'previous_hash': node.storage.get_tip()['hash']})
+    assert node.storage.get_tip()['height'] == -1
+
+def test_offer_never_drops_its_own_predecessor(tmp_path, monkeypatch):
+    """Test a full template keeps a sender's cheap transaction rather than swap it for its successor"""
+    monkeypatch.setattr(node_module, 'BLOCK_SIZE', 2)
+    node = Node(storage=FileStorage(str(tmp_path / 'chain.json')))
+    b, a1, a2 = tx('bella', 1, fee=500), tx('alice', 1, fee=1), tx('alice', 2, fee=1000)
+    for transaction in (b, a1, a2):
+        node.add_transaction(transaction)
+
+    block = node.create_block()
+    mined = [(t['sender'], t['amount']) for t in block['transactions']]
+    assert mined == [('bella', 1), ('alice', 1)]
+    assert node.mempool.transactions() == [a2]
@@ -0,0 +1,200 @@
+import socket
+import sys
+import threading
+import pytest
+from quantum_crypto.classical_integration.protocol import (
+    FrameDecoder, encode_message, encode_inv, block_inv_id, CMD_INV, CMD_PING, CMD_BLOCK, CMD_GETDATA, INV_TX, INV_BLOCK
+)
+from quantum_crypto.classical_integration.serialization import decode_binary_block
+from quantum_crypto.classical_integration.transactions import create_transaction
+from .conftest import wait_for, make_network
+
+@pytest.fixture
+def server(start_network):
+    return start_network('server')
+
+@pytest.fixture
+def client(start_network):
+    return start_network('client', listen=False)
+
+def port_of(network):
+    return network.server.getsockname()[1]
+
+def test_transaction_and_block_delivery(server, client):
+    """Test framed tx and block messages reach the other node"""
+    peer = client.connect_to_peer('127.0.0.1', port_of(server))
+    assert client.peers == [peer] and peer.outbound
+    assert wait_for(lambda: len(server.peers) == 1)
+
+    tx = create_transaction('alice', 'bob', 10, 'sig')
+    client.broadcast_transaction(tx)
+    assert wait_for(lambda: tx.txid in server.node.mempool)
+
+    client.node.add_transaction(tx)
+    block = client.node.create_block()
+    client.broadcast_block(block)
+    assert wait_for(lambda: server.node.storage.get_tip()['hash'] == block['quantum_proof'])
+    assert wait_for(lambda: len(server.node.mempool) == 0)
+
+def test_inv_requests_unknown_transactions(server, client):
+    tx = create_transaction('alice', 'bob', 5, 'sig')
+    server.node.add_transaction(tx)
+    peer = client.connect_to_peer('127.0.0.1', port_of(server))
+    assert wait_for(lambda: len(server.peers) == 1)
+    server.peers[0].send_message(CMD_INV, encode_inv([(INV_TX, tx.digest)]))
+    assert wait_for(lambda: tx.txid in client.node.mempool)
+
+def test_ping_answered_and_garbage_disconnects(server):
+    sock = socket.create_connection(('127.0.0.1', port_of(server)))
+    sock.sendall(encode_message(CMD_PING, b'\0' * 7 + b'\x2a'))
+    reply = sock.recv(64)
+    assert reply[4:8] == b'pong' and reply[-1] == 0x2a
+    sock.sendall(b'not a framed message at all')
+    assert sock.recv(64) == b''
+    sock.close()
+    assert wait_for(lambda: server.peers == [])
+
+def test_send_on_loop_queues_directly(server, client):
+    """Test a send made on the loop thread is queued at once rather than via call_soon_threadsafe"""
+    client.connect_to_peer('127.0.0.1', port_of(server))
+    assert wait_for(lambda: len(server.peers) == 1)
+    peer = server.peers[0]
+
+    async def send_and_look():
+        depth = len(peer.queue)
+        peer.send(encode_message(CMD_PING, b'\0' * 8))
+        return server.on_loop_thread(), len(peer.queue) - depth
+
+    assert not server.on_loop_thread()
+    assert server._run(send_and_look(), timeout=5) == (True, 1)
+
+def test_json_block_from_peer_is_rejected(server):
+    """Test the legacy JSON block format is not accepted on the wire"""
+    sock = socket.create_connection(('127.0.0.1', port_of(server)))
+    sock.sendall(encode_message(CMD_BLOCK, b'{"x": 1}'))
+    assert wait_for(lambda: server.addresses.misbehavior.get('127.0.0.1', 0) > 0)
+    sock.sendall(encode_message(CMD_PING, b'\0' * 8))
+    assert sock.recv(64)[4:8] == b'pong'
+    sock.close()
+
+def test_malformed_payload_errors_disconnect(server):
+    """Test a KeyError or TypeError escaping a handler is treated as a protocol error"""
+    def broken(peer, payload):
+        raise KeyError('quantum_proof')
+    server._handlers[CMD_PING] = broken
+    sock = socket.create_connection(('127.0.0.1', port_of(server)))
+    sock.sendall(encode_message(CMD_PING, b'\0' * 8))
+    assert sock.recv(64) == b''
+    sock.close()
+    assert wait_for(lambda: server.peers == [])
+
+def test_mining_while_serving_blocks(server):
+    """Test blocks created on this thread while the loop reads the same storage to answer getdata"""
+    server.node.add_transaction(create_transaction('alice', 'bob', 1, 'sig'))
+    hashes = [server.node.create_block()['quantum_proof']]
+    sock = socket.create_connection(('127.0.0.1', port_of(server)))
+    sock.settimeout(10)
+    stop = threading.Event()
+    served = []
+
+    def fetch():
+        decoder = FrameDecoder()
+        while not stop.is_set():
+            wanted = hashes[-20:]
+            sock.sendall(encode_message(CMD_GETDATA, encode_inv([(INV_BLOCK, block_inv_id(h)) for h in wanted])))
+            replies = []
+            while len(replies) < len(wanted):
+                data = sock.recv(1 << 16)
+                if not data:
+                    return
+                replies += [decode_binary_block(payload)['quantum_proof']
+                            for command, payload in decoder.feed(data) if command == CMD_BLOCK]
+            served.append(replies == wanted)
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads often enough to interleave reads and appends
+    fetcher = threading.Thread(target=fetch)
+    fetcher.start()
+    try:
+        while len(served) < 100 and fetcher.is_alive():
+            server.node.add_transaction(create_transaction('alice', 'bob', len(hashes) + 1, f'sig{len(hashes)}'))
+            hashes.append(server.node.create_block()['quantum_proof'])
+    finally:
+        stop.set()
+        fetcher.join()
+        sys.setswitchinterval(switch_interval)
+        sock.close()
+    assert len(served) >= 100 and all(served)
+    assert server.addresses.misbehavior.get('127.0.0.1', 0) == 0
+
+def test_many_connections_share_one_thread(server):
+    threads_before = threading.active_count()
+    sockets = [socket.create_connection(('127.0.0.1', port_of(server))) for _ in range(300)]
+    try:
+        assert wait_for(lambda: len(server.peers) == 300)
+        assert threading.active_count() == threads_before
+    finally:
+        for sock in sockets:
+            sock.close()
+    assert wait_for(lambda: server.peers == [])
+
+def test_stop_is_clean_and_frees_port(tmp_path):
+    network = make_network(tmp_path, 'node')
+    network.start_server(host='127.0.0.1', port=0)
+    port = port_of(network)
+    held = socket.create_connection(('127.0.0.1', port))
+    network.stop_server()
+    assert network.loop is None and network.peers == []
+    assert held.recv(1) == b''  # the server closed our connection
+    held.close()
+    with pytest.raises(ConnectionRefusedError):
+        socket.create_connection(('127.0.0.1', port), timeout=1)
+
+def test_broadcast_drops_dead_peers(server, client):
+    peer = client.connect_to_peer('127.0.0.1', port_of(server))
+    peer.close()
+    client.broadcast(b'data')
+    assert wait_for(lambda: client.peers == [])
+
+def flood_with_slow_reader(tmp_path, policy):
+    """Broadcast 40 MB from a server to one fast peer and one socket that never reads."""
+    server = make_network(tmp_path, 'flood', queue_policy=policy, queue_max_bytes=4 * 1024 * 1024)
+    server.start_server(host='127.0.0.1', port=0)
+    fast = make_network(tmp_path, 'fast')
+    fast._handlers['filler'] = lambda peer, payload: None  # unhandled commands would count as misbehavior
+    slow = socket.socket()
+    slow.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    try:
+        fast.connect_to_peer('127.0.0.1', port_of(server))
+        assert wait_for(lambda: len(server.peers) == 1)
+        slow.connect(('127.0.0.1', port_of(server)))
+        assert wait_for(lambda: len(server.peers) == 2)
+        fast_address = server.peers[0].address
+        message = encode_message('filler', b'x' * 256 * 1024)
+        for _ in range(20):
+            for _ in range(8):  # well under the queue limit, so only the slow reader overflows
+                server.broadcast(message)
+            assert wait_for(lambda: all(m['queue_depth'] == 0 for m in server.peer_metrics()
+                                        if m['address'] == fast_address))
+        return fast_address, server.peer_metrics()
+    finally:
+        slow.close()
+        fast.stop_server()
+        server.stop_server()
+
+def test_slow_peer_does_not_stall_others(tmp_path):
+    fast_address, metrics = flood_with_slow_reader(tmp_path, 'drop')
+    by_address = {m['address']: m for m in metrics}
+    fast = by_address.pop(fast_address)
+    (slow,) = by_address.values()
+    assert fast['sent_messages'] >= 160 and fast['dropped_messages'] == 0  # plus any sync replies
+    assert fast['max_send_latency'] > 0
+    assert slow['dropped_messages'] > 0 and slow['queued_bytes'] <= 4 * 1024 * 1024
+
+def test_full_queue_can_disconnect_peer(tmp_path):
+    fast_address, metrics = flood_with_slow_reader(tmp_path, 'disconnect')
+    assert [m['address'] for m in metrics] == [fast_address]
+
+def test_unknown_queue_policy(tmp_path):
+    with pytest.raises(ValueError):
+        make_network(tmp_path, 'node', queue_policy='block')
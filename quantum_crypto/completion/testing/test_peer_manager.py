@@ -0,0 +1,98 @@
+import socket
+import time
+import pytest
+from quantum_crypto.classical_integration import address_book as address_book_module
+from quantum_crypto.classical_integration import peer_manager as peer_manager_module
+from quantum_crypto.classical_integration.address_book import AddressBook
+from .conftest import wait_for
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def test_backoff_doubles_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(address_book_module, 'RECONNECT_BACKOFF_MAX', 8.0)
+    book = AddressBook()
+    key = book.add('10.0.0.1', 8333)
+    delays = []
+    for _ in range(6):
+        book.record_failure(key, 1000.0)
+        delays.append(book.get(key)['next_attempt'] - 1000.0)
+    assert all(0.75 * 2 ** i <= delay <= 2 ** i for i, delay in enumerate(delays[:4]))
+    assert max(delays) <= 8.0
+    assert book.candidates(1000.0) == []
+    book.record_success(key, 1001.0)
+    assert book.candidates(1001.0) == [key]
+
+def test_scores_prefer_fast_reliable_peers():
+    book = AddressBook()
+    slow, fast, flaky = book.add('a', 1), book.add('b', 1), book.add('c', 1)
+    book.record_rtt(slow, 0.5)
+    book.record_rtt(fast, 0.01)
+    book.record_rtt(flaky, 0.01)
+    book.record_failure(flaky, 0.0)
+    assert book.candidates(1e9) == [fast, slow, flaky]
+
+def test_misbehaving_host_is_banned():
+    book = AddressBook()
+    assert not book.penalize('10.0.0.2', 60, 0.0)
+    assert book.penalize('10.0.0.2', 60, 0.0)
+    assert book.is_banned('10.0.0.2', 1.0)
+    assert not book.is_banned('10.0.0.2', 1.0 + 24 * 3600)
+
+def test_addresses_persist_across_restarts(tmp_path):
+    path = str(tmp_path / 'peers.json')
+    book = AddressBook(path)
+    key = book.add('10.0.0.3', 9000)
+    book.record_rtt(key, 0.02)
+    book.penalize('10.0.0.4', 500, time.time())
+    book.save()
+    reloaded = AddressBook(path)
+    assert reloaded.get(key)['rtt'] == 0.02
+    assert reloaded.is_banned('10.0.0.4', time.time())
+
+@pytest.fixture
+def fast_maintenance(monkeypatch):
+    monkeypatch.setattr(peer_manager_module, 'PING_INTERVAL', 0.05)
+    monkeypatch.setattr(address_book_module, 'RECONNECT_BACKOFF_BASE', 0.05)
+
+def test_manager_keeps_target_outbound(tmp_path, start_network, fast_maintenance):
+    """Test dialling from the address book, RTT measurement and replacing a lost peer"""
+    servers = [start_network(f'server{i}') for i in range(3)]
+    client = start_network('client', listen=False, target_outbound=2, address_file=str(tmp_path / 'peers.json'))
+    client.peer_manager.interval = 0.05
+    dead = client.addresses.add('127.0.0.1', free_port())
+    client.addresses.record_rtt(dead, 0.0)  # the best score, so it is tried first
+    for server in servers[:2]:
+        client.addresses.add('127.0.0.1', server.listen_port)
+    client.start_server(host='127.0.0.1', port=0)
+
+    assert wait_for(lambda: len(client.peers) == 2)
+    assert wait_for(lambda: client.addresses.get(dead)['failures'] >= 1)
+    assert wait_for(lambda: all(m['rtt'] is not None for m in client.peer_metrics()))
+
+    # The first server learned the client's listening port from its version message
+    assert wait_for(lambda: f'127.0.0.1:{client.listen_port}' in servers[0].addresses)
+
+    client.addresses.add('127.0.0.1', servers[2].listen_port)
+    servers[0].stop_server()
+    lost = f'127.0.0.1:{servers[0].listen_port}'
+    assert wait_for(lambda: client.addresses.get(lost)['failures'] >= 1)
+    assert wait_for(lambda: len(client.peers) == 2 and
+                    {peer.address_key for peer in client.peers} ==
+                    {f'127.0.0.1:{server.listen_port}' for server in servers[1:]})
+    client.stop_server()
+    assert len(AddressBook(str(tmp_path / 'peers.json'))) == 4
+
+def test_repeat_offender_is_refused(start_network):
+    server = start_network('server')
+    for _ in range(2):
+        sock = socket.create_connection(('127.0.0.1', server.listen_port))
+        sock.sendall(b'garbage that is not a framed message')
+        assert sock.recv(64) == b''
+        sock.close()
+    assert server.addresses.is_banned('127.0.0.1', time.time())
+    sock = socket.create_connection(('127.0.0.1', server.listen_port))
+    assert sock.recv(64) == b''  # dropped on connect
+    sock.close()
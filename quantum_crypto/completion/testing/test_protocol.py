@@ -0,0 +1,61 @@
+import os
+import random
+import pytest
+from quantum_crypto.classical_integration.protocol import (
+    FrameDecoder, ProtocolError, encode_message, MESSAGE_HEADER,
+    encode_inv, decode_inv, encode_headers, decode_headers, INV_TX, INV_BLOCK
+)
+from quantum_crypto.quantum_currency.quantum_block import compute_block_proof
+
+MESSAGES = [('tx', b'abc'), ('ping', b'\0' * 8), ('block', os.urandom(300000)), ('inv', b''), ('tx', b'x' * 70)]
+
+def stream():
+    return b''.join(encode_message(command, payload) for command, payload in MESSAGES)
+
+def test_reassembles_arbitrary_chunks():
+    """Test frames survive being split and coalesced at any boundary"""
+    data = stream()
+    rng = random.Random(7)
+    decoder = FrameDecoder(buffer_size=1024)
+    frames, offset = [], 0
+    while offset < len(data):
+        size = rng.randint(1, 5000)
+        frames += decoder.feed(data[offset:offset + size])
+        offset += size
+    assert frames == MESSAGES
+
+def test_reads_into_reusable_buffer():
+    """Test the buffered-protocol path writes into, and reuses, one buffer"""
+    decoder = FrameDecoder(buffer_size=4096)
+    small = encode_message('tx', b'y' * 100)
+    seen = []
+    for _ in range(200):
+        buffer = decoder.get_buffer(-1)
+        buffer[:len(small)] = small
+        seen += [(command, bytes(payload)) for command, payload in decoder.buffer_updated(len(small))]
+    assert seen == [('tx', b'y' * 100)] * 200
+    assert len(decoder._buffer) == 4096
+
+def test_corrupt_frames_rejected():
+    good = encode_message('tx', b'payload')
+    for bad in (b'XXXX' + good[4:], good[:-1] + b'!'):
+        with pytest.raises(ProtocolError):
+            FrameDecoder().feed(bad)
+    oversized = bytearray(good)
+    oversized[16:20] = (10 ** 9).to_bytes(4, 'big')
+    with pytest.raises(ProtocolError):
+        FrameDecoder().feed(bytes(oversized))
+    assert len(good) == MESSAGE_HEADER.size + len(b'payload')
+
+def test_inv_and_headers_round_trip():
+    items = [(INV_TX, b'\x01' * 32), (INV_BLOCK, b'QPROOF_abc')]
+    assert decode_inv(encode_inv(items)) == items
+    with pytest.raises(ProtocolError):
+        decode_inv(encode_inv(items)[:-1])
+
+    block = {'transactions': [1, 2], 'merkle_root': 'QMERKLE_x', 'timestamp': 5.5,
+             'previous_hash': 'GENESIS_HASH', 'block_height': 3}
+    block['quantum_proof'] = compute_block_proof(block)
+    (header,) = decode_headers(encode_headers([block]))
+    assert header['tx_count'] == 2 and header['block_height'] == 3
+    assert compute_block_proof(header) == block['quantum_proof']
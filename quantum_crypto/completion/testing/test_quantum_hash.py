@@ -1,5 +1,8 @@
 import pytest
-from quantum_crypto.quantum_currency.quantum_hash import quantum_hash
+from quantum_crypto.quantum_currency.quantum_hash import (
+    quantum_hash, _hadamard_transform, _phase_transform, _cnot_transform, _cnot_chain, _apply_error_correction,
+    _measure_quantum_state
+)
 import numpy as np
 
 def test_quantum_hash_basic():
@@ -53,3 +56,61 @@ def _calculate_hash_similarity(hash1: bytes, hash2: bytes) -> float:
     min_len = min(len(bits1), len(bits2))
     matching_bits = np.sum(bits1[:min_len] == bits2[:min_len])
     return matching_bits / min_len
+
+def _reference_cnot(state, control, target):
+    new_state = np.zeros_like(state)
+    for i in range(len(state)):
+        if i & (1 << control):
+            new_state[i ^ (1 << target)] = state[i]
+        else:
+            new_state[i] = state[i]
+    return new_state
+
+def _random_state(rng, qubits):
+    state = rng.standard_normal(2 ** qubits) + 1j * rng.standard_normal(2 ** qubits)
+    state[rng.random(2 ** qubits) < 0.3] = 0
+    return state
+
+def test_measurement_of_underflowed_state():
+    """Test a state whose amplitudes all decayed to zero, or too small to square, still measures"""
+    for state in (np.zeros(8, dtype=np.complex128), np.full(8, 1e-200, dtype=np.complex128)):
+        measured = _measure_quantum_state(state)
+        assert measured.sum() == 1
+
+def test_gate_kernels_match_reference_loops():
+    """Test the vectorized CNOT and error correction are bit-identical to per-amplitude loops"""
+    rng = np.random.default_rng(3)
+    for qubits in range(1, 7):
+        state = _random_state(rng, qubits)
+        for control in range(qubits):
+            for target in range(qubits):
+                if control != target:
+                    expected = _reference_cnot(state, control, target)
+                    assert _cnot_transform(state, control, target).tobytes() == expected.tobytes()
+        expected = np.array([amp if bin(i).count('1') % 2 == 0 else 0 for i, amp in enumerate(state)])
+        assert _apply_error_correction(state).tobytes() == expected.tobytes()
+
+def test_cnot_chain_matches_sequential_gates():
+    rng = np.random.default_rng(4)
+    state = _random_state(rng, 5)
+    for byte in range(256):
+        expected = state
+        for i in range(4):
+            if byte & (1 << i):
+                expected = _reference_cnot(expected, i, i + 1)
+        chain = byte & 0b1111
+        result = state[_cnot_chain(len(state), chain)] if chain else state
+        assert result.tobytes() == expected.tobytes()
+
+def test_single_qubit_gates():
+    """Test a gate on one qubit equals the full operator, and the plain matrix product on a single qubit"""
+    rng = np.random.default_rng(5)
+    single = _random_state(rng, 1)
+    h = np.array([[1, 1], [1, -1]]) / np.sqrt(2)
+    assert _hadamard_transform(single).tobytes() == np.dot(h, single).tobytes()
+    state = _random_state(rng, 4)
+    for qubit in range(4):
+        operator = np.kron(np.kron(np.eye(2 ** (3 - qubit)), h), np.eye(2 ** qubit))
+        assert np.allclose(_hadamard_transform(state, qubit), operator @ state)
+        phase = np.kron(np.kron(np.eye(2 ** (3 - qubit)), np.diag([1, 1j])), np.eye(2 ** qubit))
+        assert np.allclose(_phase_transform(state, qubit), phase @ state)
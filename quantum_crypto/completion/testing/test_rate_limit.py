@@ -0,0 +1,107 @@
+import socket
+import time
+from quantum_crypto.classical_integration.protocol import encode_message, encode_nonce, CMD_PING, CMD_PONG
+from quantum_crypto.classical_integration.peer_manager import PENALTY_UNKNOWN
+from quantum_crypto.classical_integration.rate_limit import TokenBucket, PeerBudget
+from quantum_crypto.config.config import MESSAGE_RATE_LIMITS
+from .conftest import wait_for
+
+PONG_SIZE = len(encode_message(CMD_PONG, encode_nonce(0)))
+
+def pings(count):
+    return b''.join(encode_message(CMD_PING, encode_nonce(n)) for n in range(count))
+
+def recv_exactly(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+def is_closed(sock):
+    try:
+        return sock.recv(1 << 16) == b''
+    except ConnectionResetError:
+        return True
+
+def test_token_bucket_debt():
+    bucket = TokenBucket(rate=10, burst=5, now=0.0)
+    bucket.take(5, 0.0)
+    assert bucket.deficit(0.0) == 0.0
+    bucket.take(10, 0.0)
+    assert bucket.deficit(0.0) == 1.0
+    assert bucket.deficit(0.5) == 0.5
+    assert bucket.deficit(100.0) == 0.0
+    assert bucket.tokens == 5  # refills only up to the burst
+
+def test_budget_accounts_per_command():
+    budget = PeerBudget({'ping': (1, 2)}, now=0.0)
+    for _ in range(4):
+        budget.charge('ping', 32, 0.001, now=0.0)
+    budget.charge('tx', 500, 0.002, now=0.0)
+    assert budget.costs['ping'][:2] == [4, 128]
+    assert budget.costs['tx'][:2] == [1, 500]
+    assert budget.deficit(0.0) == 2.0  # two pings over a burst of two, at one per second
+    assert budget.deficit(2.0) == 0.0
+
+PING_LIMITS = dict(MESSAGE_RATE_LIMITS, ping=(10, 20))
+
+def test_flooding_peer_is_throttled(start_network):
+    """Test a peer over its ping limit is read late while an honest peer is served promptly"""
+    server = start_network('server', message_rate_limits=PING_LIMITS)
+    flooder = socket.create_connection(('127.0.0.1', server.listen_port))
+    honest = socket.create_connection(('127.0.0.1', server.listen_port))
+    try:
+        flooder.sendall(pings(30))
+        assert len(recv_exactly(flooder, 30 * PONG_SIZE)) == 30 * PONG_SIZE
+        assert wait_for(lambda: any(m['throttled'] for m in server.peer_metrics()))
+
+        started = time.monotonic()
+        flooder.sendall(pings(1))
+        honest.sendall(pings(1))
+        assert len(recv_exactly(honest, PONG_SIZE)) == PONG_SIZE
+        assert time.monotonic() - started < 0.5
+        assert len(recv_exactly(flooder, PONG_SIZE)) == PONG_SIZE
+        assert time.monotonic() - started > 0.5  # waited out its ~1s debt
+        assert len(server.peers) == 2
+        assert sorted(m['costs']['ping'][0] for m in server.peer_metrics()) == [1, 31]
+    finally:
+        flooder.close()
+        honest.close()
+
+def test_far_over_budget_peer_is_disconnected(start_network):
+    server = start_network('server', message_rate_limits=PING_LIMITS)
+    sock = socket.create_connection(('127.0.0.1', server.listen_port))
+    sock.sendall(pings(200))
+    sock.settimeout(10)
+    recv_exactly(sock, 200 * PONG_SIZE)
+    assert is_closed(sock)
+    sock.close()
+    assert wait_for(lambda: server.addresses.misbehavior.get('127.0.0.1', 0) > 0)
+
+def test_disconnect_policy(start_network):
+    server = start_network('server', rate_limit_policy='disconnect', message_rate_limits=PING_LIMITS)
+    sock = socket.create_connection(('127.0.0.1', server.listen_port))
+    sock.sendall(pings(10))
+    assert len(recv_exactly(sock, 10 * PONG_SIZE)) == 10 * PONG_SIZE
+    sock.sendall(pings(30))
+    sock.settimeout(5)
+    recv_exactly(sock, 30 * PONG_SIZE)
+    assert is_closed(sock)
+    sock.close()
+    assert wait_for(lambda: not server.peers)
+
+def test_unknown_commands_share_one_bucket(start_network):
+    """Test invented command names neither grow a peer's budget nor go unpunished"""
+    server = start_network('server')
+    sock = socket.create_connection(('127.0.0.1', server.listen_port))
+    sock.sendall(b''.join(encode_message(f'junk{n}') for n in range(30)) + pings(1))
+    sock.settimeout(5)
+    assert len(recv_exactly(sock, PONG_SIZE)) == PONG_SIZE
+    metrics = server.peer_metrics()
+    sock.close()
+    assert set(metrics[0]['costs']) == {'unknown', 'ping'}
+    assert metrics[0]['costs']['unknown'][0] == 30
+    assert metrics[0]['misbehavior'] == 30 * PENALTY_UNKNOWN
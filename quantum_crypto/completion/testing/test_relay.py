@@ -0,0 +1,111 @@
+import socket
+import time
+import pytest
+from quantum_crypto.classical_integration.protocol import encode_message, encode_inv, CMD_TX, CMD_BLOCK, CMD_INV, INV_TX
+from quantum_crypto.classical_integration.seen_set import SeenSet
+from quantum_crypto.classical_integration.serialization import encode_block
+from quantum_crypto.classical_integration.transactions import Transaction, create_transaction
+from quantum_crypto.quantum_currency.quantum_block import create_quantum_block
+from .conftest import wait_for
+
+@pytest.fixture
+def mesh(start_network):
+    """Four nodes, every pair connected"""
+    networks = [start_network(f'node{i}') for i in range(4)]
+    for i, network in enumerate(networks):
+        for other in networks[i + 1:]:
+            network.connect_to_peer('127.0.0.1', other.listen_port)
+    assert wait_for(lambda: all(len(network.peers) == 3 for network in networks))
+    return networks
+
+def test_seen_set_is_bounded():
+    seen = SeenSet(3)
+    assert seen.add('a') and not seen.add('a')
+    for key in 'bcd':
+        seen.add(key)
+    assert len(seen) == 3 and 'a' not in seen and 'd' in seen
+
+def test_each_node_downloads_each_object_once(mesh):
+    """Test relay cost scales with unique objects, not peers x objects"""
+    transactions = [create_transaction('alice', 'bob', i + 1, f'sig{i}') for i in range(5)]
+    for tx in transactions:
+        mesh[0].broadcast_transaction(tx)
+    assert wait_for(lambda: all(len(network.node.mempool) == 5 for network in mesh))
+    time.sleep(0.2)  # let any redundant relays arrive before counting
+
+    received = sum(network.relay_stats['objects_received'] for network in mesh)
+    assert received == 5 * 3
+    assert all(network.relay_stats['duplicates_received'] == 0 for network in mesh)
+    # Every node announces each object at most once per link
+    assert all(network.relay_stats['inv_sent'] <= 5 * 3 for network in mesh)
+
+def test_blocks_relay_along_a_line(start_network):
+    """Test a block hops A -> B -> C and the transaction leaves every mempool"""
+    networks = [start_network(f'line{i}') for i in range(3)]
+    networks[0].connect_to_peer('127.0.0.1', networks[1].listen_port)
+    networks[1].connect_to_peer('127.0.0.1', networks[2].listen_port)
+    assert wait_for(lambda: len(networks[1].peers) == 2)
+
+    tx = create_transaction('alice', 'bob', 3, 'sig')
+    networks[0].broadcast_transaction(tx)
+    assert wait_for(lambda: tx.txid in networks[2].node.mempool)
+    block = networks[0].node.create_block()
+    networks[0].broadcast_block(block)
+    assert wait_for(lambda: networks[2].node.storage.get_tip()['hash'] == block['quantum_proof'])
+    assert wait_for(lambda: len(networks[2].node.mempool) == 0)
+
+def test_announcements_are_batched(start_network):
+    """Test a burst shares a few inv messages and a lone transaction still goes out on the timer"""
+    receiver = start_network('receiver')
+    sender = start_network('sender', listen=False, inv_batch_size=100, inv_flush_interval=0.2)
+    sender.connect_to_peer('127.0.0.1', receiver.listen_port)
+    assert wait_for(lambda: len(receiver.peers) == 1)
+    for i in range(250):
+        sender.broadcast_transaction(create_transaction(f'user{i}', 'bob', 1, f'sig{i}'))
+    assert wait_for(lambda: len(receiver.node.mempool) == 250)
+    stats = sender.relay_stats
+    assert stats['inv_sent'] == 250
+    assert stats['inv_batch_max'] == 100 and stats['inv_batches'] == 3
+    (metrics,) = sender.peer_metrics()
+    assert metrics['writes'] < metrics['sent_messages'] / 10  # getdata answers share writes
+
+    sender.broadcast_transaction(create_transaction('carol', 'dave', 1, 'late'))
+    time.sleep(0.05)
+    assert len(receiver.node.mempool) == 250  # still waiting for the flush timer
+    assert wait_for(lambda: len(receiver.node.mempool) == 251)
+    assert stats['inv_batches'] == 4
+
+def test_invalid_peer_transactions_are_refused(start_network):
+    """Test a negative, unsigned transaction from a peer never reaches the mempool or the chain"""
+    server = start_network('server')
+    forged = Transaction('alice', 'bob', -500, '')
+    block = create_quantum_block([forged], server.node.storage.get_tip()['hash'])
+    block['block_height'] = 0
+    sock = socket.create_connection(('127.0.0.1', server.listen_port))
+    try:
+        sock.sendall(encode_message(CMD_TX, forged.serialized))
+        assert wait_for(lambda: server.addresses.misbehavior.get('127.0.0.1', 0) > 0)
+        sock.sendall(encode_message(CMD_BLOCK, encode_block(block)))
+        assert wait_for(lambda: server.addresses.misbehavior.get('127.0.0.1', 0) >= 20)
+        assert len(server.node.mempool) == 0
+        assert server.node.storage.get_tip()['height'] == -1
+    finally:
+        sock.close()
+
+def test_unanswered_getdata_goes_to_the_next_announcer(start_network):
+    """Test a transaction announced by a peer that never serves it is fetched from another announcer"""
+    receiver = start_network('receiver', getdata_timeout=0.2)
+    holder = start_network('holder', listen=False)
+    tx = create_transaction('alice', 'bob', 5, 'sig')
+    key = (INV_TX, tx.digest)
+    silent = socket.create_connection(('127.0.0.1', receiver.listen_port))
+    try:
+        silent.sendall(encode_message(CMD_INV, encode_inv([key])))
+        assert wait_for(lambda: key in receiver._requested)
+        holder.connect_to_peer('127.0.0.1', receiver.listen_port)
+        holder.broadcast_transaction(tx)
+        assert wait_for(lambda: tx.digest in receiver.node.mempool)
+        assert receiver.relay_stats['getdata_retries'] == 1
+        assert key not in receiver._requested and key not in receiver._alternates
+    finally:
+        silent.close()
@@ -0,0 +1,160 @@
+import json
+import pytest
+import struct
+from quantum_crypto.classical_integration.serialization import (
+    encode_block, decode_block, decode_binary_block, view_block, BlockView, BLOCK_HEADER, pack_str, U32,
+    encode_transaction, decode_transaction, TX_VERSION, TX_VERSION_FEE, BLOCK_VERSION_V2
+)
+
+@pytest.fixture
+def block():
+    return {
+        'transactions': [
+            {'sender': 'alice', 'receiver': 'bob', 'amount': 10, 'signature': 'sig1'},
+            {'sender': 'carol', 'receiver': 'dave', 'amount': 2.5, 'signature': 'sig2'}
+        ],
+        'merkle_root': 'QMERKLE_abc',
+        'quantum_proof': 'QPROOF_123',
+        'timestamp': 1733844706.25,
+        'previous_hash': 'GENESIS_HASH',
+        'block_height': 7
+    }
+
+def test_block_round_trip(block):
+    """Test a block decodes back to the dict it was encoded from"""
+    assert decode_block(encode_block(block)) == block
+
+def test_block_view_fields(block):
+    """Test views decode individual fields from a memoryview"""
+    view = view_block(memoryview(encode_block(block)))
+    assert isinstance(view, BlockView)
+    assert view.block_height == 7
+    assert view['quantum_proof'] == 'QPROOF_123'
+    assert view.tx_count == 2
+    assert view.merkle_root == 'QMERKLE_abc'
+    assert list(view.iter_amounts()) == [10, 2.5]
+    assert [tx['receiver'] for tx in view.iter_transactions()] == ['bob', 'dave']
+    assert view.to_dict() == block
+
+def test_legacy_json_records(block):
+    """Test JSON records from before the binary format still decode"""
+    payload = json.dumps(block).encode()
+    assert decode_block(payload) == block
+    assert view_block(payload)['quantum_proof'] == 'QPROOF_123'
+
+def test_binary_decoder_is_strict(block):
+    """Test the decoder used for peer data accepts only current binary blocks"""
+    assert decode_binary_block(memoryview(encode_block(block))) == block
+    for payload in (json.dumps(block).encode(), b'{"x": 1}', b''):
+        with pytest.raises(ValueError):
+            decode_binary_block(payload)
+
+def test_unknown_version_rejected(block):
+    payload = bytearray(encode_block(block))
+    payload[0] = 99
+    with pytest.raises(ValueError):
+        BlockView(memoryview(payload))
+
+def test_transaction_round_trip(block):
+    tx = block['transactions'][1]
+    assert decode_transaction(encode_transaction(tx)) == tx
+
+def test_transaction_encoding_is_strict(block):
+    """Test non-canonical transaction bytes are rejected"""
+    encoded = encode_transaction(block['transactions'][0])
+    for bad in (encoded + b'\x00', encoded[:-1], b'\x09' + encoded[1:]):
+        with pytest.raises(ValueError):
+            decode_transaction(bad)
+    with pytest.raises(ValueError):
+        encode_transaction(dict(block['transactions'][1], amount=float('nan')))
+
+def test_fee_transactions(block):
+    """Test fees switch to version 2 while fee-less transactions keep version 1"""
+    plain = block['transactions'][0]
+    with_fee = dict(plain, fee=3)
+    assert encode_transaction(plain)[0] == TX_VERSION
+    assert encode_transaction(dict(plain, fee=0)) == encode_transaction(plain)
+    encoded = encode_transaction(with_fee)
+    assert encoded[0] == TX_VERSION_FEE
+    assert decode_transaction(encoded) == with_fee
+
+    block['transactions'].append(with_fee)
+    view = view_block(encode_block(block))
+    assert [tx.fee for tx in view.iter_transactions()] == [0, 0, 3]
+    assert view.transaction_at(2).signature == 'sig1'
+    assert decode_block(encode_block(block)) == view.to_dict() == block
+
+    zero_fee_v2 = bytes((TX_VERSION_FEE,)) + encode_transaction(dict(plain, fee=1))[1:]
+    zero_fee_v2 = zero_fee_v2.replace(b'\x00' * 7 + b'\x01', b'\x00' * 8, 1)
+    with pytest.raises(ValueError):
+        decode_transaction(zero_fee_v2)
+
+def test_trailing_block_bytes_rejected(block):
+    with pytest.raises(ValueError):
+        decode_block(encode_block(block) + b'\x00')
+
+def test_version_1_blocks_still_decode(block):
+    """Test blocks stored before merkle roots and transaction versions were added"""
+    parts = [BLOCK_HEADER.pack(1, 7, block['timestamp'], 1), pack_str('GENESIS_HASH'), pack_str('QPROOF_123')]
+    tx = pack_str('alice') + pack_str('bob') + b'\x00' + struct.pack('>q', 10) + pack_str('sig1')
+    payload = b''.join(parts) + U32.pack(len(tx)) + tx
+    decoded = decode_block(payload)
+    assert decoded['transactions'] == [block['transactions'][0]]
+    assert decoded['quantum_proof'] == 'QPROOF_123'
+    assert 'merkle_root' not in decoded
+
+def test_binary_smaller_than_json(block):
+    assert len(encode_block(block)) * 2 < len(json.dumps(block, indent=4))
+
+def test_every_truncation_rejected(block):
+    """Test the unrolled transaction loop still rejects a block cut anywhere, and keeps UTF-8 strings"""
+    block['transactions'].append({'sender': 'zoë', 'receiver': 'élan', 'amount': 1.5, 'signature': 'sïg', 'fee': 2})
+    payload = encode_block(block)
+    assert decode_block(payload) == block
+    for end in range(1, len(payload)):
+        with pytest.raises(ValueError):
+            decode_block(payload[:end])
+    with pytest.raises(ValueError):
+        decode_block(payload.replace(b'\x00\x05alice', b'\x00\x06alice', 1))
+
+def test_version_2_blocks_still_decode(block):
+    """Test blocks stored as length-prefixed transactions, before parties and columns"""
+    parts = [BLOCK_HEADER.pack(BLOCK_VERSION_V2, 7, block['timestamp'], 2),
+             pack_str('GENESIS_HASH'), pack_str('QMERKLE_abc'), pack_str('QPROOF_123')]
+    for tx in block['transactions']:
+        encoded = encode_transaction(tx)
+        parts += [U32.pack(len(encoded)), encoded]
+    payload = b''.join(parts)
+    assert decode_block(payload) == view_block(payload).to_dict() == block
+    with pytest.raises(ValueError):
+        decode_binary_block(payload)
+
+def test_parties_and_hex_keys_stored_once_as_bytes(block):
+    """Test repeated pubkeys are stored once and hex text as the bytes it spells"""
+    alice, bob = 'a1' * 32, 'b2' * 32
+    block['transactions'] = [
+        {'sender': alice, 'receiver': bob, 'amount': i + 1, 'signature': f'{i:02x}' * 64} for i in range(50)
+    ] + [{'sender': bob, 'receiver': 'carol', 'amount': 0.5, 'signature': 'not hex', 'fee': 1}]
+    payload = encode_block(block)
+    assert decode_block(payload) == view_block(payload).to_dict() == block
+    assert payload.count(bytes.fromhex(alice)) == 1
+    assert len(payload) * 2 < len(json.dumps(block, separators=(',', ':')))
+
+def test_block_columns_are_canonical(block):
+    """Test the decoder rejects other spellings of the same block"""
+    payload = encode_block(block)
+    # An unknown key kind; the first two parties out of order; carol unused; a ref past the parties
+    count_at = payload.index(b'\x00\x00\x00\x04')
+    refs = b'\x01\x01' + b'\x00\x00\x00\x02' + b'\x00\x01\x00\x03'  # versions, sender refs, receiver refs
+    assert refs in payload
+    for bad in (payload[:count_at + 4] + b'\x02' + payload[count_at + 5:],
+                payload.replace(b'\x00\x05\x00\x03', b'\x00\x03\x00\x05', 1).replace(b'alicebob', b'bobalice', 1),
+                payload.replace(refs, b'\x01\x01\x00\x00\x00\x00\x00\x01\x00\x03'),
+                payload.replace(refs, b'\x01\x01\x00\x00\x00\x02\x00\x01\x00\x04')):
+        with pytest.raises(ValueError):
+            decode_block(bad)
+    hex_as_text = dict(block, transactions=[dict(block['transactions'][0], signature='ab')])
+    payload = encode_block(hex_as_text)
+    assert payload.endswith(b'\x01\x00\x01\xab')
+    with pytest.raises(ValueError):
+        decode_block(payload[:-4] + b'\x00\x00\x02ab')
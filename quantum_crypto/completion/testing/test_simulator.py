@@ -0,0 +1,47 @@
+import pytest
+from quantum_crypto.classical_integration.protocol import INV_TX
+from quantum_crypto.classical_integration.simulator import Simulator, Link
+
+def test_topology_is_connected_with_the_requested_degree():
+    simulator = Simulator(12, degree=4, seed=5)
+    edges = simulator._topology()
+    assert len(edges) == 24 and all(a < b for a, b in edges)
+    reached, frontier = {0}, [0]
+    while frontier:
+        node = frontier.pop()
+        for a, b in edges:
+            for other in ((b,) if a == node else (a,) if b == node else ()):
+                if other not in reached:
+                    reached.add(other)
+                    frontier.append(other)
+    assert reached == set(range(12))
+
+def test_link_validation():
+    with pytest.raises(ValueError):
+        Link(drop=1.5)
+    with pytest.raises(ValueError):
+        Link(latency=-1)
+
+def test_load_reaches_every_node_with_link_latency(tmp_path):
+    """Test the report on a small network whose links each add 30ms"""
+    with Simulator(6, degree=3, latency=0.03, seed=1, directory=str(tmp_path)) as simulator:
+        report = simulator.run_load(20, rate=200, timeout=10)
+        assert report['delivered'] == 1.0 and report['complete'] == 20
+        # inv, getdata and tx each cross a link
+        assert report['latency_p50'] >= 3 * 0.03
+        assert report['throughput'] > 0
+        assert simulator.converge_block(origin=2, timeout=10) is not None
+
+def test_dropping_link_is_routed_around(tmp_path):
+    """Test a transaction reaches node 1 through node 2 when the 0-1 link loses everything"""
+    with Simulator(3, edges=[(0, 1), (1, 2), (0, 2)], seed=1, directory=str(tmp_path)) as simulator:
+        simulator.set_link(0, 1, drop=1.0)
+        simulator.set_link(0, 2, latency=0.02)
+        simulator.set_link(1, 2, latency=0.02)
+        report = simulator.run_load(3, timeout=10, origin=0)
+        assert report['delivered'] == 1.0
+        assert simulator.networks[1].dropped > 0
+        # Two hops of inv, getdata and tx
+        key = next(iter(simulator.networks[0].arrivals))
+        assert key[0] == INV_TX
+        assert simulator.networks[1].arrivals[key] - simulator.networks[0].arrivals[key] >= 6 * 0.02
@@ -0,0 +1,95 @@
+import pytest
+from quantum_crypto.classical_integration.node import Node
+from quantum_crypto.classical_integration.storage import FileStorage, create_storage
+from quantum_crypto.classical_integration.snapshot import export_snapshot, read_snapshot
+from quantum_crypto.classical_integration.transactions import create_transaction, transaction_id
+
+@pytest.fixture
+def seed_node(tmp_path):
+    node = Node(storage=FileStorage(str(tmp_path / 'seed.json')))
+    for i in range(4):
+        node.add_transaction(create_transaction('alice', 'bob', 10 + i, f'sig{i}'))
+        node.create_block()
+    return node
+
+def test_snapshot_round_trip(seed_node, tmp_path):
+    """Test a snapshot carries tip, hashes and balances at the chosen height"""
+    path = str(tmp_path / 'chain.snap')
+    export_snapshot(seed_node.storage, path, height=2)
+    snapshot = read_snapshot(path)
+
+    assert snapshot['height'] == 2
+    assert snapshot['hash'] == seed_node.storage.get_block_by_height(2)['quantum_proof']
+    assert snapshot['balances'] == {'alice': -33, 'bob': 33}
+    assert len(snapshot['blocks']) == 3
+
+def test_corrupt_snapshot_rejected(seed_node, tmp_path):
+    path = str(tmp_path / 'chain.snap')
+    seed_node.export_snapshot(path)
+    with open(path, 'r+b') as f:
+        f.seek(10)
+        f.write(b'\xff')
+    with pytest.raises(ValueError):
+        read_snapshot(path)
+
+@pytest.mark.parametrize('backend, name', [('file', 'fresh.json'), ('sqlite', 'fresh.db')])
+def test_bootstrap_new_node(seed_node, tmp_path, backend, name):
+    """Test a fresh node continues the chain from a snapshot"""
+    path = str(tmp_path / 'chain.snap')
+    seed_node.export_snapshot(path)
+    tip = seed_node.storage.get_tip()
+
+    node = Node(storage=create_storage(backend, str(tmp_path / name)))
+    node.bootstrap_from_snapshot(path)
+    assert node.storage.get_tip() == tip
+    assert node.get_balance('bob') == seed_node.get_balance('bob')
+    assert node.storage.get_block_by_hash(tip['hash']) is None  # body not copied
+    first_tx = seed_node.storage.get_block_by_height(0)['transactions'][0]
+    entry = node.storage.get_transaction(transaction_id(first_tx))
+    assert entry['block_height'] == 0 and entry['transaction'] is None
+    assert node.storage.height_of(tip['hash']) == tip['height']
+
+    node.add_transaction(create_transaction('bob', 'carol', 5, 'sig'))
+    block = node.create_block()
+    assert block['block_height'] == tip['height'] + 1
+    assert block['previous_hash'] == tip['hash']
+    node.storage.close()
+
+    reopened = create_storage(backend, str(tmp_path / name))
+    assert reopened.get_tip()['height'] == tip['height'] + 1
+    assert reopened.get_balance('carol') == 5
+    assert [b['block_height'] for b in reopened.iter_blocks()] == [tip['height'] + 1]
+    assert len(reopened.get_address_history('bob')) == 5
+
+def test_snapshot_only_into_empty_store(seed_node, tmp_path):
+    path = str(tmp_path / 'chain.snap')
+    seed_node.export_snapshot(path)
+    node = Node(storage_backend='sqlite', storage_path=str(tmp_path / 'busy.db'))
+    node.add_transaction(create_transaction('alice', 'bob', 1, 'sig'))
+    node.create_block()
+    with pytest.raises(ValueError):
+        node.bootstrap_from_snapshot(path)
+
+@pytest.mark.parametrize('part, step', [('state', 'snapshot'), ('tip', 'set_base')])
+def test_interrupted_bootstrap_can_be_redone(seed_node, tmp_path, monkeypatch, part, step):
+    """Test a crash before the import finishes leaves an empty store that imports again"""
+    path = str(tmp_path / 'chain.snap')
+    seed_node.export_snapshot(path)
+    tip = seed_node.storage.get_tip()
+    storage = FileStorage(str(tmp_path / 'fresh.json'))
+
+    def crash(*args):
+        raise OSError("power lost")
+    monkeypatch.setattr(getattr(storage, part), step, crash)
+    with pytest.raises(OSError):
+        storage.import_snapshot(path)
+    storage.close()
+
+    reopened = FileStorage(str(tmp_path / 'fresh.json'))
+    assert reopened.get_tip()['height'] == -1 and reopened.get_balance('bob') == 0
+    assert reopened.height_of(tip['hash']) is None
+    reopened.import_snapshot(path)
+    assert reopened.get_tip() == tip
+    assert reopened.get_balance('bob') == seed_node.get_balance('bob')
+    assert len(reopened.get_address_history('bob')) == 4
+    reopened.close()
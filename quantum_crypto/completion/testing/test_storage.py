@@ -1,6 +1,7 @@
 import pytest
-from src.classical_integration.storage import Storage
+from quantum_crypto.classical_integration.storage import Storage
 import os
+import shutil
 
 def test_blockchain_persistence():
     """Test blockchain data persistence"""
@@ -36,3 +37,4 @@ def cleanup():
     yield
     if os.path.exists('test_blockchain.json'):
         os.remove('test_blockchain.json')
+    shutil.rmtree('test_blockchain.chain', ignore_errors=True)
@@ -0,0 +1,154 @@
+import pytest
+from quantum_crypto.classical_integration.storage import create_storage, FileStorage, StorageBackend
+from quantum_crypto.classical_integration.sqlite_storage import SQLiteStorage
+from quantum_crypto.classical_integration.node import Node
+from quantum_crypto.classical_integration.serialization import encode_block, decode_binary_block
+from quantum_crypto.classical_integration.transactions import create_transaction, transaction_id
+
+def _block(proof, previous_hash='prev'):
+    return {'transactions': [create_transaction('alice', 'bob', 10, 'sig'),
+                             create_transaction('carol', 'alice', 5, 'sig2')],
+            'quantum_proof': proof, 'timestamp': 1, 'previous_hash': previous_hash}
+
+@pytest.fixture(params=['file', 'sqlite'])
+def storage(request, tmp_path):
+    path = str(tmp_path / ('chain.json' if request.param == 'file' else 'chain.db'))
+    backend = create_storage(request.param, path)
+    yield backend
+    backend.close()
+
+def test_backend_types(storage):
+    """Test the factory returns a StorageBackend implementation"""
+    assert isinstance(storage, StorageBackend)
+    assert isinstance(storage, (FileStorage, SQLiteStorage))
+
+def test_backend_round_trip(storage):
+    """Test both backends agree on the storage API"""
+    assert storage.get_last_block_hash() == 'GENESIS_HASH'
+    for i in range(4):
+        storage.append_block(_block(f'proof{i}', storage.get_last_block_hash()))
+
+    assert storage.get_tip()['height'] == 3
+    assert storage.get_last_block_hash() == 'proof3'
+    assert len(storage.get_blockchain()) == 4
+    assert storage.get_block_by_height(2)['previous_hash'] == 'proof1'
+    assert storage.get_block_by_hash('proof1')['block_height'] == 1
+    assert storage.get_block_by_hash('unknown') is None
+    assert [b['block_height'] for b in storage.iter_blocks(1, 3)] == [1, 2]
+
+def test_backend_headers(storage):
+    """Test headers and hash lookups used by chain sync"""
+    for i in range(3):
+        storage.append_block(_block(f'proof{i}', storage.get_last_block_hash()))
+    headers = list(storage.iter_headers(1))
+    assert [h['quantum_proof'] for h in headers] == ['proof1', 'proof2']
+    assert headers[0] == {'block_height': 1, 'timestamp': 1, 'tx_count': 2, 'previous_hash': 'proof0',
+                          'merkle_root': '', 'quantum_proof': 'proof1'}
+    assert storage.height_of('proof2') == 2 and storage.height_of('unknown') is None
+
+def test_block_payload_is_the_stored_encoding(storage):
+    """Test a block can be served to peers as its stored bytes, without a decode and re-encode"""
+    block = storage.append_block(_block('proof0'))
+    payload = storage.get_block_payload('proof0')
+    assert payload == encode_block(block)
+    assert decode_binary_block(payload)['quantum_proof'] == 'proof0'
+    assert storage.get_block_payload('unknown') is None
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_storage('tape')
+
+def test_sqlite_transaction_queries(tmp_path):
+    """Test transactions are queryable with SQL by sender and receiver"""
+    storage = SQLiteStorage(str(tmp_path / 'chain.db'))
+    storage.append_block(_block('proof0'))
+    storage.append_block(_block('proof1', 'proof0'))
+    rows = storage.conn.execute(
+        "SELECT height, amount FROM transactions WHERE receiver = ? ORDER BY height", ('alice',)
+    ).fetchall()
+    assert rows == [(0, 5.0), (1, 5.0)]
+    storage.close()
+
+    reopened = SQLiteStorage(str(tmp_path / 'chain.db'))
+    assert reopened.get_tip()['hash'] == 'proof1'
+
+def test_node_selects_backend(tmp_path):
+    """Test Node builds the configured storage backend"""
+    node = Node(storage_backend='sqlite', storage_path=str(tmp_path / 'node.db'))
+    assert isinstance(node.storage, SQLiteStorage)
+    node.add_transaction(create_transaction('alice', 'bob', 10, 'sig'))
+    block = node.create_block()
+    assert node.storage.get_last_block_hash() == block['quantum_proof']
+
+def test_transaction_lookup(storage):
+    """Test transactions are found by txid after being stored"""
+    block = _block('proof0')
+    storage.append_block(block)
+    txid = transaction_id(block['transactions'][1])
+
+    entry = storage.get_transaction(txid)
+    assert entry['block_height'] == 0
+    assert entry['position'] == 1
+    assert entry['transaction']['sender'] == 'carol'
+    assert storage.get_transaction('0' * 64) is None
+
+def test_address_history_pagination(storage):
+    """Test address history is returned newest first, one page at a time"""
+    for i in range(5):
+        storage.append_block(_block(f'proof{i}'))
+
+    history = storage.get_address_history('alice', limit=4)
+    assert [(e['block_height'], e['position']) for e in history] == [(4, 1), (4, 0), (3, 1), (3, 0)]
+    next_page = storage.get_address_history('alice', offset=4, limit=4)
+    assert [(e['block_height'], e['position']) for e in next_page] == [(2, 1), (2, 0), (1, 1), (1, 0)]
+    assert len(storage.get_address_history('bob', limit=None)) == 5
+    assert storage.get_address_history('nobody') == []
+
+def test_balances_follow_appends(storage):
+    """Test balances are updated as each block is stored"""
+    storage.append_block(_block('proof0'))
+    storage.append_block(_block('proof1'))
+    assert storage.get_balance('alice') == -10
+    assert storage.get_balance('bob') == 20
+    assert storage.get_balance('carol') == -10
+    assert storage.get_balance('nobody') == 0
+
+def test_balances_rebuilt_from_snapshot(tmp_path):
+    """Test restart loads the newest snapshot and replays only the tail"""
+    path = str(tmp_path / 'chain.json')
+    storage = FileStorage(path, snapshot_interval=2)
+    for i in range(5):
+        storage.append_block(_block(f'proof{i}'))
+    storage.close()
+
+    reopened = FileStorage(path, snapshot_interval=2)
+    assert reopened.state.height == 4
+    assert reopened.get_balance('bob') == 50
+    assert reopened.get_balance('alice') == -25
+
+def test_transaction_fee_is_kept(storage):
+    """Test a fee comes back from lookups, so the returned transaction hashes to its txid"""
+    paid = create_transaction('alice', 'bob', 10, 'sig', fee=2)
+    storage.append_block({'transactions': [paid], 'quantum_proof': 'proof0', 'timestamp': 1, 'previous_hash': 'prev'})
+    txid = transaction_id(paid)
+
+    entry = storage.get_transaction(txid)
+    assert entry['transaction']['fee'] == 2
+    assert transaction_id(entry['transaction']) == txid
+    assert storage.get_address_history('bob')[0]['transaction'] == entry['transaction']
+    storage.append_block(_block('proof1', 'proof0'))
+    assert 'fee' not in storage.get_address_history('carol')[0]['transaction']
+
+def test_sqlite_adds_fee_column(tmp_path):
+    """Test a database from before fees gains the column, filled from its blocks"""
+    path = str(tmp_path / 'chain.db')
+    storage = SQLiteStorage(path)
+    paid = create_transaction('alice', 'bob', 10, 'sig', fee=3)
+    storage.append_block({'transactions': [paid], 'quantum_proof': 'proof0', 'timestamp': 1, 'previous_hash': 'prev'})
+    with storage.conn:
+        storage.conn.execute("ALTER TABLE transactions DROP COLUMN fee")
+    storage.close()
+
+    reopened = SQLiteStorage(path)
+    assert reopened.get_transaction(transaction_id(paid))['transaction']['fee'] == 3
+    reopened.close()
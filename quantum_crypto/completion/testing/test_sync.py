@@ -0,0 +1,77 @@
+import socket
+import pytest
+from quantum_crypto.classical_integration import sync as sync_module
+from quantum_crypto.classical_integration.protocol import (
+    encode_message, encode_headers, encode_getheaders, decode_getheaders, ProtocolError, CMD_HEADERS
+)
+from quantum_crypto.classical_integration.sync import locator_heights
+from quantum_crypto.classical_integration.transactions import create_transaction
+from .conftest import wait_for
+
+def build_chain(node, blocks):
+    for height in range(blocks):
+        node.add_transaction(create_transaction('alice', 'bob', height + 1, f'sig{height}'))
+        node.create_block()
+
+@pytest.fixture
+def small_batches(monkeypatch):
+    # Force several header batches, a narrow window and few requests per peer
+    monkeypatch.setattr(sync_module, 'MAX_HEADERS_PER_MESSAGE', 16)
+    monkeypatch.setattr(sync_module, 'BLOCK_DOWNLOAD_WINDOW', 8)
+    monkeypatch.setattr(sync_module, 'MAX_BLOCKS_IN_FLIGHT', 2)
+
+def test_locator_is_dense_then_sparse():
+    assert locator_heights(-1) == []
+    assert locator_heights(5) == [5, 4, 3, 2, 1, 0]
+    heights = locator_heights(1000)
+    assert heights[:10] == list(range(1000, 990, -1)) and heights[-1] == 0
+    assert len(heights) < 25
+
+def test_getheaders_roundtrip():
+    locator = ['QPROOF_abc', 'GENESIS_HASH']
+    assert decode_getheaders(encode_getheaders(locator)) == locator
+    with pytest.raises(ProtocolError):
+        decode_getheaders(encode_getheaders(['x'] * 200))
+
+def test_fresh_node_syncs_from_two_peers(start_network, small_batches, monkeypatch):
+    """Test a new node fetches headers in batches and bodies from both peers"""
+    seed1, seed2 = start_network('seed1'), start_network('seed2')
+    build_chain(seed1.node, 40)
+    seed2.connect_to_peer('127.0.0.1', seed1.listen_port)
+    tip = seed1.node.storage.get_tip()
+    assert wait_for(lambda: seed2.node.storage.get_tip() == tip)
+
+    fresh = start_network('fresh')
+    # Hold sync back until both connections are up, so both peers are candidates from the start
+    start_sync = sync_module.ChainSync.peer_connected
+    monkeypatch.setattr(sync_module.ChainSync, 'peer_connected', lambda self, peer: None)
+    peers = [fresh.connect_to_peer('127.0.0.1', seed.listen_port) for seed in (seed1, seed2)]
+    for peer in peers:
+        fresh.loop.call_soon_threadsafe(start_sync, fresh.sync, peer)
+    assert wait_for(lambda: fresh.node.storage.get_tip() == tip)
+    assert fresh.node.get_balance('bob') == sum(range(1, 41))
+    stats = fresh.sync.stats
+    assert wait_for(lambda: stats['blocks_applied'] == 40)
+    assert len(stats['received_from']) == 2  # bodies came from both peers
+
+def test_new_block_follows_announcement(start_network):
+    seed, follower = start_network('seed'), start_network('follower')
+    follower.connect_to_peer('127.0.0.1', seed.listen_port)
+    build_chain(seed.node, 3)
+    block = seed.node.storage.get_block_by_height(2)
+    seed.broadcast_block(block)
+    assert wait_for(lambda: follower.node.storage.get_tip()['hash'] == block['quantum_proof'])
+
+def test_forged_header_disconnects(start_network):
+    seed = start_network('seed')
+    build_chain(seed.node, 1)
+    header = dict(seed.node.storage.get_block_by_height(0), timestamp=1.0)  # proof no longer matches
+    victim = start_network('victim')
+    sock = socket.create_connection(('127.0.0.1', victim.listen_port))
+    assert wait_for(lambda: len(victim.peers) == 1)
+    sock.sendall(encode_message(CMD_HEADERS, encode_headers([header])))
+    sock.settimeout(5)
+    while sock.recv(4096):
+        pass  # read until the victim hangs up
+    sock.close()
+    assert victim.node.storage.get_tip()['height'] == -1
@@ -0,0 +1,94 @@
+import pytest
+import numpy as np
+from quantum_crypto.classical_integration.node import Node
+from quantum_crypto.classical_integration.storage import FileStorage
+from quantum_crypto.classical_integration.serialization import encode_transaction
+from quantum_crypto.classical_integration.transactions import (
+    Transaction,
+    TransactionBatch,
+    create_transaction,
+    transaction_id
+)
+
+class TestTransactionModel:
+    @pytest.fixture
+    def tx(self):
+        return create_transaction('alice', 'bob', 10, 'sig')
+
+    def test_immutable(self, tx):
+        """Test transactions reject attribute changes"""
+        with pytest.raises(AttributeError):
+            tx.amount = 20
+        with pytest.raises(AttributeError):
+            tx.extra = 1
+
+    def test_serialization_cached(self, tx):
+        """Test canonical bytes and txid are computed once and match the dict form"""
+        as_dict = {'sender': 'alice', 'receiver': 'bob', 'amount': 10, 'signature': 'sig'}
+        assert tx.serialized is tx.serialized
+        assert tx.serialized == encode_transaction(as_dict)
+        assert tx.txid == transaction_id(tx) == transaction_id(as_dict)
+        assert tx['amount'] == 10 and tx.get('missing') is None
+        assert tx.to_dict() == as_dict
+
+    def test_from_bytes_keeps_encoding(self, tx):
+        decoded = Transaction.from_bytes(tx.serialized)
+        assert decoded == tx
+        assert decoded._serialized == tx.serialized
+        assert len({decoded, tx}) == 1
+
+    def test_node_passes_transactions_through(self, tmp_path):
+        """Test dicts are converted once and stored blocks reuse the cached txid"""
+        node = Node(storage=FileStorage(str(tmp_path / 'chain.json')))
+        node.add_transaction({'sender': 'alice', 'receiver': 'bob', 'amount': 5, 'signature': 'sig'})
+        tx = node.pending_transactions[0]
+        assert isinstance(tx, Transaction)
+        block = node.create_block()
+        assert block['transactions'][0] is tx
+        assert node.storage.get_transaction(tx.txid)['transaction'] == tx.to_dict()
+
+
+ROWS = [
+    ('alice', 'bob', 10, 'sig1'),
+    ('alice', 'carol', 2.5, 'sig2'),
+    ('', 'bob', 1, 'sig3'),
+    ('alice', None, 1, 'sig4'),
+    ('alice', 'bob', 0, 'sig5'),
+    ('alice', 'bob', -3.0, 'sig6'),
+    ('alice', 'bob', '7', 'sig7'),
+    ('alice', 'bob', 1, ''),
+    ('bob', 'alice', float('inf'), 'sig9'),
+]
+
+class TestTransactionBatch:
+    def test_validation_matches_create_transaction(self):
+        """Test the vectorized mask agrees with create_transaction row by row"""
+        batch = TransactionBatch.from_columns(*zip(*ROWS))
+        expected = []
+        for row in ROWS:
+            try:
+                create_transaction(*row)
+                expected.append(row[2] != float('inf'))  # encodable amounts only
+            except ValueError:
+                expected.append(False)
+        assert batch.valid_mask().tolist() == expected
+        with pytest.raises(ValueError, match="Transaction 2: Sender"):
+            batch.validate()
+
+    def test_round_trip_and_select(self):
+        transactions = [create_transaction(*row) for row in ROWS[:2]] * 3
+        batch = TransactionBatch.from_transactions(transactions)
+        assert len(batch) == 6
+        assert list(batch) == transactions
+        assert batch[1].amount == 2.5 and isinstance(batch[0].amount, int)
+        assert batch.amounts.tolist() == [10.0, 2.5] * 3
+
+        selected = batch.select(batch.amounts > 5)
+        assert list(selected) == [transactions[0]] * 3
+        selected.validate()
+
+    def test_numpy_amount_column(self):
+        batch = TransactionBatch.from_columns(['a'] * 4, ['b'] * 4, np.array([1, 2, 0, 4]), ['s'] * 4)
+        assert batch.valid_mask().tolist() == [True, True, False, True]
+        assert batch[3].txid == create_transaction('a', 'b', 4, 's').txid
+
@@ -1,6 +1,7 @@
 from quantum_crypto.classical_integration.node import Node
 from quantum_crypto.classical_integration.network import Network
 from quantum_crypto.classical_integration.transactions import create_transaction
+from quantum_crypto.config.config import PEER_ADDRESS_FILE
 import time
 
 def main():
@@ -8,7 +9,7 @@ def main():
     
     # Initialize node and network
     node = Node()
-    network = Network(node)
+    network = Network(node, address_file=PEER_ADDRESS_FILE)
     network.start_server()
     
     # Wait a moment for server to start
@@ -0,0 +1,127 @@
+import json
+import os
+import random
+
+from ..config.config import (
+    RECONNECT_BACKOFF_BASE, RECONNECT_BACKOFF_MAX, MISBEHAVIOR_BAN_SCORE, BAN_DURATION
+)
+
+UNKNOWN_RTT = 1.0  # seconds assumed for an address we have never pinged
+
+
+def address_key(host, port):
+    return f"{host}:{port}"
+
+
+class AddressBook:
+    """
+    Known peer addresses with what we have learned about them, mirrored to
+    a JSON file (if `path` is given) so a restarted node can reconnect
+    without seeds.
+
+    Each address keeps its failure count and the earliest time to retry
+    it: every failed or dropped connection doubles the wait, from
+    RECONNECT_BACKOFF_BASE up to RECONNECT_BACKOFF_MAX seconds, with
+    jitter so many nodes do not retry in step. A host whose misbehaviour
+    reaches MISBEHAVIOR_BAN_SCORE is banned for BAN_DURATION seconds.
+    Saves write a temp file and rename it, like `ChainTip`.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}  # "host:port" -> entry dict
+        self.banned = {}  # host -> unix time the ban ends
+        self.misbehavior = {}  # host -> accumulated penalty points
+        self.dirty = False
+        self._load()
+
+    def _load(self):
+        if self.path is None:
+            return
+        try:
+            with open(self.path, 'r') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.entries = {address_key(entry['host'], entry['port']): entry for entry in record['addresses']}
+        self.banned = record.get('banned', {})
+
+    def save(self):
+        if self.path is None or not self.dirty:
+            return
+        record = {'addresses': list(self.entries.values()), 'banned': self.banned}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(record, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def add(self, host, port):
+        """Remember an address; returns its key."""
+        key = address_key(host, port)
+        if key not in self.entries:
+            self.entries[key] = {'host': host, 'port': port, 'failures': 0, 'next_attempt': 0.0,
+                                 'last_success': None, 'rtt': None}
+            self.dirty = True
+        return key
+
+    def record_success(self, key, now):
+        entry = self.entries[key]
+        entry['failures'] = 0
+        entry['next_attempt'] = 0.0
+        entry['last_success'] = now
+        self.dirty = True
+
+    def record_failure(self, key, now):
+        """Count a failed or lost connection and push the next attempt back exponentially."""
+        entry = self.entries[key]
+        entry['failures'] += 1
+        delay = min(RECONNECT_BACKOFF_BASE * 2 ** (entry['failures'] - 1), RECONNECT_BACKOFF_MAX)
+        entry['next_attempt'] = now + delay * random.uniform(0.75, 1.0)
+        self.dirty = True
+
+    def record_rtt(self, key, rtt):
+        self.entries[key]['rtt'] = rtt
+        self.dirty = True
+
+    def penalize(self, host, points, now):
+        """Add misbehaviour points for `host`; returns True if that got it banned."""
+        score = self.misbehavior.get(host, 0) + points
+        if score < MISBEHAVIOR_BAN_SCORE:
+            self.misbehavior[host] = score
+            return False
+        self.misbehavior.pop(host, None)
+        self.banned[host] = now + BAN_DURATION
+        self.dirty = True
+        return True
+
+    def is_banned(self, host, now):
+        until = self.banned.get(host)
+        if until is None:
+            return False
+        if until <= now:
+            del self.banned[host]
+            self.dirty = True
+            return False
+        return True
+
+    def score(self, entry):
+        """Higher is better: fast, reliable and well-behaved addresses first."""
+        rtt = UNKNOWN_RTT if entry['rtt'] is None else entry['rtt']
+        return -rtt - entry['failures'] - self.misbehavior.get(entry['host'], 0) / MISBEHAVIOR_BAN_SCORE
+
+    def candidates(self, now, exclude=()):
+        """Addresses that may be dialled now, best first."""
+        ready = [(key, entry) for key, entry in self.entries.items()
+                 if key not in exclude and entry['next_attempt'] <= now and not self.is_banned(entry['host'], now)]
+        ready.sort(key=lambda item: self.score(item[1]), reverse=True)
+        return [key for key, _ in ready]
@@ -0,0 +1,91 @@
+import hashlib
+import os
+import struct
+
+from .sorted_index import SortedIndex
+
+# heights.idx: entry N holds the log position of block base_height + N -> O(1) seek
+HEIGHT_ENTRY = struct.Struct('>IQ')  # segment_id, offset
+# hashes.idx: 64-bit digest of quantum_proof -> height, looked up through sorted runs
+HASH_ENTRY = struct.Struct('>QQ')  # hash key, height
+
+
+def hash_key(block_hash):
+    return int.from_bytes(hashlib.blake2b(block_hash.encode(), digest_size=8).digest(), 'big')
+
+
+class BlockIndex:
+    """
+    Persistent height -> log position and hash -> height indexes.
+
+    Both files are derived data: they are flushed but not fsynced, and
+    `Storage` re-indexes any records the log holds beyond them on open.
+    Heights below `base_height` (bootstrapped from a snapshot) only have
+    hash entries. Hash lookups go through a `SortedIndex`, so opening does
+    not read every hash the chain has.
+    """
+
+    def __init__(self, directory, base_height=0):
+        self.base_height = base_height
+        self.height_path = os.path.join(directory, 'heights.idx')
+        self.hash_path = os.path.join(directory, 'hashes.idx')
+        self._heights = open(self.height_path, 'a+b')
+        self._truncate_partial(self._heights, HEIGHT_ENTRY.size)
+        self.count = os.path.getsize(self.height_path) // HEIGHT_ENTRY.size
+        self._hashes = SortedIndex(self.hash_path, HASH_ENTRY)
+        self._hashes.truncate(self.next_height)
+
+    @staticmethod
+    def _truncate_partial(f, entry_size):
+        size = os.fstat(f.fileno()).st_size
+        if size % entry_size:
+            f.truncate(size - size % entry_size)
+
+    @property
+    def next_height(self):
+        return self.base_height + self.count
+
+    def add(self, height, block_hash, position):
+        if height != self.next_height:
+            raise ValueError(f"Index expected height {self.next_height}, got {height}")
+        self._heights.write(HEIGHT_ENTRY.pack(*position))
+        self._heights.flush()
+        self._add_hash(height, block_hash)
+        self.count += 1
+
+    def add_pruned(self, height, block_hash):
+        """Record the hash of a block below `base_height` whose body is not stored."""
+        if height >= self.base_height:
+            raise ValueError(f"Height {height} is not below the index base {self.base_height}")
+        self._add_hash(height, block_hash)
+
+    def _add_hash(self, height, block_hash):
+        self._hashes.append([(hash_key(block_hash), height)])
+        self._hashes.compact()
+
+    def position(self, height):
+        """Return the (segment_id, offset) of the block at `height`, or None."""
+        if not self.base_height <= height < self.next_height:
+            return None
+        self._heights.seek((height - self.base_height) * HEIGHT_ENTRY.size)
+        return HEIGHT_ENTRY.unpack(self._heights.read(HEIGHT_ENTRY.size))
+
+    def height_of(self, block_hash):
+        """Return the candidate height for `block_hash`; callers confirm the match."""
+        entry = self._hashes.last(hash_key(block_hash))
+        return None if entry is None else entry[1]
+
+    def truncate(self, count):
+        """Keep only the first `count` log positions (the log lost its tail)."""
+        self._heights.truncate(count * HEIGHT_ENTRY.size)
+        self._hashes.truncate(self.base_height + count)
+        self.count = count
+
+    def sync(self):
+        """fsync both files, for callers that cannot rebuild them from the log."""
+        os.fsync(self._heights.fileno())
+        self._hashes.sync()
+
+    def close(self):
+        self._heights.close()
+        self._hashes.close()
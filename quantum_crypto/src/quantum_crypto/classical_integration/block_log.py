@@ -0,0 +1,218 @@
+import mmap
+import os
+import struct
+import time
+import zlib
+
+# Each record is: payload length (u32) | crc32 of payload (u32) | payload
+RECORD_HEADER = struct.Struct('>II')
+
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.log'
+DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024  # roll over to a new segment after 64 MiB
+
+FSYNC_ALWAYS = 'always'      # fsync after every append
+FSYNC_INTERVAL = 'interval'  # fsync at most once every `fsync_interval` seconds
+FSYNC_NEVER = 'never'        # leave flushing to the OS
+FSYNC_POLICIES = (FSYNC_ALWAYS, FSYNC_INTERVAL, FSYNC_NEVER)
+
+
+def segment_name(segment_id):
+    return f"{SEGMENT_PREFIX}{segment_id:08d}{SEGMENT_SUFFIX}"
+
+
+class BlockLog:
+    """
+    Append-only log of length-prefixed, checksummed records split over
+    numbered segment files. Only the newest segment is ever written to;
+    a torn record at its tail (e.g. after a crash) is truncated on open.
+    """
+
+    def __init__(self, directory, fsync_policy=FSYNC_ALWAYS, fsync_interval=1.0,
+                 segment_size=DEFAULT_SEGMENT_SIZE, resume_from=None):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+        self.directory = directory
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.segment_size = segment_size
+        self.count = 0
+        self.last_position = None  # (segment_id, offset) of the newest record
+        self._last_sync = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        self.segments = self._list_segments()
+        if not self.segments:
+            self.segments = [0]
+        self._recover(resume_from)
+        self._writer = open(self._segment_path(self.segments[-1]), 'ab')
+
+    def _list_segments(self):
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                segments.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+        return sorted(segments)
+
+    def _segment_path(self, segment_id):
+        return os.path.join(self.directory, segment_name(segment_id))
+
+    def _recover(self, resume_from=None):
+        """
+        Count records and truncate a torn tail left in the newest segment.
+
+        `resume_from` is a trusted (count, last_position) pair, e.g. from the
+        chain tip record; only records written after it are scanned.
+        """
+        start_segment, start_offset = self.segments[0], 0
+        if resume_from is not None and self._readable(resume_from[1]):
+            self.count, self.last_position = resume_from[0], tuple(resume_from[1])
+            start_segment, start_offset = self.record_end(*self.last_position)
+        for segment_id in self.segments:
+            if segment_id < start_segment:
+                continue
+            path = self._segment_path(segment_id)
+            if not os.path.exists(path):
+                open(path, 'wb').close()
+            end = start_offset if segment_id == start_segment else 0
+            for offset, payload in self._scan_segment(segment_id, end):
+                self.count += 1
+                self.last_position = (segment_id, offset)
+                end = offset + RECORD_HEADER.size + len(payload)
+            size = os.path.getsize(path)
+            if end < size:
+                if segment_id != self.segments[-1]:
+                    raise ValueError(f"Corrupt record in sealed segment {path} at offset {end}")
+                print(f"⚠️ Truncating torn tail of {path} ({size - end} bytes)")
+                with open(path, 'r+b') as f:
+                    f.truncate(end)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    def _readable(self, position):
+        segment_id, offset = position
+        if segment_id not in self.segments:
+            return False
+        try:
+            self.read(segment_id, offset)
+        except (OSError, ValueError, struct.error):
+            return False
+        return True
+
+    def _scan_segment(self, segment_id, start=0):
+        """Yield (offset, payload) for every intact record from `start` on."""
+        with open(self._segment_path(segment_id), 'rb') as f:
+            f.seek(start)
+            offset = start
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    return
+                length, checksum = RECORD_HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != checksum:
+                    return
+                yield offset, payload
+                offset += RECORD_HEADER.size + length
+
+    def append(self, payload):
+        """Append one record and return its (segment_id, offset)."""
+        if self._writer.tell() >= self.segment_size:
+            self._roll_segment()
+        offset = self._writer.tell()
+        self._writer.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)))
+        self._writer.write(payload)
+        self._writer.flush()
+        self._maybe_sync()
+        position = (self.segments[-1], offset)
+        self.count += 1
+        self.last_position = position
+        return position
+
+    def _roll_segment(self):
+        self._writer.flush()
+        os.fsync(self._writer.fileno())  # sealed segments must be durable
+        self._writer.close()
+        self.segments.append(self.segments[-1] + 1)
+        self._writer = open(self._segment_path(self.segments[-1]), 'ab')
+
+    def _maybe_sync(self):
+        if self.fsync_policy == FSYNC_ALWAYS:
+            self.sync()
+        elif self.fsync_policy == FSYNC_INTERVAL:
+            if time.monotonic() - self._last_sync >= self.fsync_interval:
+                self.sync()
+
+    def sync(self):
+        self._writer.flush()
+        os.fsync(self._writer.fileno())
+        self._last_sync = time.monotonic()
+
+    def read(self, segment_id, offset):
+        """Read the record payload stored at (segment_id, offset)."""
+        with open(self._segment_path(segment_id), 'rb') as f:
+            f.seek(offset)
+            length, checksum = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+            payload = f.read(length)
+        if zlib.crc32(payload) != checksum:
+            raise ValueError(f"Checksum mismatch in segment {segment_id} at offset {offset}")
+        return payload
+
+    def record_end(self, segment_id, offset):
+        """Return the position just past the record stored at (segment_id, offset)."""
+        with open(self._segment_path(segment_id), 'rb') as f:
+            f.seek(offset)
+            length, _ = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+        return segment_id, offset + RECORD_HEADER.size + length
+
+    def scan(self, start=None):
+        """Yield (segment_id, offset, payload) for every record from `start` on."""
+        segment_id, offset = start if start is not None else (self.segments[0], 0)
+        for current in list(self.segments):
+            if current < segment_id:
+                continue
+            for record_offset, payload in self._scan_segment(current, offset if current == segment_id else 0):
+                yield current, record_offset, payload
+
+    def __iter__(self):
+        for _, _, payload in self.scan():
+            yield payload
+
+    def iter_mapped(self, verify=True):
+        """
+        Yield each record payload as a memoryview into an mmap of its segment.
+
+        Nothing is copied out of the page cache. A segment's mapping is
+        released once the last view into it is dropped.
+        """
+        self._writer.flush()
+        for segment_id in list(self.segments):
+            with open(self._segment_path(segment_id), 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if not size:
+                    continue
+                mapped = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            view = memoryview(mapped)
+            payload = None
+            offset = 0
+            while offset + RECORD_HEADER.size <= size:
+                length, checksum = RECORD_HEADER.unpack_from(view, offset)
+                start = offset + RECORD_HEADER.size
+                if start + length > size:
+                    break
+                payload = view[start:start + length]
+                if verify and zlib.crc32(payload) != checksum:
+                    raise ValueError(f"Checksum mismatch in segment {segment_id} at offset {offset}")
+                yield payload
+                offset = start + length
+            del payload
+            view.release()
+            try:
+                mapped.close()
+            except BufferError:
+                pass  # the caller still holds views; the mapping closes with them
+
+    def close(self):
+        if not self._writer.closed:
+            if self.fsync_policy != FSYNC_NEVER:
+                self.sync()
+            self._writer.close()
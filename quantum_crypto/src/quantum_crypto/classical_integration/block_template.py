@@ -0,0 +1,124 @@
+import heapq
+
+from ..quantum_currency.quantum_block import assemble_quantum_block
+from ..quantum_currency.quantum_merkle_tree import MerkleAccumulator
+from .serialization import entry_size, key_size, ref_size
+
+
+class BlockTemplate:
+    """
+    Contents of the next block, kept up to date as transactions arrive.
+
+    Each `add` folds the transaction into a running merkle root, encoded
+    size (counting each sender and receiver once, as blocks do) and fee total, so `seal` only has to finish the root (O(log n))
+    and generate the proof, however large the mempool has grown.
+
+    With a `rank` function (higher is better, e.g. `Mempool.rank`) a full
+    template can still take a better transaction: `offer` drops the
+    lowest-ranked one, together with any later transactions of its sender
+    so each sender's order is kept, unless that one is from the offered
+    transaction's own sender. Dropping marks the merkle root stale;
+    it is rebuilt once, at the next `seal`.
+    """
+
+    def __init__(self, max_transactions, rank=None):
+        self.max_transactions = max_transactions
+        self.rank = rank
+        self.transactions = []
+        self.merkle = MerkleAccumulator()
+        self._entry_bytes = 0  # entries' encoded bytes besides their refs
+        self._parties = {}  # sender or receiver -> transactions naming it
+        self._party_bytes = 0
+        self.fee_total = 0
+        self._digests = set()
+        self._worst = []  # (rank, position, tx) heap over added transactions; dropped ones are skipped
+        self._added = 0
+        self._merkle_stale = False
+
+    @property
+    def size(self):
+        """Bytes the transactions add to the encoded block."""
+        return (self._entry_bytes + self._party_bytes
+                + 2 * ref_size(len(self._parties)) * len(self.transactions))
+
+    def _count_parties(self, tx, change):
+        for party in {tx.sender, tx.receiver}:
+            uses = self._parties.get(party, 0) + change
+            if uses == 0:
+                del self._parties[party]
+                self._party_bytes -= key_size(party)
+                continue
+            if uses == 1 and change > 0:
+                self._party_bytes += key_size(party)
+            self._parties[party] = uses
+
+    def __len__(self):
+        return len(self.transactions)
+
+    def __contains__(self, digest):
+        return digest in self._digests
+
+    def is_full(self):
+        return len(self.transactions) >= self.max_transactions
+
+    def add(self, tx):
+        """Append a `Transaction`; False if the template is full or already holds it."""
+        if self.is_full() or tx.digest in self._digests:
+            return False
+        self.transactions.append(tx)
+        self._digests.add(tx.digest)
+        if not self._merkle_stale:
+            self.merkle.append(tx.txid)
+        self._entry_bytes += entry_size(tx)
+        self._count_parties(tx, 1)
+        self.fee_total += tx.fee
+        if self.rank is not None:
+            heapq.heappush(self._worst, (self.rank(tx), self._added, tx))
+        self._added += 1
+        return True
+
+    def offer(self, tx):
+        """Add `tx`, making room if it outranks the lowest-ranked transaction; False if it stays out."""
+        if not self.is_full() or tx.digest in self._digests:
+            return self.add(tx)
+        if self.rank is None:
+            return False
+        while self._worst and self._worst[0][2].digest not in self._digests:
+            heapq.heappop(self._worst)
+        if not self._worst or self._worst[0][0] >= self.rank(tx):
+            return False
+        if self._worst[0][2].sender == tx.sender:
+            # Dropping it would take tx's own predecessor out with it
+            return False
+        self.discard([heapq.heappop(self._worst)[2]])
+        return self.add(tx)
+
+    def discard(self, transactions):
+        """Drop `transactions`, and every later transaction of their senders, from the template."""
+        dropped = {tx.digest for tx in transactions if tx.digest in self._digests}
+        if not dropped:
+            return
+        cut = set()  # senders whose remaining transactions must go too
+        kept = []
+        for tx in self.transactions:
+            if tx.digest in dropped or tx.sender in cut:
+                cut.add(tx.sender)
+                self._digests.discard(tx.digest)
+                self._entry_bytes -= entry_size(tx)
+                self._count_parties(tx, -1)
+                self.fee_total -= tx.fee
+            else:
+                kept.append(tx)
+        self.transactions = kept
+        self._merkle_stale = True
+
+    def seal(self, previous_hash):
+        """Return a proven block of the current contents; the template is left unchanged."""
+        if not self.transactions:
+            raise ValueError("Block template is empty")
+        if self._merkle_stale:
+            self.merkle = MerkleAccumulator()
+            for tx in self.transactions:
+                self.merkle.append(tx.txid)
+            self._merkle_stale = False
+        return assemble_quantum_block(list(self.transactions), self.merkle.root(), previous_hash)
@@ -0,0 +1,105 @@
+import json
+import os
+
+GENESIS_HASH = "GENESIS_HASH"
+
+
+class ChainTip:
+    """
+    In-memory chain tip (height, hash, timestamp) mirrored to `tip.json`.
+
+    The record also carries the log position of the tip block so the block
+    log can resume recovery from it instead of rescanning every segment.
+    Each save writes a temp file and renames it over the old one, so the
+    record on disk is always either the previous tip or the new one.
+
+    A node bootstrapped from a chain snapshot has no blocks below
+    `base_height`; `base` remembers the snapshot tip it started from.
+    `importing` is set while a legacy JSON chain is being copied in, so an
+    interrupted import is finished on the next start.
+    """
+
+    def __init__(self, directory, durable=True):
+        self.path = os.path.join(directory, 'tip.json')
+        self.durable = durable
+        self.height = -1
+        self.hash = GENESIS_HASH
+        self.timestamp = None
+        self.count = 0
+        self.position = None
+        self.base = None
+        self.importing = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.height = record['height']
+        self.hash = record['hash']
+        self.timestamp = record['timestamp']
+        self.count = record['count']
+        self.position = tuple(record['position']) if record['position'] else None
+        self.base = record.get('base')
+        self.importing = record.get('importing', False)
+
+    @property
+    def base_height(self):
+        return self.base['height'] + 1 if self.base else 0
+
+    @property
+    def resume_point(self):
+        """(count, last_position) for `BlockLog`, or None without a saved tip."""
+        if self.position is None:
+            return None
+        return self.count, self.position
+
+    def reset(self, durable=False):
+        """Return to the genesis tip, or to the snapshot tip for bootstrapped nodes."""
+        if self.base:
+            self.height, self.hash, self.timestamp = self.base['height'], self.base['hash'], self.base['timestamp']
+        else:
+            self.height, self.hash, self.timestamp = -1, GENESIS_HASH, None
+        self.count, self.position = 0, None
+        self._save(durable)
+
+    def set_base(self, height, block_hash, timestamp):
+        """Start an empty chain on top of a snapshot taken at `height`; always synced, whatever the policy."""
+        self.base = {'height': height, 'hash': block_hash, 'timestamp': timestamp}
+        self.reset(durable=True)
+
+    def mark_importing(self, importing):
+        """Record the start or end of a legacy import; always synced, whatever the policy."""
+        self.importing = importing
+        self._save(durable=True)
+
+    def update(self, block, count, position):
+        self.height = block['block_height']
+        self.hash = block['quantum_proof']
+        self.timestamp = block['timestamp']
+        self.count = count
+        self.position = tuple(position)
+        self._save()
+
+    def _save(self, durable=False):
+        record = {
+            'height': self.height,
+            'hash': self.hash,
+            'timestamp': self.timestamp,
+            'count': self.count,
+            'position': list(self.position) if self.position else None,
+            'base': self.base,
+            'importing': self.importing
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(record, f)
+            if self.durable or durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def as_dict(self):
+        return {'height': self.height, 'hash': self.hash, 'timestamp': self.timestamp}
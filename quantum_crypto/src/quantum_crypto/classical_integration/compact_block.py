@@ -0,0 +1,161 @@
+"""
+Compact block relay.
+
+A new block is announced as its header plus a 6-byte short id per
+transaction. The receiver matches short ids against its mempool, asks for
+only the transactions it lacks, and rebuilds the block locally, so a block
+the peer has mostly seen costs a few bytes per transaction instead of the
+full bodies:
+
+    cmpctblock  := header (see `protocol.pack_header`) | nonce u64
+                   | tx_count * short_id 6 bytes
+    getblocktxn := block_hash str | count u32 | count * index u32
+    blocktxn    := block_hash str | count u32 | count * (length u32 | transaction)
+
+Short ids are a keyed BLAKE2b of the txid digest. The key is derived from
+the block hash and the sender's nonce, so nobody can craft colliding
+transactions ahead of time. A collision that does happen is caught by the
+merkle root check, and the receiver falls back to fetching the full block.
+"""
+import hashlib
+import os
+import struct
+
+from .protocol import ProtocolError, pack_header, read_header, U64
+from .serialization import pack_str, read_str, U32
+from .transactions import Transaction
+
+SHORT_ID_SIZE = 6
+
+
+def short_id_key(block_hash, nonce):
+    return hashlib.sha256(pack_str(block_hash) + U64.pack(nonce)).digest()[:16]
+
+
+def short_id(key, digest):
+    return hashlib.blake2b(digest, digest_size=SHORT_ID_SIZE, key=key).digest()
+
+
+class CompactBlock:
+    __slots__ = ('header', 'nonce', 'short_ids')
+
+    def __init__(self, header, nonce, short_ids):
+        self.header = header
+        self.nonce = nonce
+        self.short_ids = short_ids
+
+    @property
+    def block_hash(self):
+        return self.header['quantum_proof']
+
+    @classmethod
+    def from_block(cls, block, nonce=None):
+        nonce = int.from_bytes(os.urandom(8), 'big') if nonce is None else nonce
+        key = short_id_key(block['quantum_proof'], nonce)
+        transactions = [Transaction.from_dict(tx) for tx in block['transactions']]
+        return cls(dict(block, transactions=transactions), nonce,
+                   [short_id(key, tx.digest) for tx in transactions])
+
+    def encode(self):
+        return pack_header(self.header) + U64.pack(self.nonce) + b''.join(self.short_ids)
+
+    @classmethod
+    def decode(cls, payload):
+        try:
+            header, offset = read_header(payload, 0)
+            (nonce,) = U64.unpack_from(payload, offset)
+            offset += U64.size
+        except (IndexError, struct.error, UnicodeDecodeError, ValueError) as e:
+            raise ProtocolError(f"Malformed compact block: {e}")
+        if len(payload) - offset != header['tx_count'] * SHORT_ID_SIZE:
+            raise ProtocolError("Compact block short ids do not match its transaction count")
+        short_ids = [bytes(payload[start:start + SHORT_ID_SIZE])
+                     for start in range(offset, len(payload), SHORT_ID_SIZE)]
+        return cls(header, nonce, short_ids)
+
+
+class PartialBlock:
+    """A compact block being filled in from the mempool and then from the announcing peer."""
+
+    def __init__(self, compact, transactions):
+        self.header = compact.header
+        key = short_id_key(compact.block_hash, compact.nonce)
+        positions = {}
+        for index, sid in enumerate(compact.short_ids):
+            positions.setdefault(sid, []).append(index)
+        self.slots = [None] * len(compact.short_ids)
+        ambiguous = set()
+        for tx in transactions:
+            for index in positions.get(short_id(key, tx.digest), ()):
+                if self.slots[index] is not None:
+                    ambiguous.add(index)  # two pooled transactions share this short id
+                self.slots[index] = tx
+        for index in ambiguous:
+            self.slots[index] = None
+
+    @property
+    def block_hash(self):
+        return self.header['quantum_proof']
+
+    def missing(self):
+        return [index for index, tx in enumerate(self.slots) if tx is None]
+
+    def fill(self, transactions):
+        """Place the transactions a `blocktxn` answered with, in `missing()` order."""
+        missing = self.missing()
+        if len(transactions) != len(missing):
+            raise ProtocolError(f"Expected {len(missing)} block transactions, got {len(transactions)}")
+        for index, tx in zip(missing, transactions):
+            self.slots[index] = tx
+
+    def to_block(self):
+        block = {field: self.header[field] for field in
+                 ('timestamp', 'previous_hash', 'merkle_root', 'quantum_proof', 'block_height')}
+        block['transactions'] = list(self.slots)
+        return block
+
+
+def encode_getblocktxn(block_hash, indexes):
+    return pack_str(block_hash) + U32.pack(len(indexes)) + b''.join(U32.pack(index) for index in indexes)
+
+
+def decode_getblocktxn(payload):
+    try:
+        block_hash, offset = read_str(payload, 0)
+        (count,) = U32.unpack_from(payload, offset)
+        offset += U32.size
+        if len(payload) - offset != count * U32.size:
+            raise ProtocolError("getblocktxn index count does not match its length")
+        indexes = [index for (index,) in U32.iter_unpack(payload[offset:])]
+    except (IndexError, struct.error, UnicodeDecodeError, ValueError) as e:
+        raise ProtocolError(f"Malformed getblocktxn message: {e}")
+    return block_hash, indexes
+
+
+def encode_blocktxn(block_hash, transactions):
+    parts = [pack_str(block_hash), U32.pack(len(transactions))]
+    for tx in transactions:
+        encoded = Transaction.from_dict(tx).serialized
+        parts.append(U32.pack(len(encoded)))
+        parts.append(encoded)
+    return b''.join(parts)
+
+
+def decode_blocktxn(payload):
+    try:
+        block_hash, offset = read_str(payload, 0)
+        (count,) = U32.unpack_from(payload, offset)
+        offset += U32.size
+        transactions = []
+        for _ in range(count):
+            (length,) = U32.unpack_from(payload, offset)
+            offset += U32.size
+            if offset + length > len(payload):
+                raise ProtocolError("Truncated block transaction")
+            transactions.append(Transaction.from_bytes(payload[offset:offset + length]))
+            offset += length
+    except (IndexError, struct.error, UnicodeDecodeError, ValueError) as e:
+        raise ProtocolError(f"Malformed blocktxn message: {e}")
+    if offset != len(payload):
+        raise ProtocolError("Trailing bytes after blocktxn")
+    return block_hash, transactions
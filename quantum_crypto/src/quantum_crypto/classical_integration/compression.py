@@ -0,0 +1,87 @@
+"""
+Per-connection payload compression for large messages.
+
+Each side lists the codecs it can decode in its `version` message. A
+sender then compresses block and sync payloads of at least the
+connection's threshold with the first codec from its own preference list
+that the peer also listed:
+
+    compressed := codec u8 | command 12 bytes (NUL padded) | compressed payload
+
+Payloads are sent raw when they are small, when compressing does not make
+them smaller, or when the peers share no codec. Transaction, inv and
+ping traffic is never compressed, so small messages cost no extra CPU.
+zstd is used when the optional `zstandard` package is installed;
+otherwise zlib.
+"""
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # optional: pip install quantum_crypto[compression]
+    zstandard = None
+
+from .protocol import ProtocolError, CMD_BLOCK, CMD_HEADERS, CMD_BLOCKTXN
+
+CODEC_ZSTD = 'zstd'
+CODEC_ZLIB = 'zlib'
+CODEC_IDS = {CODEC_ZLIB: 1, CODEC_ZSTD: 2}
+CODEC_NAMES = {codec_id: name for name, codec_id in CODEC_IDS.items()}
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+COMMAND_SIZE = 12
+# Block-sized payloads full of repeated pubkeys; everything else is small or random
+COMPRESSIBLE_COMMANDS = frozenset((CMD_BLOCK, CMD_HEADERS, CMD_BLOCKTXN))
+
+
+def available_codecs(preferred):
+    """The codecs in `preferred` this interpreter can actually use, in order."""
+    return [codec for codec in preferred
+            if codec == CODEC_ZLIB or (codec == CODEC_ZSTD and zstandard is not None)]
+
+
+def negotiate(ours, theirs):
+    """First codec from our preference list that the peer can decode, or None."""
+    return next((codec for codec in ours if codec in theirs), None)
+
+
+def compress(codec, data):
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return zlib.compress(data, ZLIB_LEVEL)
+
+
+def decompress(codec, data, max_size):
+    """Decompress `data`, refusing output over `max_size` bytes (a compression bomb)."""
+    try:
+        if codec == CODEC_ZSTD:
+            size = zstandard.frame_content_size(data)
+            if size < 0 or size > max_size:
+                raise ProtocolError("Compressed payload has no size or exceeds the message limit")
+            return zstandard.ZstdDecompressor().decompress(data, max_output_size=max_size)
+        decompressor = zlib.decompressobj()
+        output = decompressor.decompress(data, max_size)
+        if decompressor.unconsumed_tail:
+            raise ProtocolError("Compressed payload exceeds the message limit")
+        if not decompressor.eof:
+            raise ProtocolError("Truncated compressed payload")
+        return output
+    except ProtocolError:
+        raise
+    except Exception as e:  # zlib.error, zstandard.ZstdError
+        raise ProtocolError(f"Corrupt {codec} payload: {e}")
+
+
+def encode_compressed(codec, command, data):
+    return bytes((CODEC_IDS[codec],)) + command.encode().ljust(COMMAND_SIZE, b'\0') + data
+
+
+def decode_compressed(payload, accepted, max_size):
+    """Return (command, payload) from a `compressed` message using one of the `accepted` codecs."""
+    if len(payload) < 1 + COMMAND_SIZE:
+        raise ProtocolError("Truncated compressed message")
+    codec = CODEC_NAMES.get(payload[0])
+    if codec not in accepted:
+        raise ProtocolError(f"Payload compressed with a codec we did not offer ({payload[0]})")
+    command = bytes(payload[1:1 + COMMAND_SIZE]).rstrip(b'\0').decode('ascii', 'replace')
+    return command, decompress(codec, payload[1 + COMMAND_SIZE:], max_size)
@@ -0,0 +1,187 @@
+import heapq
+import itertools
+
+from ..config.config import MEMPOOL_POLICY, MEMPOOL_MAX_COUNT, MEMPOOL_MAX_BYTES
+from .transactions import Transaction
+
+POLICY_FEE = 'fee'
+POLICY_ARRIVAL = 'arrival'
+ENTRY_OVERHEAD = 400  # estimated bytes per pooled transaction beyond its encoding
+
+
+class MempoolEntry:
+    __slots__ = ('tx', 'sequence', 'size', 'fee_rate', 'prev', 'next')
+
+    def __init__(self, tx, sequence):
+        self.tx = tx
+        self.sequence = sequence
+        self.size = len(tx.serialized) + ENTRY_OVERHEAD
+        self.fee_rate = tx.fee / len(tx.serialized)
+        # Neighbours in the sender's chain of pending transactions, oldest first
+        self.prev = None
+        self.next = None
+
+
+class Mempool:
+    """
+    Pending transactions indexed by txid and chained per sender.
+
+    A sender's transactions go into blocks in the order they arrived, so
+    only the oldest pending transaction of each sender is "ready". Ready
+    transactions sit in a heap ranked by `policy` ('fee': highest fee per
+    byte first, 'arrival': FIFO), and `select` pushes each sender's next
+    transaction as its predecessor is taken, which keeps selecting k
+    transactions at O(k log n). A second heap ranks every transaction the
+    other way round for eviction when the count or memory cap is exceeded;
+    evicting a transaction also evicts the later ones from its sender.
+
+    Both heaps delete lazily: removed entries are skipped when popped and
+    the heaps are rebuilt once stale items outnumber live ones.
+    """
+
+    def __init__(self, policy=MEMPOOL_POLICY, max_count=MEMPOOL_MAX_COUNT, max_bytes=MEMPOOL_MAX_BYTES):
+        if policy not in (POLICY_FEE, POLICY_ARRIVAL):
+            raise ValueError(f"Unknown mempool policy: {policy}")
+        self.policy = policy
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.evicted = 0
+        self._entries = {}  # txid digest -> entry, in arrival order
+        self._sender_tails = {}  # sender -> newest pending entry
+        self._ready = []  # (priority, entry) for sender heads, best first
+        self._evictable = []  # (eviction key, entry) for all entries, worst first
+        self._sequence = itertools.count()
+
+    def _priority(self, entry):
+        if self.policy == POLICY_FEE:
+            return (-entry.fee_rate, entry.sequence)
+        return (entry.sequence,)
+
+    def _eviction_key(self, entry):
+        if self.policy == POLICY_FEE:
+            return (entry.fee_rate, -entry.sequence)
+        return (-entry.sequence,)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, txid):
+        return self._key(txid) in self._entries
+
+    @staticmethod
+    def _key(txid):
+        return bytes.fromhex(txid) if isinstance(txid, str) else txid
+
+    def get(self, txid):
+        """Return the pending transaction with `txid` (hex or digest), or None."""
+        entry = self._entries.get(self._key(txid))
+        return entry.tx if entry else None
+
+    def rank(self, transaction):
+        """How strongly a pending transaction is kept: the lowest rank is evicted first."""
+        return self._eviction_key(self._entries[Transaction.from_dict(transaction).digest])
+
+    def previous(self, transaction):
+        """The sender's pending transaction just before this pending one, or None."""
+        entry = self._entries.get(Transaction.from_dict(transaction).digest)
+        return entry.prev.tx if entry is not None and entry.prev is not None else None
+
+    def transactions(self):
+        """Pending transactions in arrival order."""
+        return [entry.tx for entry in self._entries.values()]
+
+    def add(self, transaction):
+        """
+        Add a transaction. Returns False if it is already pending or the pool
+        is full of transactions that outrank it.
+        """
+        tx = Transaction.from_dict(transaction)
+        if tx.digest in self._entries:
+            return False
+        entry = MempoolEntry(tx, next(self._sequence))
+        tail = self._sender_tails.get(tx.sender)
+        if tail is not None:
+            tail.next = entry
+            entry.prev = tail
+        self._sender_tails[tx.sender] = entry
+        self._entries[tx.digest] = entry
+        self.total_bytes += entry.size
+        if entry.prev is None:
+            heapq.heappush(self._ready, (self._priority(entry), entry))
+        heapq.heappush(self._evictable, (self._eviction_key(entry), entry))
+        self._enforce_limits()
+        return tx.digest in self._entries
+
+    def select(self, limit):
+        """
+        Return up to `limit` transactions in priority order without removing
+        them, never placing a transaction before an older one from its sender.
+        """
+        taken = []
+        taken_ids = set()
+        while self._ready and len(taken) < limit:
+            _, entry = heapq.heappop(self._ready)
+            if not self._is_live(entry) or id(entry) in taken_ids:
+                continue
+            if entry.prev is not None and id(entry.prev) not in taken_ids:
+                continue  # not ready; pushed again when its predecessor leaves
+            taken.append(entry)
+            taken_ids.add(id(entry))
+            if entry.next is not None:
+                heapq.heappush(self._ready, (self._priority(entry.next), entry.next))
+        # Everything taken is still pending until `remove` is called
+        for entry in taken:
+            heapq.heappush(self._ready, (self._priority(entry), entry))
+        return [entry.tx for entry in taken]
+
+    def remove(self, transactions):
+        """Drop transactions that made it into a block; unknown ones are ignored."""
+        for transaction in transactions:
+            entry = self._entries.get(Transaction.from_dict(transaction).digest)
+            if entry is not None:
+                self._discard(entry)
+        self._compact()
+
+    def _is_live(self, entry):
+        return self._entries.get(entry.tx.digest) is entry
+
+    def _discard(self, entry):
+        del self._entries[entry.tx.digest]
+        self.total_bytes -= entry.size
+        prev, nxt = entry.prev, entry.next
+        if prev is not None:
+            prev.next = nxt
+        if nxt is not None:
+            nxt.prev = prev
+            if prev is None:
+                heapq.heappush(self._ready, (self._priority(nxt), nxt))
+        if self._sender_tails.get(entry.tx.sender) is entry:
+            if prev is None:
+                del self._sender_tails[entry.tx.sender]
+            else:
+                self._sender_tails[entry.tx.sender] = prev
+        entry.prev = entry.next = None
+
+    def _enforce_limits(self):
+        while self._entries and (len(self._entries) > self.max_count or self.total_bytes > self.max_bytes):
+            _, entry = heapq.heappop(self._evictable)
+            if not self._is_live(entry):
+                continue
+            # Later transactions from the same sender depend on this one
+            while entry is not None:
+                nxt = entry.next
+                self._discard(entry)
+                self.evicted += 1
+                entry = nxt
+        self._compact()
+
+    def _compact(self):
+        """Rebuild the heaps once they hold more stale items than live ones."""
+        if len(self._ready) > 2 * len(self._entries) + 64:
+            self._ready = [(self._priority(entry), entry) for entry in self._entries.values()
+                           if entry.prev is None]
+            heapq.heapify(self._ready)
+        if len(self._evictable) > 2 * len(self._entries) + 64:
+            self._evictable = [(self._eviction_key(entry), entry) for entry in self._entries.values()]
+            heapq.heapify(self._evictable)
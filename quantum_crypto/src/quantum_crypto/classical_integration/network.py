@@ -1,63 +1,754 @@
+import asyncio
+import os
 import socket
 import threading
+import time
+from collections import deque
+
+from ..config.config import (
+    DEFAULT_HOST, DEFAULT_PORT, LISTEN_BACKLOG, CONNECT_TIMEOUT,
+    RELAY_SEEN_CAPACITY, PEER_KNOWN_CAPACITY, GETDATA_TIMEOUT, GETDATA_ALTERNATES, BLOCKTXN_TIMEOUT,
+    SEND_QUEUE_POLICY, SEND_QUEUE_MAX_MESSAGES, SEND_QUEUE_MAX_BYTES, WRITE_BUFFER_HIGH_WATER,
+    INV_BATCH_SIZE, INV_FLUSH_INTERVAL, COMPRESSION_CODECS, COMPRESSION_THRESHOLD, MAX_MESSAGE_SIZE,
+    TARGET_OUTBOUND_PEERS, RATE_LIMIT_POLICY, RATE_LIMIT_MAX_DELAY, MESSAGE_RATE_LIMITS
+)
+from .address_book import AddressBook
+from .peer_manager import PeerManager, PENALTY_PROTOCOL, PENALTY_INVALID, PENALTY_FLOOD, PENALTY_UNKNOWN
+from .rate_limit import PeerBudget, UNKNOWN_COMMAND
+from .protocol import (
+    FrameDecoder, ProtocolError, MESSAGE_HEADER, encode_message, encode_inv, decode_inv, encode_headers, decode_headers,
+    encode_nonce, decode_nonce, block_inv_id, decode_getheaders,
+    CMD_TX, CMD_BLOCK, CMD_INV, CMD_GETDATA, CMD_HEADERS, CMD_GETHEADERS, CMD_PING, CMD_PONG,
+    CMD_CMPCTBLOCK, CMD_GETBLOCKTXN, CMD_BLOCKTXN, CMD_VERSION, CMD_COMPRESSED, INV_TX, INV_BLOCK,
+    encode_version, decode_version
+)
+from .compression import (
+    COMPRESSIBLE_COMMANDS, available_codecs, negotiate, compress, encode_compressed, decode_compressed
+)
+from .compact_block import (
+    CompactBlock, PartialBlock, encode_getblocktxn, decode_getblocktxn, encode_blocktxn, decode_blocktxn
+)
+from .seen_set import SeenSet
+from .serialization import BLOCK_VERSION, encode_block, decode_block, decode_binary_block
+from .sync import ChainSync
+from .transactions import Transaction
+from ..quantum_currency.quantum_block import compute_block_proof
+
+QUEUE_DROP = 'drop'
+QUEUE_DISCONNECT = 'disconnect'
+RATE_LIMIT_THROTTLE = 'throttle'
+RATE_LIMIT_DISCONNECT = 'disconnect'
+LATENCY_SMOOTHING = 0.1  # weight of the newest sample in the send latency average
+WRITE_COALESCE_BYTES = 64 * 1024  # queued messages joined into one transport write
+
+
+class Peer(asyncio.BufferedProtocol):
+    """
+    One peer connection, driven by the network's event loop. Incoming bytes
+    are read straight into the frame decoder's buffer; `send` and `close`
+    may be called from any thread.
+
+    Outgoing messages wait in a bounded queue that the loop drains into the
+    transport until its write buffer passes the high-water mark, then
+    resumes when the socket catches up. A slow peer therefore only backs up
+    its own queue; once that is full the network's policy either drops the
+    message or disconnects the peer. Messages queued in the same loop pass
+    go out in one write, and transaction announcements wait in
+    `pending_inv` to be sent as one inv (see `Network._announce`). Large
+    block and sync payloads are compressed with `codec` once the version
+    handshake has agreed on one.
+    """
+
+    def __init__(self, network, outbound):
+        self.network = network
+        self.outbound = outbound
+        self.decoder = FrameDecoder()
+        self.transport = None
+        self.address = None
+        self.closed = False
+        self.lost = network.loop.create_future()
+        # Inventory this peer already has (announced it, sent it, or got it from us)
+        self.known = SeenSet(PEER_KNOWN_CAPACITY)
+        self.queue = deque()  # (message bytes, time queued)
+        self.queued_bytes = 0
+        self.paused = False
+        self._drain_scheduled = False
+        self.pending_inv = []
+        self.inv_timer = None
+        self.version = None  # the peer's protocol version, once its version message arrives
+        self.codec = None  # compression codec for payloads we send
+        self.address_key = None  # address book entry, for peers we can dial
+        self.rtt = None  # smoothed ping round-trip time in seconds
+        self.ping_nonce = None  # nonce of the unanswered ping, if any
+        self.last_ping = float('-inf')
+        self.misbehavior = 0
+        self.budget = PeerBudget(network.message_rate_limits)
+        self.throttled = False  # reading is paused until the budget recovers
+        self.stats = {'sent_messages': 0, 'sent_bytes': 0, 'writes': 0, 'dropped_messages': 0, 'max_queue_depth': 0,
+                      'send_latency': 0.0, 'max_send_latency': 0.0, 'compressed_messages': 0,
+                      'compression_saved_bytes': 0, 'throttled': 0}
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.address = transport.get_extra_info('peername')
+        transport.set_write_buffer_limits(high=WRITE_BUFFER_HIGH_WATER)
+        if self.outbound:
+            # The connecting side speaks first; inbound peers answer in `_on_version`
+            self.send_version()
+        self.network._peer_connected(self)
+
+    def get_buffer(self, sizehint):
+        return self.decoder.get_buffer(sizehint)
+
+    def buffer_updated(self, nbytes):
+        try:
+            for command, payload in self.decoder.buffer_updated(nbytes):
+                if self.closed:
+                    return
+                self.network.handle_message(self, command, payload)
+        except ProtocolError as e:
+            print(f"⚠️ Disconnecting {self.address}: {e}")
+            self.network.peer_manager.penalize(self, PENALTY_PROTOCOL, str(e))
+            self.close()
+            return
+        self.network._enforce_budget(self)
+
+    def connection_lost(self, exc):
+        self.closed = True
+        self.queue.clear()
+        self.queued_bytes = 0
+        self.network._peer_lost(self)
+        if not self.lost.done():
+            self.lost.set_result(None)
+
+    def pause_writing(self):
+        self.paused = True
+
+    def resume_writing(self):
+        self.paused = False
+        self._drain()
+
+    def send(self, data):
+        if self.closed:
+            raise ConnectionError(f"Peer {self.address} is closed")
+        if self.network.on_loop_thread():
+            # Handlers reply from the loop itself; no need to wake it through the self-pipe
+            self._enqueue(data, time.monotonic())
+        else:
+            self.network._call_soon(self._enqueue, data, time.monotonic())
+
+    def send_message(self, command, payload=b''):
+        codec = self.codec
+        if (codec is not None and command in COMPRESSIBLE_COMMANDS
+                and len(payload) >= self.network.compression_threshold):
+            compressed = encode_compressed(codec, command, compress(codec, payload))
+            if len(compressed) < len(payload):
+                self.stats['compressed_messages'] += 1
+                self.stats['compression_saved_bytes'] += len(payload) - len(compressed)
+                command, payload = CMD_COMPRESSED, compressed
+        self.send(encode_message(command, payload))
+
+    def send_version(self):
+        self.send_message(CMD_VERSION, encode_version(self.network.compression_codecs, self.network.listen_port))
+
+    def _enqueue(self, data, queued_at):
+        if self.closed:
+            return
+        network = self.network
+        if (len(self.queue) >= network.queue_max_messages
+                or self.queued_bytes + len(data) > network.queue_max_bytes):
+            self.stats['dropped_messages'] += 1
+            if network.queue_policy == QUEUE_DISCONNECT:
+                print(f"⚠️ Disconnecting {self.address}: send queue full")
+                self.close(abort=True)
+            return
+        self.queue.append((data, queued_at))
+        self.queued_bytes += len(data)
+        self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], len(self.queue))
+        if not self._drain_scheduled:
+            # Drain after this loop pass so everything queued meanwhile shares a write
+            self._drain_scheduled = True
+            self.network.loop.call_soon(self._drain)
+
+    def _drain(self):
+        self._drain_scheduled = False
+        stats = self.stats
+        while self.queue and not self.paused and not self.transport.is_closing():
+            chunk, queued = [], []
+            size = 0
+            while self.queue and (not chunk or size + len(self.queue[0][0]) <= WRITE_COALESCE_BYTES):
+                data, queued_at = self.queue.popleft()
+                chunk.append(data)
+                queued.append(queued_at)
+                size += len(data)
+            self.queued_bytes -= size
+            # May call pause_writing, which ends the loop
+            self.transport.write(b''.join(chunk) if len(chunk) > 1 else chunk[0])
+            now = time.monotonic()
+            for queued_at in queued:
+                latency = now - queued_at
+                stats['send_latency'] += (latency - stats['send_latency']) * LATENCY_SMOOTHING
+                stats['max_send_latency'] = max(stats['max_send_latency'], latency)
+            stats['sent_messages'] += len(chunk)
+            stats['sent_bytes'] += size
+            stats['writes'] += 1
+
+    def metrics(self):
+        """Queue depth and send statistics; `send_latency` is a moving average in seconds."""
+        return dict(self.stats, address=self.address, queue_depth=len(self.queue),
+                    queued_bytes=self.queued_bytes, paused=self.paused, rtt=self.rtt, misbehavior=self.misbehavior,
+                    costs={command: list(cost) for command, cost in self.budget.costs.items()})
+
+    def close(self, abort=False):
+        """Close the connection; `abort` discards unsent data instead of flushing it."""
+        if not self.closed:
+            self.closed = True
+            self.network._call_soon(self.transport.abort if abort else self.transport.close)
+
+    def __repr__(self):
+        return f"Peer({self.address}, {'outbound' if self.outbound else 'inbound'})"
+
 
 class Network:
-    def __init__(self, node):
+    """
+    Peer-to-peer networking on a single asyncio event loop.
+
+    The loop runs in one background thread and multiplexes the listening
+    socket and every peer connection, so thousands of peers cost no more
+    threads than one. The public methods are synchronous and safe to call
+    from any thread; they hand work to the loop and wait for the result
+    where one is needed. Framed messages (see `protocol.py`) are dispatched
+    to `_on_<command>` handlers, which call into the node.
+
+    Transactions and blocks are relayed by inventory: a node announces
+    ids with `inv`, and peers fetch only the objects they lack with
+    `getdata`; if the answer does not come within `getdata_timeout`, the
+    next peer that announced the object is asked. A bounded seen-set stops objects from being fetched or
+    relayed twice, and each peer's known-set stops them from being echoed
+    back. Each object body therefore crosses each link at most once,
+    however many peers there are. All relay state lives on the loop thread.
+    New blocks are pushed as compact blocks (see `compact_block.py`) that
+    peers rebuild from their mempools; if the missing transactions are not
+    sent within `blocktxn_timeout`, or another peer announces the block
+    meanwhile, the full block is fetched instead. Blocks a node is missing are fetched
+    headers-first by `ChainSync`; a block inv only prompts a getheaders.
+
+    Sends never block the caller: each peer has its own bounded queue (see
+    `Peer`), and `queue_policy` decides what happens when one fills up.
+    Every message is charged to its peer's `PeerBudget` (message rate per
+    command, bytes and handler time). A peer over budget stops being read
+    until it is back within it, or is disconnected, per `rate_limit_policy`,
+    so one flooding peer cannot starve the others of the loop.
+    Which peers we dial, and whom we ban, is up to the `PeerManager`; the
+    addresses it knows persist in `address_file` when one is given.
+    Transaction announcements are batched per peer: an inv goes out once
+    `inv_batch_size` ids are waiting or `inv_flush_interval` seconds after
+    the first, whichever comes first.
+    """
+
+    def __init__(self, node, queue_policy=SEND_QUEUE_POLICY, queue_max_messages=SEND_QUEUE_MAX_MESSAGES,
+                 queue_max_bytes=SEND_QUEUE_MAX_BYTES, inv_batch_size=INV_BATCH_SIZE,
+                 inv_flush_interval=INV_FLUSH_INTERVAL, compression_codecs=COMPRESSION_CODECS,
+                 compression_threshold=COMPRESSION_THRESHOLD, address_file=None,
+                 target_outbound=TARGET_OUTBOUND_PEERS, rate_limit_policy=RATE_LIMIT_POLICY,
+                 message_rate_limits=MESSAGE_RATE_LIMITS, getdata_timeout=GETDATA_TIMEOUT,
+                 blocktxn_timeout=BLOCKTXN_TIMEOUT):
+        if queue_policy not in (QUEUE_DROP, QUEUE_DISCONNECT):
+            raise ValueError(f"Unknown send queue policy: {queue_policy}")
+        if rate_limit_policy not in (RATE_LIMIT_THROTTLE, RATE_LIMIT_DISCONNECT):
+            raise ValueError(f"Unknown rate limit policy: {rate_limit_policy}")
+        self.rate_limit_policy = rate_limit_policy
+        self.message_rate_limits = message_rate_limits
         self.node = node
+        self.queue_policy = queue_policy
+        self.queue_max_messages = queue_max_messages
+        self.queue_max_bytes = queue_max_bytes
+        self.inv_batch_size = inv_batch_size
+        self.inv_flush_interval = inv_flush_interval
+        self.compression_codecs = available_codecs(compression_codecs)
+        self.compression_threshold = compression_threshold
+        self.getdata_timeout = getdata_timeout
+        self.blocktxn_timeout = blocktxn_timeout
+        self.listen_port = 0
+        self.addresses = AddressBook(address_file)
+        self.peer_manager = PeerManager(self, self.addresses, target_outbound)
         self.peers = []
         self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.running = False
+        self.loop = None
+        self._loop_thread = None
+        self._listener = None
+        self._stopping = False
+        self.seen = SeenSet(RELAY_SEEN_CAPACITY)
+        self._requested = {}  # inventory key -> deadline for the getdata answer
+        self._alternates = {}  # inventory key -> deque of other peers that announced it meanwhile
+        self.relay_stats = {'inv_sent': 0, 'inv_batches': 0, 'inv_batch_max': 0, 'getdata_sent': 0,
+                            'getdata_retries': 0, 'objects_received': 0, 'duplicates_received': 0,
+                            'compact_blocks_sent': 0, 'compact_blocks_received': 0, 'compact_txs_missing': 0,
+                            'compact_fallbacks': 0}
+        self._partial_blocks = {}  # block hash -> (PartialBlock, peer, expiry timer) waiting for a blocktxn
+        self.sync = ChainSync(self)
+        self._handlers = {
+            CMD_TX: self._on_tx,
+            CMD_BLOCK: self._on_block,
+            CMD_INV: self._on_inv,
+            CMD_GETDATA: self._on_getdata,
+            CMD_HEADERS: self._on_headers,
+            CMD_GETHEADERS: self._on_getheaders,
+            CMD_CMPCTBLOCK: self._on_cmpctblock,
+            CMD_GETBLOCKTXN: self._on_getblocktxn,
+            CMD_BLOCKTXN: self._on_blocktxn,
+            CMD_PING: self._on_ping,
+            CMD_PONG: self._on_pong,
+            CMD_VERSION: self._on_version,
+        }
+
+    def _start_loop(self):
+        if self.loop is not None:
+            return
+        self.loop = asyncio.new_event_loop()
+        self._stopping = False
+        self._loop_thread = threading.Thread(target=self.loop.run_forever, name='network-loop', daemon=True)
+        self._loop_thread.start()
+        self.loop.call_soon_threadsafe(self.peer_manager.start)
+
+    def _run(self, coroutine, timeout=None):
+        """Run `coroutine` on the loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    def on_loop_thread(self):
+        """True when called from the thread running the event loop."""
+        return self._loop_thread is not None and threading.get_ident() == self._loop_thread.ident
+
+    def _call_soon(self, callback, *args):
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(callback, *args)
 
-    def start_server(self, host='0.0.0.0', port=8333):
+    def start_server(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
         self.server.bind((host, port))
-        self.server.listen()
+        self.server.listen(LISTEN_BACKLOG)
+        self.server.setblocking(False)
+        self.listen_port = self.server.getsockname()[1]
+        self._start_loop()
+        self._listener = self._run(self._listen())
         self.running = True
-        print(f"Node listening on {host}:{port}")
-        self.server_thread = threading.Thread(target=self.listen_for_connections, daemon=True)
-        self.server_thread.start()
+        print(f"Node listening on {host}:{self.server.getsockname()[1]}")
+
+    async def _listen(self):
+        return await self.loop.create_server(lambda: Peer(self, outbound=False), sock=self.server,
+                                             backlog=LISTEN_BACKLOG)
 
     def stop_server(self):
         """Gracefully stop the server and clean up resources"""
         self.running = False
-        # Create a temporary connection to unblock accept()
-        try:
-            tmp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            tmp_socket.connect(('localhost', self.server.getsockname()[1]))
-            tmp_socket.close()
-        except:
-            pass
+        if self.loop is None:
+            self.server.close()
+            return
+        self._run(self._shutdown())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._loop_thread.join()
+        self.loop.close()
+        self.loop = None
         self.server.close()
-        for peer in self.peers:
-            peer.close()
-        self.peers.clear()
-
-    def listen_for_connections(self):
-        while self.running:
-            client, address = self.server.accept()
-            print(f"Connection from {address}")
-            threading.Thread(target=self.handle_client, args=(client,), daemon=True).start()
-
-    def handle_client(self, client_socket):
-        while True:
-            try:
-                data = client_socket.recv(4096)
-                if not data:
-                    break
-                # Handle incoming data (e.g., new blocks or transactions)
-                self.node.process_data(data)
-            except:
-                break
-        client_socket.close()
 
-    def connect_to_peer(self, host, port):
-        peer = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        peer.connect((host, port))
+    async def _shutdown(self):
+        self._stopping = True
+        self.peer_manager.stop()
+        if self._listener is not None:
+            self._listener.close()
+            await self._listener.wait_closed()
+            self._listener = None
+        # Cancelling in-flight accepts and connects closes their transports
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        peers, self.peers = list(self.peers), []
+        for peer in peers:
+            peer.closed = True
+            peer.transport.close()
+        await asyncio.gather(*(peer.lost for peer in peers), return_exceptions=True)
+
+    def _peer_connected(self, peer):
+        if self._stopping or not self.peer_manager.peer_connected(peer):
+            peer.transport.close()
+            return
+        if not peer.outbound:
+            print(f"Connection from {peer.address}")
         self.peers.append(peer)
-        threading.Thread(target=self.handle_client, args=(peer,), daemon=True).start()
+        with self.node.lock:
+            self.sync.peer_connected(peer)
+
+    def _peer_lost(self, peer):
+        if peer in self.peers:
+            self.peers.remove(peer)
+        with self.node.lock:
+            for block_hash, (_, source, _) in list(self._partial_blocks.items()):
+                if source is peer:
+                    self._refetch_partial(block_hash)
+            self.sync.peer_lost(peer)
+        self.peer_manager.peer_lost(peer)
+
+    def connect_to_peer(self, host, port):
+        """Dial `host:port` now and remember it in the address book."""
+        self._start_loop()
+        return self._run(self._connect_known(host, port), CONNECT_TIMEOUT)
+
+    async def _connect_known(self, host, port):
+        key = self.addresses.add(host, port)
+        peer = await self._connect(host, port)
+        peer.address_key = key
+        self.addresses.record_success(key, time.time())
+        return peer
+
+    async def _connect(self, host, port):
+        _, peer = await asyncio.wait_for(
+            self.loop.create_connection(lambda: Peer(self, outbound=True), host, port), CONNECT_TIMEOUT)
+        return peer
 
     def broadcast(self, data):
+        """Queue `data` for every connected peer; returns without waiting for any of them."""
+        self._call_soon(self._fan_out, data, time.monotonic())
+
+    def _fan_out(self, data, queued_at):
         for peer in self.peers:
-            try:
-                peer.sendall(data)
-            except:
-                self.peers.remove(peer)
+            peer._enqueue(data, queued_at)
+
+    def broadcast_message(self, command, payload=b''):
+        self.broadcast(encode_message(command, payload))
+
+    def broadcast_transaction(self, transaction):
+        """Submit a transaction to the node (if new) and announce it to every peer."""
+        tx = Transaction.from_dict(transaction)
+        if tx.digest not in self.node.mempool:
+            self.node.add_transaction(tx)
+        self._call_soon(self._announce, (INV_TX, tx.digest))
+
+    def broadcast_block(self, block):
+        """Announce a block the node has stored."""
+        self._call_soon(self._announce_block, block)
+
+    def _announce(self, key, source=None):
+        """Queue an inv for `key` to each peer that lacks it; `inv_sent / inv_batches` is the mean batch size."""
+        self.seen.add(key)
+        for peer in list(self.peers):
+            if peer is source or key in peer.known or peer.closed:
+                continue
+            peer.known.add(key)
+            peer.pending_inv.append(key)
+            self.relay_stats['inv_sent'] += 1
+            if len(peer.pending_inv) >= self.inv_batch_size:
+                self._flush_inv(peer)
+            elif peer.inv_timer is None:
+                peer.inv_timer = self.loop.call_later(self.inv_flush_interval, self._flush_inv, peer)
+
+    def _flush_inv(self, peer):
+        if peer.inv_timer is not None:
+            peer.inv_timer.cancel()
+            peer.inv_timer = None
+        keys, peer.pending_inv = peer.pending_inv, []
+        if not keys or peer.closed:
+            return
+        peer.send_message(CMD_INV, encode_inv(keys))
+        self.relay_stats['inv_batches'] += 1
+        self.relay_stats['inv_batch_max'] = max(self.relay_stats['inv_batch_max'], len(keys))
+
+    def _announce_block(self, block, source=None):
+        """Push `block` as a compact block to every peer that does not have it."""
+        key = (INV_BLOCK, block_inv_id(block['quantum_proof']))
+        self.seen.add(key)
+        payload = None
+        for peer in list(self.peers):
+            if peer is source or key in peer.known or peer.closed:
+                continue
+            if payload is None:
+                payload = CompactBlock.from_block(block).encode()
+            peer.known.add(key)
+            peer.send_message(CMD_CMPCTBLOCK, payload)
+            self.relay_stats['compact_blocks_sent'] += 1
+
+    def _have(self, key):
+        inv_type, item_id = key
+        if inv_type == INV_TX:
+            return item_id in self.node.mempool
+        return self.node.storage.height_of(item_id.decode()) is not None
+
+    def _request(self, peer, keys):
+        """
+        Ask `peer` for the objects in `keys` not already seen; those already
+        requested elsewhere remember `peer` as an alternate source instead.
+        """
+        now = time.monotonic()
+        if len(self._requested) > RELAY_SEEN_CAPACITY:
+            self._requested = {key: deadline for key, deadline in self._requested.items() if deadline > now}
+            self._alternates = {key: peers for key, peers in self._alternates.items() if key in self._requested}
+        wanted = []
+        for key in keys:
+            if key in self.seen or self._have(key):
+                continue
+            if self._requested.get(key, 0) > now:
+                alternates = self._alternates.setdefault(key, deque(maxlen=GETDATA_ALTERNATES))
+                if peer not in alternates:
+                    alternates.append(peer)
+                continue
+            wanted.append(key)
+        self._send_getdata(peer, wanted, now)
+
+    def _send_getdata(self, peer, keys, now):
+        if not keys:
+            return
+        for key in keys:
+            self._requested[key] = now + self.getdata_timeout
+        peer.send_message(CMD_GETDATA, encode_inv(keys))
+        self.relay_stats['getdata_sent'] += 1
+        self.loop.call_later(self.getdata_timeout, self._getdata_expired, keys)
+
+    def _getdata_expired(self, keys):
+        """Re-request each unanswered object in `keys` from the next peer that announced it."""
+        now = time.monotonic()
+        retries = {}
+        with self.node.lock:
+            for key in keys:
+                deadline = self._requested.get(key)
+                if deadline is None or deadline > now:
+                    continue  # answered, or requested again since
+                alternates = self._alternates.get(key, ())
+                while alternates and alternates[0].closed:
+                    alternates.popleft()
+                if alternates and key not in self.seen and not self._have(key):
+                    retries.setdefault(alternates.popleft(), []).append(key)
+                else:
+                    # Nobody else to ask; the next announcement requests it afresh
+                    del self._requested[key]
+                    self._alternates.pop(key, None)
+            for peer, retried in retries.items():
+                self.relay_stats['getdata_retries'] += len(retried)
+                self._send_getdata(peer, retried, now)
+
+    def _received(self, peer, key):
+        """Record an object body from `peer`; False if we already had it."""
+        peer.known.add(key)
+        self._requested.pop(key, None)
+        self._alternates.pop(key, None)
+        self.relay_stats['objects_received'] += 1
+        if not self.seen.add(key):
+            self.relay_stats['duplicates_received'] += 1
+            return False
+        return True
+
+    def peer_metrics(self):
+        """Per-peer send queue depth and latency, collected on the loop thread."""
+        if self.loop is None:
+            return []
+        return self._run(self._peer_metrics())
+
+    async def _peer_metrics(self):
+        return [peer.metrics() for peer in self.peers]
+
+    def ping(self, peer):
+        nonce = int.from_bytes(os.urandom(8), 'big')
+        peer.ping_nonce = nonce
+        peer.last_ping = time.monotonic()
+        peer.send_message(CMD_PING, encode_nonce(nonce))
+        return nonce
+
+    def send_headers(self, peer, blocks):
+        peer.send_message(CMD_HEADERS, encode_headers(blocks))
+
+    # Message dispatch. Payloads are views into the peer's read buffer and
+    # are only valid during the handler call. Handlers run holding the node's
+    # lock, since other threads may be mining or submitting transactions.
+
+    def handle_message(self, peer, command, payload):
+        started = time.perf_counter()
+        wire_bytes = MESSAGE_HEADER.size + len(payload)
+        try:
+            if command == CMD_COMPRESSED:
+                command, payload = self._decompress(payload)  # charged as the command inside
+            handler = self._handlers.get(command)
+            if handler is None:
+                # Ignored so newer peers can extend the protocol, but a stream of them is noise
+                command = UNKNOWN_COMMAND
+                self.peer_manager.penalize(peer, PENALTY_UNKNOWN, "unknown commands")
+                return
+            with self.node.lock:
+                handler(peer, payload)
+        except ProtocolError:
+            raise
+        except (KeyError, TypeError) as e:
+            # A payload missing fields or of the wrong shape is a broken peer, not a bad transaction
+            raise ProtocolError(f"Malformed {command} message: {e!r}")
+        except ValueError as e:
+            print(f"⚠️ Rejected {command} from {peer.address}: {e}")
+            self.peer_manager.penalize(peer, PENALTY_INVALID, f"invalid {command}")
+        finally:
+            peer.budget.charge(command, wire_bytes, time.perf_counter() - started)
+
+    def _enforce_budget(self, peer):
+        wait = peer.budget.deficit()
+        if wait <= 0 or peer.closed or peer.throttled:
+            return
+        if self.rate_limit_policy == RATE_LIMIT_DISCONNECT or wait > RATE_LIMIT_MAX_DELAY:
+            print(f"⚠️ Disconnecting {peer.address}: over its rate limit")
+            self.peer_manager.penalize(peer, PENALTY_FLOOD, "flooding")
+            peer.close(abort=True)
+            return
+        peer.throttled = True
+        peer.stats['throttled'] += 1
+        peer.transport.pause_reading()
+        self.loop.call_later(wait, self._unthrottle, peer)
+
+    def _unthrottle(self, peer):
+        peer.throttled = False
+        if not peer.closed and not peer.transport.is_closing():
+            peer.transport.resume_reading()
+
+    def _on_tx(self, peer, payload):
+        tx = Transaction.from_bytes(payload)
+        key = (INV_TX, tx.digest)
+        if self._received(peer, key) and self.node.add_transaction(tx):
+            self._announce(key, source=peer)
+
+    def _on_block(self, peer, payload):
+        block = decode_binary_block(payload)
+        key = (INV_BLOCK, block_inv_id(block['quantum_proof']))
+        fresh = self._received(peer, key)
+        if self.sync.block_received(peer, block) or not fresh:
+            return
+        stored = self.node.receive_block(block)
+        if stored is not None:
+            self._announce_block(stored, source=peer)
+        elif not self._have(key):
+            self.sync.request_headers(peer)  # we are missing its ancestors
+
+    def _on_inv(self, peer, payload):
+        items = decode_inv(payload)
+        for key in items:
+            peer.known.add(key)
+        self._request(peer, [key for key in items if key[0] == INV_TX])
+        if any(key[0] == INV_BLOCK and key not in self.seen and not self._have(key) for key in items):
+            self.sync.request_headers(peer)
+
+    def _on_getdata(self, peer, payload):
+        for inv_type, item_id in decode_inv(payload):
+            peer.known.add((inv_type, item_id))
+            if inv_type == INV_TX:
+                tx = self.node.get_transaction(item_id)
+                if tx is not None:
+                    peer.send_message(CMD_TX, tx.serialized)
+            elif inv_type == INV_BLOCK:
+                payload = self.node.storage.get_block_payload(item_id.decode())
+                if payload is not None:
+                    if payload[0] != BLOCK_VERSION:  # stored by an older release; peers only take the current format
+                        payload = encode_block(decode_block(payload))
+                    peer.send_message(CMD_BLOCK, payload)
+
+    def _on_headers(self, peer, payload):
+        self.sync.on_headers(peer, decode_headers(payload))
+
+    def _on_getheaders(self, peer, payload):
+        self.sync.on_getheaders(peer, decode_getheaders(payload))
+
+    def _on_cmpctblock(self, peer, payload):
+        compact = CompactBlock.decode(payload)
+        key = (INV_BLOCK, block_inv_id(compact.block_hash))
+        peer.known.add(key)
+        if compact.block_hash in self._partial_blocks:
+            if self._partial_blocks[compact.block_hash][1] is not peer:
+                # Another peer has it too: stop waiting on the first one's blocktxn
+                self._drop_partial(compact.block_hash)
+                self._fetch_block(peer, compact.block_hash)
+            return
+        if self._have(key):
+            return
+        # The proof covers the header, so a forged announcement costs us one hash
+        if compute_block_proof(compact.header) != compact.block_hash:
+            raise ProtocolError(f"Compact block {compact.block_hash[:24]} does not match its proof")
+        self.relay_stats['compact_blocks_received'] += 1
+        if compact.header['previous_hash'] != self.node.storage.get_tip()['hash']:
+            self.sync.request_headers(peer)  # we are behind; catch up headers-first
+            return
+        partial = PartialBlock(compact, self.node.pending_transactions)
+        missing = partial.missing()
+        if missing:
+            timer = self.loop.call_later(self.blocktxn_timeout, self._partial_expired, compact.block_hash)
+            self._partial_blocks[compact.block_hash] = (partial, peer, timer)
+            self.relay_stats['compact_txs_missing'] += len(missing)
+            peer.send_message(CMD_GETBLOCKTXN, encode_getblocktxn(compact.block_hash, missing))
+        else:
+            self._complete_block(peer, partial)
+
+    def _on_getblocktxn(self, peer, payload):
+        block_hash, indexes = decode_getblocktxn(payload)
+        block = self.node.storage.get_block_by_hash(block_hash)
+        if block is None:
+            return
+        transactions = block['transactions']
+        if any(index >= len(transactions) for index in indexes):
+            raise ProtocolError("getblocktxn index out of range")
+        peer.send_message(CMD_BLOCKTXN, encode_blocktxn(block_hash, [transactions[index] for index in indexes]))
+
+    def _on_blocktxn(self, peer, payload):
+        block_hash, transactions = decode_blocktxn(payload)
+        partial, source, _ = self._partial_blocks.get(block_hash, (None, None, None))
+        if source is not peer:
+            return  # not asked for, or asked of someone else
+        self._drop_partial(block_hash)
+        partial.fill(transactions)
+        self._complete_block(peer, partial)
+
+    def _complete_block(self, peer, partial):
+        try:
+            stored = self.node.receive_block(partial.to_block())
+        except ValueError:
+            # Most likely a short id collision filled a slot with the wrong transaction
+            self._fetch_block(peer, partial.block_hash)
+            return
+        if stored is not None:
+            self._announce_block(stored, source=peer)
+
+    def _fetch_block(self, peer, block_hash):
+        """Fall back from compact relay to a getdata for the full block."""
+        self.relay_stats['compact_fallbacks'] += 1
+        peer.send_message(CMD_GETDATA, encode_inv([(INV_BLOCK, block_inv_id(block_hash))]))
+
+    def _drop_partial(self, block_hash):
+        _, source, timer = self._partial_blocks.pop(block_hash)
+        timer.cancel()
+        return source
+
+    def _partial_expired(self, block_hash):
+        with self.node.lock:
+            self._refetch_partial(block_hash)
+
+    def _refetch_partial(self, block_hash):
+        """Give up on a partial block's blocktxn and fetch the whole block, preferably from another peer."""
+        source = self._drop_partial(block_hash)
+        key = (INV_BLOCK, block_inv_id(block_hash))
+        if self._have(key):
+            return
+        candidates = [peer for peer in self.peers if peer is not source and key in peer.known and not peer.closed]
+        if not candidates and not source.closed:
+            candidates = [source]
+        if candidates:
+            self._fetch_block(candidates[0], block_hash)
+
+    def _on_version(self, peer, payload):
+        first = peer.version is None
+        peer.version, listen_port, codecs = decode_version(payload)
+        peer.codec = negotiate(self.compression_codecs, codecs)
+        self.peer_manager.peer_announced(peer, listen_port)
+        if first and not peer.outbound:
+            peer.send_version()
+
+    def _decompress(self, payload):
+        command, inner = decode_compressed(payload, self.compression_codecs, MAX_MESSAGE_SIZE)
+        if command == CMD_COMPRESSED:
+            raise ProtocolError("Nested compressed message")
+        return command, memoryview(inner)
+
+    def _on_ping(self, peer, payload):
+        peer.send_message(CMD_PONG, encode_nonce(decode_nonce(payload)))
+
+    def _on_pong(self, peer, payload):
+        self.peer_manager.pong(peer, decode_nonce(payload))
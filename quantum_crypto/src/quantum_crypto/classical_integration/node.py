@@ -1,34 +1,126 @@
-from ..quantum_currency.quantum_block import create_quantum_block
+import functools
+import threading
+
 from ..quantum_currency.quantum_consensus import validate_block
-from .transactions import Transaction
-from .storage import Storage
+from ..quantum_currency.quantum_block import verify_block_commitments
+from .transactions import Transaction, validate_transaction
+from .mempool import Mempool
+from .block_template import BlockTemplate
+from .storage import create_storage
+from .snapshot import export_snapshot
+from ..config.config import STORAGE_BACKEND, BLOCK_SIZE
+
+def _locked(method):
+    """Run a Node method holding the node's lock."""
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return locked
 
 class Node:
-    def __init__(self):
-        self.storage = Storage()
-        self.pending_transactions = []
+    """
+    A node's chain and mempool. The network loop and the caller's threads
+    (mining, wallets) share one node, so its public methods run under
+    `lock`; code reading `storage` directly from another thread takes it too.
+    """
+
+    def __init__(self, storage=None, storage_backend=STORAGE_BACKEND, storage_path=None, mempool=None):
+        self.lock = threading.RLock()
+        # An empty Mempool is falsy (it has __len__), so compare with None
+        self.storage = storage if storage is not None else create_storage(storage_backend, storage_path)
+        self.mempool = mempool if mempool is not None else Mempool()
+        self._refill_template()
 
+    @property
+    @_locked
+    def pending_transactions(self):
+        return self.mempool.transactions()
+
+    @_locked
     def add_transaction(self, transaction):
-        self.pending_transactions.append(transaction)
-        print(f"➕ Transaction added to pending pool. Total pending: {len(self.pending_transactions)}")
+        """Queue a transaction for mining; False if it is a duplicate or the pool is full, ValueError if invalid."""
+        tx = validate_transaction(Transaction.from_dict(transaction))
+        if tx.digest in self.mempool:
+            print(f"⚠️ Duplicate transaction {tx.txid[:16]} ignored")
+            return False
+        evicted = self.mempool.evicted
+        if not self.mempool.add(tx):
+            print(f"⚠️ Mempool full, transaction {tx.txid[:16]} rejected")
+            return False
+        if self.mempool.evicted != evicted:
+            # Never mine what the pool has just evicted
+            self.template.discard([t for t in self.template.transactions if t.digest not in self.mempool])
+        # A sender's transaction may only follow its predecessor into the block
+        previous = self.mempool.previous(tx)
+        if previous is None or previous.digest in self.template:
+            self.template.offer(tx)
+        print(f"➕ Transaction added to mempool. Total pending: {len(self.mempool)}")
+        return True
+
+    def _refill_template(self):
+        """Start a new template from the highest-priority pending transactions."""
+        self.template = BlockTemplate(BLOCK_SIZE, rank=self.mempool.rank)
+        for tx in self.mempool.select(BLOCK_SIZE):
+            self.template.add(tx)
 
+    @_locked
     def create_block(self):
-        if not self.pending_transactions:
+        if not len(self.template):
             raise ValueError("No pending transactions to create block")
-            
-        print(f"📦 Creating new block with {len(self.pending_transactions)} transactions")
-        previous_hash = self.storage.get_last_block_hash()
+
+        print(f"📦 Creating new block with {len(self.template)} of {len(self.mempool)} pending transactions")
+        previous_hash = self.storage.get_tip()['hash']
         
         print("⚙️ Generating quantum proof...")
-        block = create_quantum_block(self.pending_transactions, previous_hash)
+        block = self.template.seal(previous_hash)
         
         print("🔍 Validating block...")
         if validate_block(block):
             stored_block = self.storage.append_block(block)
-            self.pending_transactions = []  # Clear pending after successful creation
+            self.mempool.remove(block['transactions'])  # Only the included transactions leave the pool
+            self._refill_template()
             return stored_block
         else:
             raise ValueError("❌ Block validation failed")
 
+    @_locked
+    def receive_block(self, block):
+        """
+        Append a block received from a peer if it extends our tip. Returns the
+        stored block, or None if it is already known or builds on another tip;
+        raises ValueError if it is invalid.
+        """
+        if self.storage.height_of(block['quantum_proof']) is not None:
+            return None
+        if block['previous_hash'] != self.storage.get_tip()['hash']:
+            print(f"⏭️ Block {block['quantum_proof'][:24]} does not extend our tip")
+            return None
+        block['transactions'] = [validate_transaction(Transaction.from_dict(tx)) for tx in block['transactions']]
+        if not validate_block(block) or not verify_block_commitments(block):
+            raise ValueError("❌ Received block failed validation")
+        stored_block = self.storage.append_block(block)
+        self.mempool.remove(block['transactions'])
+        self._refill_template()
+        return stored_block
+
+    @_locked
+    def get_transaction(self, txid):
+        """Pending transaction by txid (hex or digest), or None."""
+        return self.mempool.get(txid)
+
+    @_locked
+    def export_snapshot(self, snapshot_file, height=None):
+        return export_snapshot(self.storage, snapshot_file, height)
+
+    @_locked
+    def bootstrap_from_snapshot(self, snapshot_file):
+        """Start this node's chain from a snapshot instead of replaying every block."""
+        return self.storage.import_snapshot(snapshot_file)
+
+    @_locked
+    def get_balance(self, pubkey):
+        return self.storage.get_balance(pubkey)
+
     def validate_block(self, block):
         return validate_block(block)
@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+from ..config.config import PEER_MAINTENANCE_INTERVAL, PING_INTERVAL
+
+RTT_SMOOTHING = 0.3  # weight of the newest ping in a peer's RTT average
+PENALTY_PROTOCOL = 50  # a malformed or forged message
+PENALTY_INVALID = 10  # a well-formed but invalid transaction or block
+PENALTY_FLOOD = 50  # far over its rate limit
+PENALTY_UNKNOWN = 1  # a command we have no handler for
+
+
+class PeerManager:
+    """
+    Keeps `target_outbound` outbound connections open, chosen from the
+    address book by score, and pings every peer for its round-trip time.
+
+    Every PEER_MAINTENANCE_INTERVAL seconds it dials the best addresses not
+    in use (their backoff permitting) and pings peers not pinged within
+    PING_INTERVAL. A failed dial or a dropped outbound peer counts against
+    the address, so it is retried with exponential backoff while others
+    take its place. Misbehaving peers collect penalties and their host is
+    banned once the address book's threshold is reached. Runs on the
+    network's event loop thread.
+    """
+
+    def __init__(self, network, addresses, target_outbound, interval=PEER_MAINTENANCE_INTERVAL):
+        self.network = network
+        self.addresses = addresses
+        self.target_outbound = target_outbound
+        self.interval = interval
+        self._connecting = set()  # address keys being dialled
+        self._timer = None
+
+    def start(self):
+        if self._timer is None:
+            self._timer = self.network.loop.call_soon(self._maintain)
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.addresses.save()
+
+    def _maintain(self):
+        now = time.time()
+        self._ping_peers(time.monotonic())
+        in_use = {peer.address_key for peer in self.network.peers if peer.address_key} | self._connecting
+        outbound = sum(1 for peer in self.network.peers if peer.outbound)
+        wanted = self.target_outbound - outbound - len(self._connecting)
+        for key in self.addresses.candidates(now, exclude=in_use)[:max(wanted, 0)]:
+            self._connecting.add(key)
+            self.network.loop.create_task(self._dial(key))
+        self.addresses.save()
+        self._timer = self.network.loop.call_later(self.interval, self._maintain)
+
+    def _ping_peers(self, now):
+        for peer in self.network.peers:
+            # Only peers that completed the version handshake speak ping
+            if peer.version is None or now - peer.last_ping < PING_INTERVAL:
+                continue
+            if peer.ping_nonce is not None:
+                # Still no pong: count the wait so far as its round trip
+                peer.rtt = max(peer.rtt or 0.0, now - peer.last_ping)
+            self.network.ping(peer)
+
+    async def _dial(self, key):
+        entry = self.addresses.get(key)
+        try:
+            peer = await self.network._connect(entry['host'], entry['port'])
+        except (OSError, asyncio.TimeoutError):
+            self.addresses.record_failure(key, time.time())
+            return
+        finally:
+            self._connecting.discard(key)
+        peer.address_key = key
+        self.addresses.record_success(key, time.time())
+
+    def peer_connected(self, peer):
+        """Return False if the peer's host is banned and the connection should be dropped."""
+        return not self.addresses.is_banned(peer.address[0], time.time())
+
+    def peer_announced(self, peer, listen_port):
+        """An inbound peer told us its listening port, so it can be dialled later."""
+        if not peer.outbound and listen_port:
+            peer.address_key = self.addresses.add(peer.address[0], listen_port)
+
+    def peer_lost(self, peer):
+        if peer.outbound and peer.address_key in self.addresses and not self.network._stopping:
+            # Back off before dialling it again; maintenance fills the slot from other addresses
+            self.addresses.record_failure(peer.address_key, time.time())
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = self.network.loop.call_soon(self._maintain)
+
+    def pong(self, peer, nonce):
+        if nonce != peer.ping_nonce:
+            return
+        sample = time.monotonic() - peer.last_ping
+        peer.ping_nonce = None
+        peer.rtt = sample if peer.rtt is None else peer.rtt + (sample - peer.rtt) * RTT_SMOOTHING
+        if peer.outbound and peer.address_key in self.addresses:
+            self.addresses.record_rtt(peer.address_key, peer.rtt)
+
+    def penalize(self, peer, points, reason):
+        peer.misbehavior += points
+        host = peer.address[0]
+        if self.addresses.penalize(host, points, time.time()):
+            print(f"🚫 Banning {host}: {reason}")
+            peer.close()
@@ -0,0 +1,269 @@
+"""
+Wire protocol: message framing and payload codecs.
+
+Every message is a 24-byte header followed by its payload:
+
+    header  := magic 4 bytes | command 12 bytes (NUL padded) | length u32
+               | checksum 4 bytes (first bytes of sha256(payload))
+    tx      := canonical transaction (see `serialization.py`)
+    block   := canonical block
+    inv     := count u32 | count * (type u8 | id_length u8 | id)
+    getdata := same layout as inv
+    getheaders := count u32 | count * block_hash str
+    cmpctblock, getblocktxn, blocktxn: see `compact_block.py`
+    version := protocol_version u32 | listen_port u16 | codec_count u8 | codec_count * codec str
+    compressed: see `compression.py`
+    headers := count u32 | count * (height i64 | proof header | quantum_proof str)
+    ping    := nonce u64
+    pong    := nonce u64
+
+Inventory ids are the raw 32-byte txid digest for transactions and the
+UTF-8 quantum_proof for blocks. `proof header` is `encode_block_header`,
+the bytes a block's proof commits to, so headers can be checked without
+their transactions. A `getheaders` locator lists block hashes from the
+sender's tip backwards; the answer is the `headers` that follow the first
+one the receiver has.
+"""
+import hashlib
+import struct
+
+from ..config.config import NETWORK_MAGIC, MAX_MESSAGE_SIZE, READ_CHUNK_SIZE
+from .serialization import (
+    encode_block_header, pack_str, read_str, HASH_HEADER, HEADER_VERSION, I64, U32
+)
+
+MESSAGE_HEADER = struct.Struct('>4s12sI4s')  # magic, command, length, checksum
+U64 = struct.Struct('>Q')
+U16 = struct.Struct('>H')
+VERSION_HEADER = struct.Struct('>IH')  # protocol version, listen port
+
+CMD_TX = 'tx'
+CMD_BLOCK = 'block'
+CMD_INV = 'inv'
+CMD_GETDATA = 'getdata'
+CMD_HEADERS = 'headers'
+CMD_GETHEADERS = 'getheaders'
+CMD_CMPCTBLOCK = 'cmpctblock'
+CMD_GETBLOCKTXN = 'getblocktxn'
+CMD_BLOCKTXN = 'blocktxn'
+CMD_VERSION = 'version'
+CMD_COMPRESSED = 'compressed'
+
+PROTOCOL_VERSION = 1
+CMD_PING = 'ping'
+CMD_PONG = 'pong'
+
+INV_TX = 1
+INV_BLOCK = 2
+MAX_LOCATOR_SIZE = 101  # hashes in a getheaders locator
+
+
+class ProtocolError(ValueError):
+    """A peer sent bytes that violate the wire protocol."""
+
+
+def checksum(payload):
+    return hashlib.sha256(payload).digest()[:4]
+
+
+def encode_message(command, payload=b'', magic=NETWORK_MAGIC):
+    return MESSAGE_HEADER.pack(magic, command.encode(), len(payload), checksum(payload)) + payload
+
+
+class FrameDecoder:
+    """
+    Reassembles messages from a byte stream.
+
+    The transport reads straight into `get_buffer()` (asyncio's
+    BufferedProtocol contract), so incoming bytes are written once into a
+    reusable buffer. Complete frames are handed out as memoryview slices of
+    that buffer, valid only until the next read; only the unfinished tail
+    is moved to the front after each batch. The buffer grows when a single
+    message is larger than it.
+    """
+
+    def __init__(self, magic=NETWORK_MAGIC, max_payload=MAX_MESSAGE_SIZE, buffer_size=READ_CHUNK_SIZE):
+        self.magic = magic
+        self.max_payload = max_payload
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._start = 0  # first unconsumed byte
+        self._end = 0  # end of received data
+
+    def get_buffer(self, sizehint=-1):
+        if self._end == len(self._buffer):
+            self._make_room(max(sizehint, 1))
+        return self._view[self._end:]
+
+    def _make_room(self, needed):
+        pending = self._end - self._start
+        if self._start and pending + needed <= len(self._buffer):
+            self._buffer[:pending] = self._buffer[self._start:self._end]
+        else:
+            grown = bytearray(max(len(self._buffer) * 2, pending + needed))
+            grown[:pending] = self._view[self._start:self._end]
+            # The old buffer lives on until any payload views handed out are dropped
+            self._buffer = grown
+            self._view = memoryview(grown)
+        self._start, self._end = 0, pending
+
+    def feed(self, data):
+        """Copy `data` in and return the completed frames (for non-buffered transports)."""
+        frames = []
+        data = memoryview(data)
+        while data:
+            target = self.get_buffer(len(data))
+            count = min(len(target), len(data))
+            target[:count] = data[:count]
+            data = data[count:]
+            frames.extend((command, bytes(payload)) for command, payload in self.buffer_updated(count))
+        return frames
+
+    def buffer_updated(self, nbytes):
+        """Account for `nbytes` written into the buffer and yield (command, payload) frames."""
+        self._end += nbytes
+        view = self._view
+        while self._end - self._start >= MESSAGE_HEADER.size:
+            magic, command, length, check = MESSAGE_HEADER.unpack_from(view, self._start)
+            if magic != self.magic:
+                raise ProtocolError("Bad message magic")
+            if length > self.max_payload:
+                raise ProtocolError(f"Message of {length} bytes exceeds the limit")
+            frame_end = self._start + MESSAGE_HEADER.size + length
+            if frame_end > self._end:
+                if frame_end - self._start > len(self._buffer):
+                    self._make_room(frame_end - self._end)
+                break
+            payload = view[self._start + MESSAGE_HEADER.size:frame_end]
+            if checksum(payload) != check:
+                raise ProtocolError("Message checksum mismatch")
+            self._start = frame_end
+            yield command.rstrip(b'\0').decode('ascii', 'replace'), payload
+        if self._start == self._end:
+            self._start = self._end = 0
+        elif self._end == len(self._buffer):
+            self._make_room(0)
+
+
+def encode_inv(items):
+    """`items` is a list of (INV_TX or INV_BLOCK, id bytes)."""
+    parts = [U32.pack(len(items))]
+    for inv_type, item_id in items:
+        parts.append(bytes((inv_type, len(item_id))) + item_id)
+    return b''.join(parts)
+
+
+def decode_inv(payload):
+    try:
+        (count,) = U32.unpack_from(payload)
+        offset = U32.size
+        items = []
+        for _ in range(count):
+            inv_type, length = payload[offset], payload[offset + 1]
+            offset += 2
+            if offset + length > len(payload):
+                raise ProtocolError("Truncated inventory entry")
+            items.append((inv_type, bytes(payload[offset:offset + length])))
+            offset += length
+    except (IndexError, struct.error):
+        raise ProtocolError("Truncated inventory message")
+    if offset != len(payload):
+        raise ProtocolError("Trailing bytes after inventory")
+    return items
+
+
+def block_inv_id(block_hash):
+    return block_hash.encode()
+
+
+def pack_header(block):
+    """Height, proof header and quantum proof of a block or header dict."""
+    return I64.pack(block['block_height']) + encode_block_header(block) + pack_str(block['quantum_proof'])
+
+
+def read_header(payload, offset):
+    """Return (header dict, next offset) for a header written by `pack_header`."""
+    (height,) = I64.unpack_from(payload, offset)
+    version, timestamp, tx_count = HASH_HEADER.unpack_from(payload, offset + I64.size)
+    if version != HEADER_VERSION:
+        raise ProtocolError(f"Unsupported header version {version}")
+    previous_hash, offset = read_str(payload, offset + I64.size + HASH_HEADER.size)
+    merkle_root, offset = read_str(payload, offset)
+    quantum_proof, offset = read_str(payload, offset)
+    return {
+        'block_height': height, 'timestamp': timestamp, 'tx_count': tx_count,
+        'previous_hash': previous_hash, 'merkle_root': merkle_root, 'quantum_proof': quantum_proof
+    }, offset
+
+
+def encode_headers(blocks):
+    return U32.pack(len(blocks)) + b''.join(pack_header(block) for block in blocks)
+
+
+def decode_headers(payload):
+    """Return header dicts with block_height, timestamp, tx_count, previous_hash, merkle_root, quantum_proof."""
+    try:
+        (count,) = U32.unpack_from(payload)
+        offset = U32.size
+        headers = []
+        for _ in range(count):
+            header, offset = read_header(payload, offset)
+            headers.append(header)
+    except (IndexError, struct.error, UnicodeDecodeError, ValueError) as e:
+        raise ProtocolError(f"Malformed headers message: {e}")
+    if offset != len(payload):
+        raise ProtocolError("Trailing bytes after headers")
+    return headers
+
+
+def encode_getheaders(locator):
+    return U32.pack(len(locator)) + b''.join(pack_str(block_hash) for block_hash in locator)
+
+
+def decode_getheaders(payload):
+    try:
+        (count,) = U32.unpack_from(payload)
+        if count > MAX_LOCATOR_SIZE:
+            raise ProtocolError(f"Locator of {count} hashes exceeds the limit")
+        offset = U32.size
+        locator = []
+        for _ in range(count):
+            block_hash, offset = read_str(payload, offset)
+            locator.append(block_hash)
+    except (IndexError, struct.error, UnicodeDecodeError, ValueError) as e:
+        raise ProtocolError(f"Malformed getheaders message: {e}")
+    if offset != len(payload):
+        raise ProtocolError("Trailing bytes after getheaders")
+    return locator
+
+
+def encode_version(codecs, listen_port=0, version=PROTOCOL_VERSION):
+    """`listen_port` is 0 for nodes that accept no connections."""
+    return (U32.pack(version) + U16.pack(listen_port) + bytes((len(codecs),))
+            + b''.join(pack_str(codec) for codec in codecs))
+
+
+def decode_version(payload):
+    """Return (protocol version, listen port, codecs the peer can decompress)."""
+    try:
+        version, listen_port = VERSION_HEADER.unpack_from(payload)
+        offset = VERSION_HEADER.size + 1
+        codecs = []
+        for _ in range(payload[VERSION_HEADER.size]):
+            codec, offset = read_str(payload, offset)
+            codecs.append(codec)
+    except (IndexError, struct.error, UnicodeDecodeError, ValueError) as e:
+        raise ProtocolError(f"Malformed version message: {e}")
+    if offset != len(payload):
+        raise ProtocolError("Trailing bytes after version")
+    return version, listen_port, codecs
+
+
+def encode_nonce(nonce):
+    return U64.pack(nonce)
+
+
+def decode_nonce(payload):
+    if len(payload) != U64.size:
+        raise ProtocolError("Ping and pong carry an 8-byte nonce")
+    return U64.unpack(payload)[0]
@@ -0,0 +1,71 @@
+import time
+
+from ..config.config import (
+    MESSAGE_RATE_LIMITS, DEFAULT_MESSAGE_RATE_LIMIT, PEER_BYTE_RATE, PEER_BYTE_BURST, PEER_CPU_SHARE, PEER_CPU_BURST
+)
+
+UNKNOWN_COMMAND = 'unknown'  # budget entry shared by every command the node has no handler for
+
+
+class TokenBucket:
+    """
+    `rate` tokens per second up to `burst`. Taking more than is available
+    leaves the bucket in debt, and `deficit` says how long repaying it takes.
+    """
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst, now=None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.tokens -= amount
+
+    def deficit(self, now):
+        """Seconds until the bucket is out of debt (0 if it is not in debt)."""
+        self._refill(now)
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class PeerBudget:
+    """
+    What one peer may cost us: a message-rate bucket per command (from
+    `limits`, a {command: (per second, burst)} table), plus buckets for wire
+    bytes and for the CPU seconds its handlers take. Costs are also
+    totalled per command for metrics. Callers charge commands they do not
+    handle as UNKNOWN_COMMAND, so a peer cannot add buckets by inventing names.
+    """
+
+    def __init__(self, limits=MESSAGE_RATE_LIMITS, now=None):
+        now = time.monotonic() if now is None else now
+        self.limits = limits
+        self.messages = {}  # command -> TokenBucket, created on first use
+        self.bytes = TokenBucket(PEER_BYTE_RATE, PEER_BYTE_BURST, now)
+        self.cpu = TokenBucket(PEER_CPU_SHARE, PEER_CPU_BURST, now)
+        self.costs = {}  # command -> [messages, bytes, cpu seconds]
+
+    def charge(self, command, nbytes, cpu_seconds, now=None):
+        now = time.monotonic() if now is None else now
+        bucket = self.messages.get(command)
+        if bucket is None:
+            bucket = self.messages[command] = TokenBucket(*self.limits.get(command, DEFAULT_MESSAGE_RATE_LIMIT), now)
+        bucket.take(1, now)
+        self.bytes.take(nbytes, now)
+        self.cpu.take(cpu_seconds, now)
+        cost = self.costs.setdefault(command, [0, 0, 0.0])
+        cost[0] += 1
+        cost[1] += nbytes
+        cost[2] += cpu_seconds
+
+    def deficit(self, now=None):
+        """Seconds until every bucket is out of debt."""
+        now = time.monotonic() if now is None else now
+        buckets = [self.bytes, self.cpu, *self.messages.values()]
+        return max(bucket.deficit(now) for bucket in buckets)
@@ -0,0 +1,28 @@
+from collections import OrderedDict
+
+
+class SeenSet:
+    """Bounded set that forgets its least recently added or touched keys first."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._keys = OrderedDict()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def add(self, key):
+        """Add `key`; returns False if it was already present."""
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            return False
+        self._keys[key] = None
+        if len(self._keys) > self.capacity:
+            self._keys.popitem(last=False)
+        return True
+
+    def discard(self, key):
+        self._keys.pop(key, None)
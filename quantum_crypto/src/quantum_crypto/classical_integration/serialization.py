@@ -0,0 +1,707 @@
+"""
+Canonical binary encoding for transactions and blocks.
+
+These bytes are what gets stored, hashed (txids, block proofs) and sent
+between nodes, so every value has exactly one encoding and decoders
+reject anything else: unknown versions, unknown amount tags, invalid
+UTF-8, non-finite amounts, truncated input and trailing bytes.
+
+Layout (all integers big-endian):
+
+    transaction := tx_version u8 | sender str | receiver str | amount
+                   | [fee amount, tx_version 2 only] | signature str
+    block       := version u8 | height i64 | timestamp f64 | tx_count u32
+                   | previous_hash str | merkle_root str | quantum_proof str
+                   | party_count u32 | keys(party_count) | entries
+    entries     := tx_count * tx_version u8
+                   | tx_count * sender ref | tx_count * receiver ref
+                   | amounts(tx_count) | amounts(fee_count) | keys(tx_count)
+    header      := header_version u8 | timestamp f64 | tx_count u32
+                   | previous_hash str | merkle_root str
+    amount      := 0x00 i64 | 0x01 f64
+    amounts(n)  := n * amount tag u8 | n * amount value
+    keys(n)     := n * kind u8 | n * length u16 | the n values' bytes
+    str         := length u16 | utf-8 bytes
+    ref         := u16 index into the parties, u32 if there are more than 65536
+
+`header` is the part of a block its quantum proof commits to. A
+transaction without a fee is always version 1 and one with a positive fee
+always version 2, so fee-less transactions keep their original txids.
+Txids hash the standalone `transaction` bytes, never a block's entries.
+
+A block lists each sender and receiver once, sorted, and its entries are
+stored column by column: versions, sender and receiver refs, amounts, the
+fees of the fee_count version 2 transactions (in order), then signatures,
+so whole columns decode in one call. Keys (parties, signatures) that are
+non-empty lowercase hex text are stored as the bytes they spell (kind 1),
+anything else as UTF-8 (kind 0).
+
+Version 2 blocks (length-prefixed `transaction`s), version 1 blocks (no
+merkle_root, transactions without a version byte) and JSON records from
+before the binary format are still readable from storage; blocks from
+peers go through `decode_binary_block`, which accepts none of them.
+"""
+import json
+import math
+import operator
+import re
+import struct
+from itertools import accumulate
+
+TX_VERSION = 1
+TX_VERSION_FEE = 2
+TX_VERSIONS = (TX_VERSION, TX_VERSION_FEE)
+BLOCK_VERSION = 3
+BLOCK_VERSION_V2 = 2
+BLOCK_VERSION_V1 = 1
+BLOCK_VERSIONS = (BLOCK_VERSION, BLOCK_VERSION_V2, BLOCK_VERSION_V1)
+HEADER_VERSION = 2  # what proofs commit to; unchanged when only the block layout changes
+BLOCK_HEADER = struct.Struct('>BqdI')  # version, height, timestamp, tx_count
+HASH_HEADER = struct.Struct('>BdI')  # header version, timestamp, tx_count
+KEY_TEXT = 0
+KEY_HEX = 1
+REF_FORMATS = ('H', 'I')  # indexed by whether a block has more than MAX_SHORT_REFS parties
+MAX_SHORT_REFS = 0x10000
+U16 = struct.Struct('>H')
+U32 = struct.Struct('>I')
+I64 = struct.Struct('>q')
+F64 = struct.Struct('>d')
+AMOUNT_INT = 0
+AMOUNT_FLOAT = 1
+AMOUNT_SIZE = 1 + I64.size
+LEGACY_JSON_MARKER = ord('{')
+HEX_TEXT = re.compile('(?:[0-9a-f]{2})+')
+HEX_DIGITS = b'0123456789abcdef'
+
+
+def pack_str(value):
+    data = value.encode()
+    if len(data) > 0xFFFF:
+        raise ValueError("String field exceeds 65535 bytes")
+    return U16.pack(len(data)) + data
+
+
+def pack_amount(amount):
+    if isinstance(amount, int):
+        return bytes((AMOUNT_INT,)) + I64.pack(int(amount))
+    if not math.isfinite(amount):
+        raise ValueError("Transaction amount must be finite")
+    return bytes((AMOUNT_FLOAT,)) + F64.pack(amount + 0.0)  # folds -0.0 into 0.0
+
+
+def read_str(buf, offset):
+    """Return (value, next offset) for the str field at `offset`."""
+    start = offset + 2
+    end = start + ((buf[offset] << 8) | buf[offset + 1])
+    if end > len(buf):
+        raise ValueError("Truncated string field")
+    return str(buf[start:end], 'utf-8'), end
+
+
+def skip_str(buf, offset):
+    return offset + U16.size + U16.unpack_from(buf, offset)[0]
+
+
+def key_fields(value):
+    """Return the (kind, bytes) a key field stores `value` as."""
+    try:
+        data = bytes.fromhex(value)
+    except ValueError:
+        data = None
+    if data and data.hex() == value:  # fromhex also takes upper case and spaces
+        kind = KEY_HEX
+    else:
+        kind, data = KEY_TEXT, value.encode()
+    if len(data) > 0xFFFF:
+        raise ValueError("Key field exceeds 65535 bytes")
+    return kind, data
+
+
+def pack_keys(values):
+    """Encode `values` as a `keys` column."""
+    kinds = bytearray()
+    lengths = []
+    data = []
+    for value in values:
+        kind, encoded = key_fields(value)
+        kinds.append(kind)
+        lengths.append(len(encoded))
+        data.append(encoded)
+    return b''.join((kinds, struct.pack(f'>{len(lengths)}H', *lengths), *data))
+
+
+def read_keys(buf, offset, count):
+    """Return (values, next offset) for the `count` keys column at `offset`."""
+    kinds = bytes(buf[offset:offset + count])
+    if len(kinds) != count:
+        raise ValueError("Truncated key column")
+    offset += count
+    lengths = struct.unpack_from(f'>{count}H', buf, offset)
+    offset += U16.size * count
+    bounds = list(accumulate(lengths, initial=0))
+    end = offset + bounds[-1]
+    if end > len(buf):
+        raise ValueError("Truncated key column")
+    data = bytes(buf[offset:end])
+    spans = zip(bounds, bounds[1:])
+    if kinds.count(KEY_HEX) == count:
+        if 0 in lengths:
+            raise ValueError("Empty key stored as hex")
+        text = data.hex()
+        return [text[2 * start:2 * stop] for start, stop in spans], end
+    if kinds.count(KEY_TEXT) == count:
+        text = data.decode()
+        if len(text) == len(data):  # ASCII, so byte offsets are character offsets
+            values = [text[start:stop] for start, stop in spans]
+        else:
+            values = [data[start:stop].decode() for start, stop in spans]
+        texts = values
+    else:
+        values = []
+        for kind, (start, stop) in zip(kinds, spans):
+            if kind == KEY_HEX and stop > start:
+                values.append(data[start:stop].hex())
+            elif kind == KEY_TEXT:
+                values.append(data[start:stop].decode())
+            else:
+                raise ValueError(f"Invalid key of kind {kind}")
+        texts = [value for kind, value in zip(kinds, values) if kind == KEY_TEXT]
+    if _any_hex(texts):
+        raise ValueError("Hex key stored as text")
+    return values, end
+
+
+def _any_hex(texts):
+    """True if one of `texts` is hex text; a one-pass screen over all of them, confirmed per text."""
+    # Dropping hex digits leaves an empty line exactly where a text had only hex digits
+    screen = ('\n%s\n' % '\n'.join(texts)).encode().translate(None, HEX_DIGITS)
+    return b'\n\n' in screen and any(map(HEX_TEXT.fullmatch, texts))
+
+
+def read_amount(buf, offset):
+    tag = buf[offset]
+    if tag == AMOUNT_INT:
+        return I64.unpack_from(buf, offset + 1)[0]
+    if tag == AMOUNT_FLOAT:
+        value = F64.unpack_from(buf, offset + 1)[0]
+        if not math.isfinite(value):
+            raise ValueError("Transaction amount must be finite")
+        return value
+    raise ValueError(f"Unknown amount tag {tag}")
+
+
+def encode_transaction(transaction):
+    fee = transaction.get('fee', 0)
+    if fee < 0:
+        raise ValueError("Transaction fee must not be negative")
+    return b''.join((
+        bytes((TX_VERSION_FEE if fee else TX_VERSION,)),
+        pack_str(transaction['sender']),
+        pack_str(transaction['receiver']),
+        pack_amount(transaction['amount']),
+        pack_amount(fee) if fee else b'',
+        pack_str(transaction.get('signature', ''))
+    ))
+
+
+def _read_transaction(buf, offset, version=TX_VERSION):
+    sender, offset = read_str(buf, offset)
+    receiver, offset = read_str(buf, offset)
+    amount = read_amount(buf, offset)
+    offset += AMOUNT_SIZE
+    if version == TX_VERSION_FEE:
+        fee = read_amount(buf, offset)
+        if not fee > 0:
+            raise ValueError("Version 2 transactions must carry a positive fee")
+        offset += AMOUNT_SIZE
+    signature, offset = read_str(buf, offset)
+    transaction = {'sender': sender, 'receiver': receiver, 'amount': amount, 'signature': signature}
+    if version == TX_VERSION_FEE:
+        transaction['fee'] = fee
+    return transaction, offset
+
+
+def decode_transaction(data):
+    """Strictly decode the output of `encode_transaction`."""
+    try:
+        if data[0] not in TX_VERSIONS:
+            raise ValueError(f"Unsupported transaction encoding version {data[0]}")
+        transaction, end = _read_transaction(data, 1, data[0])
+    except (IndexError, struct.error):
+        raise ValueError("Truncated transaction encoding")
+    if end != len(data):
+        raise ValueError("Trailing bytes after transaction")
+    return transaction
+
+
+def encode_block_header(block):
+    """Bytes a block's quantum proof commits to (everything but height and proof)."""
+    # Header-only blocks (e.g. from a headers message) carry tx_count instead of transactions
+    tx_count = len(block['transactions']) if 'transactions' in block else block['tx_count']
+    return b''.join((
+        HASH_HEADER.pack(HEADER_VERSION, block['timestamp'], tx_count),
+        pack_str(block['previous_hash']),
+        pack_str(block.get('merkle_root', ''))
+    ))
+
+
+def block_header(block):
+    """A block dict or `BlockView` reduced to its header fields, with tx_count for the transactions."""
+    return {
+        'block_height': block['block_height'],
+        'timestamp': block['timestamp'],
+        'tx_count': block['tx_count'] if 'tx_count' in block else len(block['transactions']),
+        'previous_hash': block['previous_hash'],
+        'merkle_root': block['merkle_root'] if 'merkle_root' in block else '',
+        'quantum_proof': block['quantum_proof']
+    }
+
+
+def _entry_version(transaction):
+    fee = transaction.get('fee', 0)
+    if fee < 0:
+        raise ValueError("Transaction fee must not be negative")
+    return TX_VERSION_FEE if fee else TX_VERSION
+
+
+def ref_size(party_count):
+    return struct.calcsize(REF_FORMATS[party_count > MAX_SHORT_REFS])
+
+
+def entry_size(transaction):
+    """Bytes `transaction` adds to a block's entries, besides its two refs."""
+    amounts = 2 if _entry_version(transaction) == TX_VERSION_FEE else 1
+    return 1 + amounts * AMOUNT_SIZE + key_size(transaction.get('signature', ''))
+
+
+def key_size(key):
+    """Bytes `key` takes in a keys column."""
+    return 1 + U16.size + len(key_fields(key)[1])
+
+
+def pack_amounts(amounts):
+    """Encode `amounts` as an `amounts` column."""
+    amounts = list(amounts)
+    if set(map(type, amounts)) <= {int}:
+        return bytes(len(amounts)) + struct.pack(f'>{len(amounts)}q', *amounts)
+    packed = [pack_amount(amount) for amount in amounts]
+    return b''.join([bytes(amount[0] for amount in packed)] + [amount[1:] for amount in packed])
+
+
+def read_amounts(buf, offset, count):
+    """Return (amounts, next offset) for the `count` amounts column at `offset`."""
+    tags = bytes(buf[offset:offset + count])
+    offset += count
+    amounts = struct.unpack_from(f'>{count}q', buf, offset)
+    if tags.count(AMOUNT_INT) != count:
+        amounts = list(amounts)
+        for index, tag in enumerate(tags):
+            if tag == AMOUNT_FLOAT:
+                amounts[index] = F64.unpack_from(buf, offset + F64.size * index)[0]
+                if not math.isfinite(amounts[index]):
+                    raise ValueError("Transaction amount must be finite")
+            elif tag != AMOUNT_INT:
+                raise ValueError(f"Unknown amount tag {tag}")
+    return amounts, offset + I64.size * count
+
+
+def encode_block(block):
+    transactions = block['transactions']
+    parties = sorted({tx['sender'] for tx in transactions} | {tx['receiver'] for tx in transactions})
+    refs = {party: index for index, party in enumerate(parties)}
+    column = f'>{len(transactions)}{REF_FORMATS[len(parties) > MAX_SHORT_REFS]}'
+    versions = bytes(_entry_version(tx) for tx in transactions)
+    return b''.join((
+        BLOCK_HEADER.pack(BLOCK_VERSION, block['block_height'], block['timestamp'], len(transactions)),
+        pack_str(block['previous_hash']),
+        pack_str(block.get('merkle_root', '')),
+        pack_str(block['quantum_proof']),
+        U32.pack(len(parties)),
+        pack_keys(parties),
+        versions,
+        struct.pack(column, *[refs[tx['sender']] for tx in transactions]),
+        struct.pack(column, *[refs[tx['receiver']] for tx in transactions]),
+        pack_amounts(tx['amount'] for tx in transactions),
+        pack_amounts(tx['fee'] for tx, version in zip(transactions, versions) if version == TX_VERSION_FEE),
+        pack_keys(tx.get('signature', '') for tx in transactions)
+    ))
+
+
+def _read_transactions(data, offset, tx_count):
+    """
+    Decode `tx_count` length-prefixed version 1/2 transactions of a
+    version 2 block from `data` (bytes) starting at `offset`; returns
+    (transactions, end offset).
+
+    This is `_read_transaction` unrolled for the block decoder's hot loop:
+    string lengths are read straight from the bytes and string fields are
+    sliced without bounds checks, because a field running past its
+    transaction always shows up as a length mismatch (and one running
+    past the block as an end offset beyond the data).
+    """
+    transactions = []
+    append = transactions.append
+    unpack_u32 = U32.unpack_from
+    unpack_int = I64.unpack_from
+    for _ in range(tx_count):
+        start = offset + 4
+        end = start + unpack_u32(data, offset)[0]
+        version = data[start]
+        offset = start + 3
+        sender_end = offset + ((data[start + 1] << 8) | data[start + 2])
+        sender = data[offset:sender_end].decode()
+        offset = sender_end + 2
+        receiver_end = offset + ((data[sender_end] << 8) | data[sender_end + 1])
+        receiver = data[offset:receiver_end].decode()
+        if data[receiver_end] == AMOUNT_INT:
+            amount = unpack_int(data, receiver_end + 1)[0]
+        else:
+            amount = read_amount(data, receiver_end)
+        offset = receiver_end + AMOUNT_SIZE
+        if version == TX_VERSION:
+            fee = 0
+        elif version == TX_VERSION_FEE:
+            fee = read_amount(data, offset)
+            if not fee > 0:
+                raise ValueError("Version 2 transactions must carry a positive fee")
+            offset += AMOUNT_SIZE
+        else:
+            raise ValueError(f"Unsupported transaction encoding version {version}")
+        signature_end = offset + 2 + ((data[offset] << 8) | data[offset + 1])
+        if signature_end != end:
+            raise ValueError("Transaction length mismatch")
+        transaction = {'sender': sender, 'receiver': receiver, 'amount': amount,
+                       'signature': data[offset + 2:end].decode()}
+        if fee:
+            transaction['fee'] = fee
+        append(transaction)
+        offset = end
+    return transactions, offset
+
+
+def _read_parties(buf, offset):
+    (count,) = U32.unpack_from(buf, offset)
+    parties, offset = read_keys(buf, offset + U32.size, count)
+    if not all(map(operator.lt, parties, parties[1:])):
+        raise ValueError("Block parties are not sorted and unique")
+    return parties, offset
+
+
+def _read_entries(buf, offset, tx_count, parties):
+    """
+    Decode the `entries` of a block at `offset`, with refs into `parties`;
+    returns (transactions, end offset). Every column is read in one call
+    and the transactions are assembled with one comprehension.
+    """
+    versions = bytes(buf[offset:offset + tx_count])
+    if len(versions) != tx_count:
+        raise ValueError("Truncated block encoding")
+    offset += tx_count
+    if versions.translate(None, bytes(TX_VERSIONS)):
+        raise ValueError("Unsupported transaction encoding version")
+    column = f'>{tx_count}{REF_FORMATS[len(parties) > MAX_SHORT_REFS]}'
+    senders = struct.unpack_from(column, buf, offset)
+    offset += tx_count * ref_size(len(parties))
+    receivers = struct.unpack_from(column, buf, offset)
+    offset += tx_count * ref_size(len(parties))
+    amounts, offset = read_amounts(buf, offset, tx_count)
+    fees, offset = read_amounts(buf, offset, versions.count(TX_VERSION_FEE))
+    if fees and not min(fees) > 0:
+        raise ValueError("Version 2 transactions must carry a positive fee")
+    signatures, offset = read_keys(buf, offset, tx_count)
+    if tx_count and max(max(senders), max(receivers)) >= len(parties):
+        raise ValueError("Party reference out of range")
+    if len(set(senders).union(receivers)) != len(parties):
+        raise ValueError("Unused party in block")
+    party = parties.__getitem__
+    transactions = [{'sender': sender, 'receiver': receiver, 'amount': amount, 'signature': signature}
+                    for sender, receiver, amount, signature
+                    in zip(map(party, senders), map(party, receivers), amounts, signatures)]
+    if fees:
+        paying = [tx for tx, version in zip(transactions, versions) if version == TX_VERSION_FEE]
+        for transaction, fee in zip(paying, fees):
+            transaction['fee'] = fee
+    return transactions, offset
+
+
+def decode_block(payload):
+    """Decode a stored block, in any format it was ever stored in, into a dict."""
+    if payload[0] == LEGACY_JSON_MARKER:
+        return json.loads(bytes(payload))
+    if payload[0] == BLOCK_VERSION_V1:
+        return BlockView(payload).to_dict()
+    return _decode_binary(payload)
+
+
+def decode_binary_block(payload):
+    """Strictly decode a current-version binary block, the only form accepted from peers."""
+    if not payload or payload[0] != BLOCK_VERSION:
+        raise ValueError(f"Unsupported block encoding version {payload[0] if payload else None}")
+    return _decode_binary(payload)
+
+
+def _decode_binary(payload):
+    data = bytes(payload)
+    try:
+        version, height, timestamp, tx_count = BLOCK_HEADER.unpack_from(data)
+        if version not in (BLOCK_VERSION, BLOCK_VERSION_V2):
+            raise ValueError(f"Unsupported block encoding version {version}")
+        previous_hash, offset = read_str(data, BLOCK_HEADER.size)
+        merkle_root, offset = read_str(data, offset)
+        quantum_proof, offset = read_str(data, offset)
+        if version == BLOCK_VERSION:
+            parties, offset = _read_parties(data, offset)
+            transactions, offset = _read_entries(data, offset, tx_count, parties)
+        else:
+            transactions, offset = _read_transactions(data, offset, tx_count)
+    except (IndexError, struct.error):
+        raise ValueError("Truncated block encoding")
+    if offset > len(data):
+        raise ValueError("Truncated block encoding")
+    if offset != len(data):
+        raise ValueError("Trailing bytes after block")
+    return {
+        'transactions': transactions,
+        'quantum_proof': quantum_proof,
+        'timestamp': timestamp,
+        'previous_hash': previous_hash,
+        'block_height': height,
+        'merkle_root': merkle_root
+    }
+
+
+def view_block(payload):
+    """Wrap a stored record in a BlockView (legacy JSON records decode to a dict)."""
+    if payload[0] == LEGACY_JSON_MARKER:
+        return json.loads(bytes(payload))
+    return BlockView(payload)
+
+
+class TransactionView:
+    """Read-only view over one encoded transaction; fields decode on access."""
+    __slots__ = ('_buf', '_base')
+
+    def __init__(self, buf, base=1):
+        # `base` skips the version byte; version 1 blocks stored transactions without one
+        self._buf = buf
+        self._base = base
+
+    @property
+    def sender(self):
+        return read_str(self._buf, self._base)[0]
+
+    @property
+    def receiver(self):
+        return read_str(self._buf, skip_str(self._buf, self._base))[0]
+
+    def _amount_offset(self):
+        return skip_str(self._buf, skip_str(self._buf, self._base))
+
+    def _has_fee(self):
+        return self._base and self._buf[0] == TX_VERSION_FEE
+
+    @property
+    def amount(self):
+        return read_amount(self._buf, self._amount_offset())
+
+    @property
+    def fee(self):
+        if not self._has_fee():
+            return 0
+        return read_amount(self._buf, self._amount_offset() + AMOUNT_SIZE)
+
+    @property
+    def signature(self):
+        fields = 2 if self._has_fee() else 1
+        return read_str(self._buf, self._amount_offset() + fields * AMOUNT_SIZE)[0]
+
+    def __getitem__(self, key):
+        if key not in ('sender', 'receiver', 'amount', 'fee', 'signature'):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        version = self._buf[0] if self._base else TX_VERSION
+        return _read_transaction(self._buf, self._base, version)[0]
+
+
+class EntryView:
+    """One transaction of a current-version block, decoded with its block's entries."""
+    __slots__ = ('_fields',)
+
+    def __init__(self, fields):
+        self._fields = fields
+
+    @property
+    def sender(self):
+        return self._fields['sender']
+
+    @property
+    def receiver(self):
+        return self._fields['receiver']
+
+    @property
+    def amount(self):
+        return self._fields['amount']
+
+    @property
+    def fee(self):
+        return self._fields.get('fee', 0)
+
+    @property
+    def signature(self):
+        return self._fields['signature']
+
+    __getitem__ = TransactionView.__getitem__
+    get = TransactionView.get
+
+    def to_dict(self):
+        return dict(self._fields)
+
+
+class BlockView:
+    """
+    Read-only view over an encoded block held in a buffer (e.g. a memoryview
+    into an mmapped segment). Nothing is copied or decoded until a field is
+    read. Older blocks' transactions are sliced from the buffer one by one;
+    a current-version block's are stored by column, so they are decoded
+    together on first use, and `iter_amounts` reads only the amounts.
+    """
+    __slots__ = ('_buf', '_version', '_tx_start', '_entries')
+
+    def __init__(self, buf):
+        self._buf = buf
+        self._version = buf[0]
+        if self._version not in BLOCK_VERSIONS:
+            raise ValueError(f"Unsupported block encoding version {buf[0]}")
+        self._tx_start = None
+        self._entries = None
+
+    @property
+    def block_height(self):
+        return BLOCK_HEADER.unpack_from(self._buf)[1]
+
+    @property
+    def timestamp(self):
+        return BLOCK_HEADER.unpack_from(self._buf)[2]
+
+    @property
+    def tx_count(self):
+        return BLOCK_HEADER.unpack_from(self._buf)[3]
+
+    @property
+    def previous_hash(self):
+        return read_str(self._buf, BLOCK_HEADER.size)[0]
+
+    @property
+    def merkle_root(self):
+        if self._version == BLOCK_VERSION_V1:
+            return ''
+        return read_str(self._buf, skip_str(self._buf, BLOCK_HEADER.size))[0]
+
+    def _proof_offset(self):
+        offset = skip_str(self._buf, BLOCK_HEADER.size)
+        if self._version != BLOCK_VERSION_V1:
+            offset = skip_str(self._buf, offset)
+        return offset
+
+    @property
+    def quantum_proof(self):
+        return read_str(self._buf, self._proof_offset())[0]
+
+    def _transactions_offset(self):
+        if self._tx_start is None:
+            self._tx_start = skip_str(self._buf, self._proof_offset())
+        return self._tx_start
+
+    def _decoded_entries(self):
+        """(transactions, end offset) of a current-version block."""
+        if self._entries is None:
+            parties, offset = _read_parties(self._buf, self._transactions_offset())
+            self._entries = _read_entries(self._buf, offset, self.tx_count, parties)
+        return self._entries
+
+    def _iter_transaction_offsets(self):
+        offset = self._transactions_offset()
+        for _ in range(self.tx_count):
+            (length,) = U32.unpack_from(self._buf, offset)
+            offset += U32.size
+            yield offset, offset + length
+            offset += length
+
+    def end(self):
+        """Offset just past the last transaction."""
+        if self._version == BLOCK_VERSION:
+            return self._decoded_entries()[1]
+        end = self._transactions_offset()
+        for _, end in self._iter_transaction_offsets():
+            pass
+        return end
+
+    def _tx_base(self):
+        return 0 if self._version == BLOCK_VERSION_V1 else 1
+
+    def iter_transactions(self):
+        if self._version == BLOCK_VERSION:
+            for fields in self._decoded_entries()[0]:
+                yield EntryView(fields)
+            return
+        base = self._tx_base()
+        for start, end in self._iter_transaction_offsets():
+            if base and self._buf[start] not in TX_VERSIONS:
+                raise ValueError(f"Unsupported transaction encoding version {self._buf[start]}")
+            yield TransactionView(self._buf[start:end], base)
+
+    def transaction_at(self, position):
+        for index, transaction in enumerate(self.iter_transactions()):
+            if index == position:
+                return transaction
+        raise IndexError(position)
+
+    def iter_amounts(self):
+        """Yield each transaction amount without creating per-transaction objects."""
+        buf = self._buf
+        if self._version == BLOCK_VERSION:
+            offset = self._transactions_offset()
+            (party_count,) = U32.unpack_from(buf, offset)
+            offset += U32.size + party_count
+            offset += U16.size * party_count + sum(struct.unpack_from(f'>{party_count}H', buf, offset))
+            tx_count = self.tx_count
+            yield from read_amounts(buf, offset + tx_count * (1 + 2 * ref_size(party_count)), tx_count)[0]
+            return
+        base = self._tx_base()
+        for start, _ in self._iter_transaction_offsets():
+            yield read_amount(buf, skip_str(buf, skip_str(buf, start + base)))
+
+    @property
+    def transactions(self):
+        return list(self.iter_transactions())
+
+    FIELDS = ('transactions', 'merkle_root', 'quantum_proof', 'timestamp', 'previous_hash', 'block_height',
+              'tx_count')
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def to_dict(self):
+        block = {
+            'transactions': [tx.to_dict() for tx in self.iter_transactions()],
+            'quantum_proof': self.quantum_proof,
+            'timestamp': self.timestamp,
+            'previous_hash': self.previous_hash,
+            'block_height': self.block_height
+        }
+        if self._version != BLOCK_VERSION_V1:
+            block['merkle_root'] = self.merkle_root
+        return block
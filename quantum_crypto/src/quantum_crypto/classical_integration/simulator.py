@@ -0,0 +1,324 @@
+"""
+In-process network simulator for load tests.
+
+Starts N nodes on localhost, each a `Node` with its own `Network`, wires
+them into a random connected graph and injects transactions, measuring
+how long each takes to reach every node, the throughput the network
+sustains and how long a new block takes to reach every tip. Each link
+can be given a one-way latency, jitter and a message drop rate; these
+are applied per message on the receiving side, so TCP framing stays
+intact and the version handshake is never dropped.
+
+    python -m quantum_crypto.classical_integration.simulator --nodes 50 \\
+        --transactions 2000 --rate 500 --latency 0.02 --drop 0.01
+"""
+import argparse
+import contextlib
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import deque
+
+from .address_book import address_key
+from .network import Network
+from .node import Node
+from .peer_manager import PENALTY_PROTOCOL
+from .protocol import ProtocolError, CMD_VERSION, INV_TX
+from .storage import FileStorage
+from .transactions import create_transaction
+
+DEFAULT_DEGREE = 4  # mean connections per node
+POLL_INTERVAL = 0.005  # seconds between checks while waiting on the nodes
+HOST = '127.0.0.1'
+
+
+class Link:
+    """Conditions on the messages a node receives from one of its peers."""
+    __slots__ = ('latency', 'jitter', 'drop')
+
+    def __init__(self, latency=0.0, jitter=0.0, drop=0.0):
+        if latency < 0 or jitter < 0:
+            raise ValueError("Link latency and jitter must not be negative")
+        if not 0.0 <= drop <= 1.0:
+            raise ValueError("Link drop rate must be between 0 and 1")
+        self.latency = latency
+        self.jitter = jitter
+        self.drop = drop
+
+
+class SimulatedNetwork(Network):
+    """
+    A `Network` that delays or drops each received message according to
+    its link, and timestamps when it first accepts each transaction.
+    Delayed messages keep their order, as they would on a TCP stream.
+    """
+
+    def __init__(self, simulator, index, node, **options):
+        super().__init__(node, **options)
+        self.simulator = simulator
+        self.index = index
+        self.arrivals = {}  # inv key -> monotonic time first accepted
+        self.dropped = 0
+        self._delayed = {}  # peer -> deque of (due, command, payload)
+        self._rng = random.Random(simulator.rng.random())
+
+    def _announce(self, key, source=None):
+        self.arrivals.setdefault(key, time.monotonic())
+        super()._announce(key, source)
+
+    def handle_message(self, peer, command, payload):
+        link = self.simulator.link_for(self, peer)
+        queue = self._delayed.get(peer)
+        if link is None or command == CMD_VERSION:
+            return super().handle_message(peer, command, payload)
+        if link.drop and self._rng.random() < link.drop:
+            self.dropped += 1
+            return
+        if not (link.latency or link.jitter or queue):
+            return super().handle_message(peer, command, payload)
+        if queue is None:
+            queue = self._delayed[peer] = deque()
+        due = self.loop.time() + link.latency + self._rng.uniform(0, link.jitter)
+        if queue:
+            due = max(due, queue[-1][0])
+        else:
+            self.loop.call_at(due, self._deliver, peer)
+        queue.append((due, command, bytes(payload)))  # the frame buffer is reused by the next read
+
+    def _deliver(self, peer):
+        queue = self._delayed.get(peer)
+        now = self.loop.time()
+        while queue and queue[0][0] <= now and not peer.closed:
+            _, command, payload = queue.popleft()
+            try:
+                super().handle_message(peer, command, memoryview(payload))
+            except ProtocolError as e:
+                print(f"⚠️ Disconnecting {peer.address}: {e}")
+                self.peer_manager.penalize(peer, PENALTY_PROTOCOL, str(e))
+                peer.close()
+        if peer.closed:
+            self._delayed.pop(peer, None)
+            return
+        self._enforce_budget(peer)
+        if queue:
+            self.loop.call_at(queue[0][0], self._deliver, peer)
+
+    def _peer_lost(self, peer):
+        self._delayed.pop(peer, None)
+        super()._peer_lost(peer)
+
+
+class Simulator:
+    """
+    `nodes` nodes connected in a ring plus random chords up to a mean of
+    `degree` connections each (or exactly `edges`, a list of index pairs).
+    Every link gets `latency`, `jitter` and `drop` unless `set_link` says
+    otherwise. Node storage goes to `directory`, or a temporary directory
+    removed by `stop`. Other keyword arguments are passed to each
+    `Network`; outbound dialling is off by default so the graph stays as
+    built, and getdata and blocktxn time out after ten link delays (at
+    least a second) so lossy runs recover within the run.
+    """
+
+    def __init__(self, nodes, degree=DEFAULT_DEGREE, edges=None, latency=0.0, jitter=0.0, drop=0.0,
+                 seed=None, directory=None, **network_options):
+        if nodes < 1:
+            raise ValueError("A simulation needs at least one node")
+        self.size = nodes
+        self.degree = degree
+        self.edges = [tuple(sorted(edge)) for edge in edges] if edges is not None else None
+        self.default_link = Link(latency, jitter, drop)
+        self.links = {}  # frozenset of two node indexes -> Link
+        self.rng = random.Random(seed)
+        self.directory = directory
+        self._temporary = directory is None
+        network_options.setdefault('target_outbound', 0)
+        retry_after = max(1.0, 10 * (latency + jitter))
+        network_options.setdefault('getdata_timeout', retry_after)
+        network_options.setdefault('blocktxn_timeout', retry_after)
+        self.network_options = network_options
+        self.networks = []
+        self._by_address = {}  # "host:port" -> SimulatedNetwork
+        self._tx_counter = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def set_link(self, a, b, latency=0.0, jitter=0.0, drop=0.0):
+        """Set the conditions on the link between nodes `a` and `b`, in both directions."""
+        self.links[frozenset((a, b))] = Link(latency, jitter, drop)
+
+    def link_for(self, network, peer):
+        """The link `network` receives `peer`'s messages over, or None before the peer is identified."""
+        other = self._by_address.get(peer.address_key)
+        if other is None:
+            return None
+        return self.links.get(frozenset((network.index, other.index)), self.default_link)
+
+    def _topology(self):
+        n = self.size
+        edges = {tuple(sorted((i, (i + 1) % n))) for i in range(n) if n > 1}
+        target = min(self.degree * n // 2, n * (n - 1) // 2)
+        while len(edges) < target:
+            edges.add(tuple(sorted(self.rng.sample(range(n), 2))))
+        return sorted(edges)
+
+    def start(self, timeout=30.0):
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix='quantum-sim-')
+        for index in range(self.size):
+            storage = FileStorage(os.path.join(self.directory, f'node{index}.json'))
+            network = SimulatedNetwork(self, index, Node(storage=storage), **self.network_options)
+            network.start_server(host=HOST, port=0)
+            self._by_address[address_key(HOST, network.listen_port)] = network
+            self.networks.append(network)
+        if self.edges is None:
+            self.edges = self._topology()
+        for a, b in self.edges:
+            self.networks[a].connect_to_peer(HOST, self.networks[b].listen_port)
+        degrees = [0] * self.size
+        for a, b in self.edges:
+            degrees[a] += 1
+            degrees[b] += 1
+        # Identified peers have finished the version handshake, so link conditions apply from here on
+        if not self._wait(lambda: all(
+                sum(1 for peer in network.peers if peer.address_key in self._by_address) == degrees[network.index]
+                for network in self.networks), timeout):
+            raise RuntimeError("Simulated nodes did not finish connecting")
+
+    def stop(self):
+        for network in self.networks:
+            network.stop_server()
+        self.networks = []
+        self._by_address = {}
+        if self._temporary and self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+    def _wait(self, condition, timeout):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(POLL_INTERVAL)
+        return True
+
+    def run_load(self, count, rate=None, timeout=30.0, origin=None):
+        """
+        Submit `count` transactions to node `origin` (or to randomly chosen
+        nodes), `rate` per second (or as fast as possible), and wait up to
+        `timeout` seconds after the last one for every node to accept them
+        all. Returns a dict of propagation latency percentiles (seconds
+        from submission to acceptance, over every node but the origin),
+        the fraction of deliveries made and the throughput in transactions
+        per second that reached every node.
+        """
+        transactions = []
+        for _ in range(count):
+            self._tx_counter += 1
+            n = self._tx_counter
+            transactions.append(create_transaction(f'sim-sender-{n}', 'sim-receiver', n, f'sim-signature-{n}'))
+        origins = [self.rng.randrange(self.size) if origin is None else origin for _ in transactions]
+
+        submitted = {}  # inv key -> (origin index, submission time)
+        started = time.monotonic()
+        for position, (tx, index) in enumerate(zip(transactions, origins)):
+            if rate:
+                delay = started + position / rate - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            submitted[(INV_TX, tx.digest)] = (index, time.monotonic())
+            self.networks[index].broadcast_transaction(tx)
+        self._wait(lambda: all(key in network.arrivals for network in self.networks for key in submitted), timeout)
+
+        latencies, complete = [], []
+        for key, (index, sent) in submitted.items():
+            reached = []
+            for network in self.networks:
+                arrival = network.arrivals.get(key)
+                if arrival is None:
+                    continue
+                reached.append(arrival)
+                if network.index != index:
+                    latencies.append(arrival - sent)
+            if len(reached) == self.size:
+                complete.append(max(reached))
+        latencies.sort()
+        expected = count * (self.size - 1)
+        report = {
+            'transactions': count,
+            'offered_rate': rate,
+            'delivered': len(latencies) / expected if expected else 1.0,
+            'complete': len(complete),
+            'throughput': len(complete) / (max(complete) - started) if complete else 0.0,
+            'dropped_messages': sum(network.dropped for network in self.networks),
+        }
+        for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0)):
+            report[f'latency_{name}'] = _percentile(latencies, fraction)
+        return report
+
+    def converge_block(self, origin=0, timeout=30.0):
+        """Mine a block from `origin`'s mempool and return the seconds until every node's tip is that block, or None."""
+        network = self.networks[origin]
+        block = network.node.create_block()
+        started = time.monotonic()
+        network.broadcast_block(block)
+        if not self._wait(lambda: all(other.node.storage.get_tip()['hash'] == block['quantum_proof']
+                                      for other in self.networks), timeout):
+            return None
+        return time.monotonic() - started
+
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def print_report(simulator, report, convergence):
+    def ms(seconds):
+        return 'n/a' if seconds is None else f"{seconds * 1000:.1f} ms"
+
+    print(f"\n🌐 {simulator.size} nodes, {len(simulator.edges)} links")
+    print(f"📨 {report['transactions']} transactions, {report['delivered']:.1%} of deliveries made, "
+          f"{report['complete']} reached every node")
+    print(f"⏱️ Propagation latency: p50 {ms(report['latency_p50'])}, p90 {ms(report['latency_p90'])}, "
+          f"p99 {ms(report['latency_p99'])}, max {ms(report['latency_max'])}")
+    print(f"🚀 Throughput: {report['throughput']:.1f} tx/s to every node")
+    print(f"🗑️ Messages dropped by links: {report['dropped_messages']}")
+    print(f"🔗 Block convergence: {'timed out' if convergence is None else ms(convergence)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test a simulated network of nodes on localhost.")
+    parser.add_argument('--nodes', type=int, default=10)
+    parser.add_argument('--degree', type=int, default=DEFAULT_DEGREE, help="mean connections per node")
+    parser.add_argument('--transactions', type=int, default=1000)
+    parser.add_argument('--rate', type=float, default=0.0, help="transactions per second (0: as fast as possible)")
+    parser.add_argument('--latency', type=float, default=0.0, help="one-way link latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.0, help="extra random latency of up to this many seconds")
+    parser.add_argument('--drop', type=float, default=0.0, help="fraction of messages each link drops")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--verbose', action='store_true', help="show the nodes' own output")
+    args = parser.parse_args(argv)
+
+    simulator = Simulator(args.nodes, degree=args.degree, latency=args.latency, jitter=args.jitter,
+                          drop=args.drop, seed=args.seed)
+    with open(os.devnull, 'w') as devnull:
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)
+        with quiet, simulator:
+            report = simulator.run_load(args.transactions, args.rate or None, args.timeout)
+            convergence = simulator.converge_block(timeout=args.timeout)
+    print_report(simulator, report, convergence)
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Chain snapshots for bootstrapping new nodes without replaying every block.
+
+A snapshot taken at height H holds the tip metadata, every block hash and
+txid up to H with the parties of each transaction (enough to rebuild the
+hash, transaction and address indexes), and all account balances at H:
+
+    magic b'QCSN' | version u8 | zlib(body) | sha256(zlib(body))
+    body := height i64 | timestamp f64 | hash str | account_count u32
+            | account_count * (pubkey str | balance amount)
+            | (H + 1) * (block_hash str | tx_count u32
+                         | tx_count * (txid 32 bytes | sender u32 | receiver u32))
+
+`sender` and `receiver` index into the account list.
+"""
+import hashlib
+import struct
+import zlib
+
+from .serialization import pack_str, pack_amount, read_str, read_amount, U32, AMOUNT_SIZE
+from .transactions import transaction_id
+
+SNAPSHOT_MAGIC = b'QCSN'
+SNAPSHOT_VERSION = 1
+PREAMBLE = struct.Struct('>4sB')
+SNAPSHOT_TIP = struct.Struct('>qd')  # height, timestamp
+TX_ENTRY = struct.Struct('>32sII')  # txid, sender id, receiver id
+
+
+def export_snapshot(storage, path, height=None):
+    """Write a snapshot of `storage` at `height` (default: the tip) to `path`."""
+    tip = storage.get_tip()
+    height = tip['height'] if height is None else height
+    if not 0 <= height <= tip['height']:
+        raise ValueError(f"Cannot snapshot height {height}; chain tip is {tip['height']}")
+
+    balances = {}
+    account_ids = {}
+    block_parts = []
+    last_block = None
+    for block in storage.iter_blocks(0, height + 1):
+        if block['block_height'] != len(block_parts):
+            raise ValueError("Snapshots need the full block history from genesis")
+        entries = []
+        for tx in block['transactions']:
+            amount = tx['amount']
+            balances[tx['sender']] = balances.get(tx['sender'], 0) - amount - tx.get('fee', 0)
+            balances[tx['receiver']] = balances.get(tx['receiver'], 0) + amount
+            sender_id = account_ids.setdefault(tx['sender'], len(account_ids))
+            receiver_id = account_ids.setdefault(tx['receiver'], len(account_ids))
+            entries.append(TX_ENTRY.pack(bytes.fromhex(transaction_id(tx)), sender_id, receiver_id))
+        block_parts.append(pack_str(block['quantum_proof']) + U32.pack(len(entries)) + b''.join(entries))
+        last_block = block
+    if len(block_parts) != height + 1:
+        raise ValueError("Snapshots need the full block history from genesis")
+
+    body = b''.join(
+        [SNAPSHOT_TIP.pack(height, last_block['timestamp']), pack_str(last_block['quantum_proof']),
+         U32.pack(len(account_ids))] +
+        [pack_str(pubkey) + pack_amount(balances[pubkey]) for pubkey in account_ids] +
+        block_parts
+    )
+    compressed = zlib.compress(body)
+    with open(path, 'wb') as f:
+        f.write(PREAMBLE.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION))
+        f.write(compressed)
+        f.write(hashlib.sha256(compressed).digest())
+    print(f"📸 Snapshot of height {height} written to {path} ({len(compressed) + 37} bytes)")
+    return height
+
+
+def read_snapshot(path):
+    """
+    Verify and decode a snapshot file.
+
+    Returns a dict with 'height', 'hash', 'timestamp', 'balances' and
+    'blocks', a list of (block_hash, [(txid, sender, receiver), ...]).
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < PREAMBLE.size + 32:
+        raise ValueError("Snapshot file is truncated")
+    magic, version = PREAMBLE.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError("Not a chain snapshot")
+    compressed, checksum = data[PREAMBLE.size:-32], data[-32:]
+    if hashlib.sha256(compressed).digest() != checksum:
+        raise ValueError("Snapshot checksum mismatch")
+    body = zlib.decompress(compressed)
+
+    height, timestamp = SNAPSHOT_TIP.unpack_from(body)
+    tip_hash, offset = read_str(body, SNAPSHOT_TIP.size)
+    (account_count,) = U32.unpack_from(body, offset)
+    offset += U32.size
+    accounts = []
+    balances = {}
+    for _ in range(account_count):
+        pubkey, offset = read_str(body, offset)
+        balances[pubkey] = read_amount(body, offset)
+        accounts.append(pubkey)
+        offset += AMOUNT_SIZE
+    blocks = []
+    for _ in range(height + 1):
+        block_hash, offset = read_str(body, offset)
+        (tx_count,) = U32.unpack_from(body, offset)
+        offset += U32.size
+        transactions = []
+        for txid, sender_id, receiver_id in TX_ENTRY.iter_unpack(body[offset:offset + tx_count * TX_ENTRY.size]):
+            transactions.append((txid.hex(), accounts[sender_id], accounts[receiver_id]))
+        offset += tx_count * TX_ENTRY.size
+        blocks.append((block_hash, transactions))
+    return {'height': height, 'hash': tip_hash, 'timestamp': timestamp,
+            'balances': balances, 'blocks': blocks}
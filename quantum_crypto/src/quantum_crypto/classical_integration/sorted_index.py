@@ -0,0 +1,216 @@
+import heapq
+import mmap
+import os
+import struct
+
+KEY = struct.Struct('>Q')  # every entry starts with a 64-bit key, then its height
+TAIL_LIMIT = 4096  # journal entries held in memory before they are sorted into a run file
+RUN_SUFFIX = '.run'
+
+
+class SortedRun:
+    """One immutable run file: the journal entries [start, end) sorted by key."""
+
+    def __init__(self, path, start, end, entry):
+        self.path = path
+        self.start = start
+        self.end = end
+        self._file = open(path, 'rb')
+        self.size = os.fstat(self._file.fileno()).st_size // entry.size
+        self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+
+    def close(self):
+        if self.size:
+            self.data.close()
+        self._file.close()
+
+    def remove(self):
+        self.close()
+        os.remove(self.path)
+
+
+class SortedIndex:
+    """
+    Append-only journal of fixed-size entries that start with (key, height),
+    written in height order, plus sorted run files that answer key lookups
+    with a binary search over a memory map.
+
+    Only the journal tail not yet covered by a run is held in memory, so
+    opening reads at most about TAIL_LIMIT entries however long the chain.
+    `compact` sorts a full tail into a run and merges runs of similar
+    length, which keeps O(log n) runs. Runs are derived from the journal:
+    any that are missing, stale or past its end are dropped on open and
+    their entries read back from the journal instead.
+    """
+
+    def __init__(self, path, entry, skip=None):
+        self.path = path
+        self.entry = entry
+        self._skip = skip  # entries it matches are journal markers, never looked up
+        self._journal = open(path, 'a+b')
+        size = os.fstat(self._journal.fileno()).st_size
+        if size % entry.size:
+            self._journal.truncate(size - size % entry.size)
+        self.count = size // entry.size
+        self._runs = self._open_runs()
+        self._load_tail()
+
+    def _open_runs(self):
+        directory, name = os.path.split(self.path)
+        found = {}
+        for run_name in os.listdir(directory or '.'):
+            if not run_name.startswith(name + '.'):
+                continue
+            if not run_name.endswith(RUN_SUFFIX):
+                if run_name.endswith(RUN_SUFFIX + '.tmp'):
+                    os.remove(os.path.join(directory, run_name))
+                continue
+            bounds = run_name[len(name) + 1:-len(RUN_SUFFIX)].split('-')
+            if len(bounds) == 2 and all(bound.isdigit() for bound in bounds):
+                found[int(bounds[0]), int(bounds[1])] = os.path.join(directory, run_name)
+        # Keep the longest chain of runs covering the journal from its start
+        runs = []
+        covered = 0
+        for start, end in sorted(found, key=lambda bounds: (bounds[0], -bounds[1])):
+            if start == covered and covered < end <= self.count:
+                runs.append(SortedRun(found[start, end], start, end, self.entry))
+                covered = end
+            else:
+                os.remove(found[start, end])
+        return runs
+
+    def _load_tail(self):
+        self._tail = {}
+        for entry in self.entries(self.covered):
+            self._remember(entry)
+
+    def _remember(self, entry):
+        if self._skip is None or not self._skip(entry):
+            self._tail.setdefault(entry[0], []).append(entry)
+
+    @property
+    def covered(self):
+        """Number of journal entries already sorted into runs."""
+        return self._runs[-1].end if self._runs else 0
+
+    def entries(self, start=0):
+        """Yield journal entries from index `start` on, in the order written."""
+        self._journal.seek(start * self.entry.size)
+        yield from self.entry.iter_unpack(self._journal.read((self.count - start) * self.entry.size))
+
+    def append(self, entries):
+        self._journal.write(b''.join(self.entry.pack(*entry) for entry in entries))
+        self._journal.flush()
+        for entry in entries:
+            self._remember(entry)
+        self.count += len(entries)
+
+    def compact(self):
+        """Sort the tail into a run once it is full, then merge runs of similar length."""
+        if self.count - self.covered < TAIL_LIMIT:
+            return
+        tail = sorted(entry for entries in self._tail.values() for entry in entries)
+        self._runs.append(self._write_run(self.covered, self.count, tail))
+        self._tail = {}
+        while len(self._runs) > 1 and (self._runs[-2].end - self._runs[-2].start
+                                       <= 2 * (self._runs[-1].end - self._runs[-1].start)):
+            newer = self._runs.pop()
+            older = self._runs.pop()
+            merged = heapq.merge(self.entry.iter_unpack(older.data), self.entry.iter_unpack(newer.data))
+            self._runs.append(self._write_run(older.start, newer.end, merged))
+            older.remove()
+            newer.remove()
+
+    def _write_run(self, start, end, entries):
+        path = f"{self.path}.{start}-{end}{RUN_SUFFIX}"
+        with open(path + '.tmp', 'wb') as f:
+            f.writelines(self.entry.pack(*entry) for entry in entries)
+            f.flush()
+            os.fsync(f.fileno())  # a run that survives a crash must hold all its entries
+        os.replace(path + '.tmp', path)
+        return SortedRun(path, start, end, self.entry)
+
+    def _bisect(self, run, key, lo, upper):
+        hi = run.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            found = KEY.unpack_from(run.data, mid * self.entry.size)[0]
+            if found < key or (upper and found == key):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _sources(self, key):
+        """Yield (read, count) for each place holding entries for `key`, oldest first."""
+        for run in self._runs:
+            lo = self._bisect(run, key, 0, False)
+            hi = self._bisect(run, key, lo, True)
+            if hi > lo:
+                yield (lambda i, run=run, lo=lo: self.entry.unpack_from(run.data, (lo + i) * self.entry.size)), hi - lo
+        tail = self._tail.get(key)
+        if tail:
+            yield tail.__getitem__, len(tail)
+
+    def last(self, key):
+        """Return the newest entry for `key`, or None."""
+        tail = self._tail.get(key)
+        if tail:
+            return tail[-1]
+        for run in reversed(self._runs):
+            hi = self._bisect(run, key, 0, True)
+            if hi and KEY.unpack_from(run.data, (hi - 1) * self.entry.size)[0] == key:
+                return self.entry.unpack_from(run.data, (hi - 1) * self.entry.size)
+        return None
+
+    def count_of(self, key):
+        return sum(count for _, count in self._sources(key))
+
+    def find(self, key, start=0, stop=None):
+        """Return the entries for `key` in the order written, sliced to [start:stop]."""
+        found = []
+        first = 0
+        for read, count in self._sources(key):
+            lo = max(start - first, 0)
+            hi = count if stop is None else min(stop - first, count)
+            found.extend(read(i) for i in range(lo, hi))
+            first += count
+        return found
+
+    def _first_at(self, height):
+        """Return the index of the first journal entry at or above `height`."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            self._journal.seek(mid * self.entry.size)
+            if self.entry.unpack(self._journal.read(self.entry.size))[1] < height:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def truncate(self, height):
+        """Drop every entry at or above `height`."""
+        cut = self._first_at(height)
+        if cut == self.count:
+            return
+        kept = [run for run in self._runs if run.end <= cut]
+        for run in self._runs[len(kept):]:
+            if run.start < cut:
+                entries = (entry for entry in self.entry.iter_unpack(run.data) if entry[1] < height)
+                kept.append(self._write_run(run.start, cut, entries))
+            run.remove()
+        self._runs = kept
+        self._journal.truncate(cut * self.entry.size)
+        self._journal.flush()
+        self.count = cut
+        self._load_tail()
+
+    def sync(self):
+        """fsync the journal; runs are fsynced as they are written."""
+        os.fsync(self._journal.fileno())
+
+    def close(self):
+        for run in self._runs:
+            run.close()
+        self._journal.close()
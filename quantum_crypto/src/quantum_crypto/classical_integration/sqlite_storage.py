@@ -0,0 +1,225 @@
+import sqlite3
+
+from ..config.config import SQLITE_FILE, STORAGE_FSYNC_POLICY
+from .block_log import FSYNC_ALWAYS, FSYNC_INTERVAL, FSYNC_NEVER
+from .chain_tip import GENESIS_HASH
+from .serialization import encode_block, decode_block, view_block
+from .snapshot import read_snapshot
+from .storage import StorageBackend
+from .transactions import transaction_id
+
+SYNCHRONOUS_MODES = {FSYNC_ALWAYS: 'FULL', FSYNC_INTERVAL: 'NORMAL', FSYNC_NEVER: 'OFF'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blocks (
+    height INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL,
+    previous_hash TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    tx_count INTEGER NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blocks_hash ON blocks (hash);
+CREATE TABLE IF NOT EXISTS transactions (
+    height INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    txid TEXT NOT NULL,
+    sender TEXT,
+    receiver TEXT,
+    amount,  -- untyped so int and float amounts round-trip unchanged
+    signature TEXT,
+    fee NOT NULL DEFAULT 0,
+    PRIMARY KEY (height, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS transactions_txid ON transactions (txid);
+CREATE TABLE IF NOT EXISTS accounts (
+    pubkey TEXT PRIMARY KEY,
+    balance NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS pruned_blocks (
+    height INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL,
+    timestamp REAL  -- only known for the snapshot tip
+);
+CREATE INDEX IF NOT EXISTS pruned_blocks_hash ON pruned_blocks (hash);
+CREATE INDEX IF NOT EXISTS transactions_sender ON transactions (sender, height, position);
+CREATE INDEX IF NOT EXISTS transactions_receiver ON transactions (receiver, height, position);
+"""
+
+# Statements are kept as module constants so sqlite3's statement cache
+# reuses one prepared statement per query for the life of the connection.
+INSERT_BLOCK = ("INSERT INTO blocks (height, hash, previous_hash, timestamp, tx_count, payload) "
+                "VALUES (?, ?, ?, ?, ?, ?)")
+INSERT_TRANSACTION = ("INSERT INTO transactions (height, position, txid, sender, receiver, amount, signature, fee) "
+                      "VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+INSERT_PRUNED_BLOCK = "INSERT INTO pruned_blocks (height, hash, timestamp) VALUES (?, ?, ?)"
+INSERT_PRUNED_TRANSACTION = ("INSERT INTO transactions (height, position, txid, sender, receiver) "
+                             "VALUES (?, ?, ?, ?, ?)")
+INSERT_ACCOUNT = "INSERT INTO accounts (pubkey, balance) VALUES (?, ?)"
+SELECT_TIP = ("SELECT height, hash, timestamp FROM blocks "
+              "UNION ALL SELECT height, hash, timestamp FROM pruned_blocks "
+              "ORDER BY height DESC LIMIT 1")
+SELECT_PRUNED_HEIGHT = "SELECT height FROM pruned_blocks WHERE hash = ? ORDER BY height LIMIT 1"
+SELECT_BY_HEIGHT = "SELECT payload FROM blocks WHERE height = ?"
+SELECT_BY_HASH = "SELECT payload FROM blocks WHERE hash = ? ORDER BY height LIMIT 1"
+SELECT_RANGE = "SELECT payload FROM blocks WHERE height >= ? AND height < ? ORDER BY height"
+SELECT_ALL = "SELECT payload FROM blocks ORDER BY height"
+UPDATE_BALANCE = ("INSERT INTO accounts (pubkey, balance) VALUES (?1, ?2) "
+                  "ON CONFLICT (pubkey) DO UPDATE SET balance = balance + ?2")
+SELECT_BALANCE = "SELECT balance FROM accounts WHERE pubkey = ?"
+TRANSACTION_COLUMNS = "txid, height, position, sender, receiver, amount, signature, fee"
+ADD_FEE_COLUMN = "ALTER TABLE transactions ADD COLUMN fee NOT NULL DEFAULT 0"
+UPDATE_FEE = "UPDATE transactions SET fee = ? WHERE height = ? AND position = ?"
+SELECT_TRANSACTION = f"SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE txid = ? LIMIT 1"
+SELECT_ADDRESS_HISTORY = (
+    f"SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE sender = ?1 "
+    f"UNION SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE receiver = ?1 "
+    "ORDER BY height DESC, position DESC LIMIT ?2 OFFSET ?3"
+)
+
+
+def _transaction_row(row):
+    txid, height, position, sender, receiver, amount, signature, fee = row
+    transaction = {'sender': sender, 'receiver': receiver, 'amount': amount, 'signature': signature}
+    if amount is None:
+        # Imported from a snapshot: the location is known, the body is not
+        transaction = None
+    elif fee:  # as in Transaction.to_dict, so the txid recomputes
+        transaction['fee'] = fee
+    return {'txid': txid, 'block_height': height, 'position': position, 'transaction': transaction}
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    Block storage in a SQLite database running in WAL mode.
+
+    Each block is kept whole in `blocks.payload`, and its transactions are
+    also written out row by row so operators can query the ledger with
+    plain SQL, e.g. every transfer sent by one pubkey. Balances live in
+    `accounts` and are updated in the same SQL transaction as the block.
+    A store bootstrapped from a snapshot keeps only hashes in
+    `pruned_blocks` and bodiless transaction rows up to the snapshot height.
+    """
+
+    def __init__(self, db_file=SQLITE_FILE, fsync_policy=STORAGE_FSYNC_POLICY, **_):
+        self.db_file = db_file
+        self.conn = sqlite3.connect(db_file, check_same_thread=False, cached_statements=64)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA synchronous={SYNCHRONOUS_MODES[fsync_policy]}")
+        self.conn.executescript(SCHEMA)
+        self._add_fee_column()
+        row = self.conn.execute(SELECT_TIP).fetchone()
+        if row:
+            self.tip = {'height': row[0], 'hash': row[1], 'timestamp': row[2]}
+        else:
+            self.tip = {'height': -1, 'hash': GENESIS_HASH, 'timestamp': None}
+
+    def _add_fee_column(self):
+        """Upgrade a database from before fees: add the column and fill it from the stored blocks."""
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(transactions)")]
+        if 'fee' in columns:
+            return
+        with self.conn:
+            self.conn.execute(ADD_FEE_COLUMN)
+            for (payload,) in self.conn.execute(SELECT_ALL).fetchall():
+                block = decode_block(payload)
+                self.conn.executemany(UPDATE_FEE, (
+                    (tx['fee'], block['block_height'], position)
+                    for position, tx in enumerate(block['transactions']) if tx.get('fee')
+                ))
+
+    def import_snapshot(self, snapshot_file):
+        if self.tip['height'] != -1:
+            raise ValueError("Snapshots can only be imported into an empty store")
+        snapshot = read_snapshot(snapshot_file)
+        with self.conn:
+            self.conn.executemany(INSERT_PRUNED_BLOCK, (
+                (height, block_hash, snapshot['timestamp'] if height == snapshot['height'] else None)
+                for height, (block_hash, _) in enumerate(snapshot['blocks'])
+            ))
+            self.conn.executemany(INSERT_PRUNED_TRANSACTION, (
+                (height, position, txid, sender, receiver)
+                for height, (_, transactions) in enumerate(snapshot['blocks'])
+                for position, (txid, sender, receiver) in enumerate(transactions)
+            ))
+            self.conn.executemany(INSERT_ACCOUNT, snapshot['balances'].items())
+        self.tip = {'height': snapshot['height'], 'hash': snapshot['hash'], 'timestamp': snapshot['timestamp']}
+        print(f"Bootstrapped from snapshot at height {snapshot['height']}")
+        return snapshot['height']
+
+    def _write_block(self, block):
+        height = block['block_height']
+        transactions = block['transactions']
+        with self.conn:
+            self.conn.execute(INSERT_BLOCK, (
+                height, block['quantum_proof'], block['previous_hash'], block['timestamp'],
+                len(transactions), encode_block(block)
+            ))
+            self.conn.executemany(INSERT_TRANSACTION, (
+                (height, position, transaction_id(tx), tx.get('sender'), tx.get('receiver'),
+                 tx.get('amount'), tx.get('signature', ''), tx.get('fee', 0))
+                for position, tx in enumerate(transactions)
+            ))
+            deltas = {}
+            for tx in transactions:
+                deltas[tx['sender']] = deltas.get(tx['sender'], 0) - tx['amount'] - tx.get('fee', 0)
+                deltas[tx['receiver']] = deltas.get(tx['receiver'], 0) + tx['amount']
+            self.conn.executemany(UPDATE_BALANCE, deltas.items())
+        self.tip = {'height': height, 'hash': block['quantum_proof'], 'timestamp': block['timestamp']}
+
+    def append_block(self, block):
+        # Set block height
+        block['block_height'] = self.tip['height'] + 1
+        self._write_block(block)
+        print(f"Block #{block['block_height']} added to chain")
+        return block
+
+    def get_blockchain(self):
+        return [decode_block(payload) for (payload,) in self.conn.execute(SELECT_ALL)]
+
+    def get_block_by_height(self, height):
+        row = self.conn.execute(SELECT_BY_HEIGHT, (height,)).fetchone()
+        return decode_block(row[0]) if row else None
+
+    def get_block_by_hash(self, block_hash):
+        payload = self.get_block_payload(block_hash)
+        return None if payload is None else decode_block(payload)
+
+    def get_block_payload(self, block_hash):
+        row = self.conn.execute(SELECT_BY_HASH, (block_hash,)).fetchone()
+        return row[0] if row else None
+
+    def height_of(self, block_hash):
+        height = super().height_of(block_hash)
+        if height is None:
+            row = self.conn.execute(SELECT_PRUNED_HEIGHT, (block_hash,)).fetchone()
+            height = row[0] if row else None
+        return height
+
+    def iter_blocks(self, start=0, end=None):
+        end = self.tip['height'] + 1 if end is None else end
+        # The cursor streams rows; nothing is materialised beyond the current block
+        for (payload,) in self.conn.execute(SELECT_RANGE, (start, end)):
+            yield decode_block(payload)
+
+    def scan_blocks(self):
+        for (payload,) in self.conn.execute(SELECT_ALL):
+            yield view_block(payload)
+
+    def get_transaction(self, txid):
+        row = self.conn.execute(SELECT_TRANSACTION, (txid,)).fetchone()
+        return _transaction_row(row) if row else None
+
+    def get_address_history(self, pubkey, offset=0, limit=50):
+        rows = self.conn.execute(SELECT_ADDRESS_HISTORY, (pubkey, -1 if limit is None else limit, offset))
+        return [_transaction_row(row) for row in rows]
+
+    def get_balance(self, pubkey):
+        row = self.conn.execute(SELECT_BALANCE, (pubkey,)).fetchone()
+        return row[0] if row else 0
+
+    def get_tip(self):
+        return dict(self.tip)
+
+    def close(self):
+        self.conn.close()
@@ -1,29 +1,356 @@
 import json
 import os
+from abc import ABC, abstractmethod
 
-class Storage:
-    def __init__(self, storage_file='blockchain.json'):
+from ..config.config import (
+    STORAGE_BACKEND, STORAGE_FILE, SQLITE_FILE,
+    STORAGE_FSYNC_POLICY, STORAGE_FSYNC_INTERVAL, STORAGE_SEGMENT_SIZE, STATE_SNAPSHOT_INTERVAL
+)
+from .account_state import AccountState
+from .block_log import BlockLog, FSYNC_ALWAYS
+from .block_index import BlockIndex
+from .chain_tip import ChainTip
+from .serialization import encode_block, decode_block, view_block, block_header
+from .transactions import transaction_id
+from .tx_index import TransactionIndex
+from .snapshot import read_snapshot
+
+
+class StorageBackend(ABC):
+    """Interface shared by all block storage backends."""
+
+    @abstractmethod
+    def append_block(self, block):
+        """Assign the next height to `block`, persist it and return it."""
+
+    @abstractmethod
+    def _write_block(self, block):
+        """Persist a block whose height is already set."""
+
+    @abstractmethod
+    def get_blockchain(self):
+        """Return every block as a list (prefer `iter_blocks` on large chains)."""
+
+    @abstractmethod
+    def get_block_by_height(self, height):
+        """Return the block at `height`, or None."""
+
+    @abstractmethod
+    def get_block_by_hash(self, block_hash):
+        """Return the block whose quantum_proof is `block_hash`, or None."""
+
+    @abstractmethod
+    def iter_blocks(self, start=0, end=None):
+        """Yield blocks with start <= height < end in height order."""
+
+    @abstractmethod
+    def scan_blocks(self):
+        """Yield every block as a lazily decoded `BlockView`, oldest first."""
+
+    @abstractmethod
+    def get_transaction(self, txid):
+        """Return {'txid', 'block_height', 'position', 'transaction'}, or None."""
+
+    @abstractmethod
+    def get_address_history(self, pubkey, offset=0, limit=50):
+        """Return one page of transactions sent or received by `pubkey`, newest first."""
+
+    @abstractmethod
+    def get_balance(self, pubkey):
+        """Return the current balance of `pubkey` (0 if it never transacted)."""
+
+    @abstractmethod
+    def get_tip(self):
+        """Return the chain tip as {'height', 'hash', 'timestamp'}."""
+
+    @abstractmethod
+    def close(self):
+        """Flush and release any open files or connections."""
+
+    def get_last_block_hash(self):
+        return self.get_tip()['hash']
+
+    def height_of(self, block_hash):
+        """Return the height of the block whose quantum_proof is `block_hash`, or None."""
+        block = self.get_block_by_hash(block_hash)
+        return None if block is None else block['block_height']
+
+    def get_block_payload(self, block_hash):
+        """Return the stored encoding of the block whose quantum_proof is `block_hash`, or None."""
+        block = self.get_block_by_hash(block_hash)
+        return None if block is None else encode_block(block)
+
+    def iter_headers(self, start=0, end=None):
+        """Yield `block_header` dicts with start <= height < end in height order."""
+        for block in self.iter_blocks(start, end):
+            yield block_header(block)
+
+    def import_snapshot(self, snapshot_file):
+        """Bootstrap an empty store from a chain snapshot (see `snapshot.py`)."""
+        raise NotImplementedError(f"{type(self).__name__} cannot bootstrap from snapshots")
+
+    def import_legacy_file(self, legacy_file):
+        """
+        One-time import of a pretty-printed `blockchain.json` chain.
+
+        Blocks already stored are skipped, so rerunning an interrupted
+        import picks up after the last block it wrote.
+        """
+        with open(legacy_file, 'r') as f:
+            blockchain = json.load(f)
+        done = self.get_tip()['height'] + 1
+        if done:
+            stored = self.get_block_by_height(done - 1)
+            if (done > len(blockchain) or stored is None
+                    or stored['quantum_proof'] != blockchain[done - 1]['quantum_proof']):
+                raise ValueError(f"Stored chain is not a prefix of {legacy_file}")
+        for block in blockchain[done:]:
+            block['block_height'] = self.get_tip()['height'] + 1
+            self._write_block(block)
+        imported = len(blockchain) - done
+        if imported:
+            print(f"Imported {imported} blocks from {legacy_file}" + (f" (resumed at #{done})" if done else ""))
+        return imported
+
+
+def _transaction_entry(txid, height, position, transaction):
+    return {'txid': txid, 'block_height': height, 'position': position, 'transaction': transaction}
+
+
+class FileStorage(StorageBackend):
+    """
+    Block storage backed by an append-only segment log.
+
+    Blocks live in `<storage_file stem>.chain/` next to `storage_file`, with
+    height and hash indexes for random access, transaction and address
+    indexes, account balances, and a tip record that lets appends and
+    restarts skip historical data. If a legacy JSON chain exists
+    at `storage_file` and the log is still empty, it is imported once on
+    startup, and an interrupted import is finished on the next. A store bootstrapped from a snapshot keeps only hashes and
+    index entries for blocks at or below the snapshot height.
+    """
+
+    def __init__(self, storage_file=STORAGE_FILE, data_dir=None,
+                 fsync_policy=STORAGE_FSYNC_POLICY, fsync_interval=STORAGE_FSYNC_INTERVAL,
+                 segment_size=STORAGE_SEGMENT_SIZE, snapshot_interval=STATE_SNAPSHOT_INTERVAL):
         self.storage_file = storage_file
-        if not os.path.exists(self.storage_file):
-            with open(self.storage_file, 'w') as f:
-                json.dump([], f)
+        self.data_dir = data_dir or os.path.splitext(storage_file)[0] + '.chain'
+        os.makedirs(self.data_dir, exist_ok=True)
+        self.tip = ChainTip(self.data_dir, durable=fsync_policy == FSYNC_ALWAYS)
+        self.log = BlockLog(self.data_dir, fsync_policy=fsync_policy,
+                            fsync_interval=fsync_interval, segment_size=segment_size,
+                            resume_from=self.tip.resume_point)
+        self.index = BlockIndex(self.data_dir, self.tip.base_height)
+        self._catch_up_index()
+        if self.tip.count != self.log.count or self.tip.position != self.log.last_position:
+            self._reload_tip()
+        self.tx_index = TransactionIndex(self.data_dir)
+        self._catch_up_tx_index()
+        self.state = AccountState(self.data_dir, snapshot_interval)
+        self._catch_up_state()
+        if self.tip.importing or (self.tip.height == -1 and self.log.count == 0
+                                  and os.path.exists(self.storage_file)):
+            self.import_legacy_file(self.storage_file)
+
+    def _catch_up_index(self):
+        """Bring the derived indexes back in line with the log after a restart."""
+        if self.index.count > self.log.count:
+            self.index.truncate(self.log.count)
+        elif self.index.count < self.log.count:
+            start = None
+            if self.index.count:
+                start = self.log.record_end(*self.index.position(self.index.count - 1))
+            for segment_id, offset, payload in self.log.scan(start):
+                block = decode_block(payload)
+                self.index.add(self.index.next_height, block['quantum_proof'], (segment_id, offset))
+
+    def _catch_up_tx_index(self):
+        if self.tx_index.next_height > self.tip.height + 1:
+            self.tx_index.truncate(self.tip.height + 1)
+        for block in self.iter_blocks(self.tx_index.next_height):
+            self._index_transactions(block)
+
+    def _index_transactions(self, block):
+        transactions = block['transactions']
+        self.tx_index.add_block(block['block_height'], [transaction_id(tx) for tx in transactions], transactions)
+
+    def _catch_up_state(self):
+        """Load the nearest balance snapshot and replay only the blocks after it."""
+        self.state.load(self.tip.height)
+        for block in self.iter_blocks(self.state.height + 1):
+            self.state.apply_block(block)
+
+    def _reload_tip(self):
+        """Rebuild the tip record from the newest block when it is stale."""
+        if self.log.last_position is None:
+            self.tip.reset()
+        else:
+            block = decode_block(self.log.read(*self.log.last_position))
+            self.tip.update(block, self.log.count, self.log.last_position)
+
+    def _write_block(self, block):
+        position = self.log.append(encode_block(block))
+        self.index.add(block['block_height'], block['quantum_proof'], position)
+        self._index_transactions(block)
+        self.state.apply_block(block)
+        self.tip.update(block, self.log.count, position)
+
+    def import_legacy_file(self, legacy_file):
+        self.tip.mark_importing(True)
+        imported = super().import_legacy_file(legacy_file)
+        self.log.sync()
+        self.tip.mark_importing(False)
+        return imported
+
+    def import_snapshot(self, snapshot_file):
+        if self.tip.height != -1 or self.log.count:
+            raise ValueError("Snapshots can only be imported into an empty store")
+        snapshot = read_snapshot(snapshot_file)
+        # The tip is written last: until it names the base, a crash leaves a store
+        # that opens as empty, and whatever an earlier attempt left is cleared here
+        self.index.truncate(0)
+        self.index.close()
+        self.index = BlockIndex(self.data_dir, snapshot['height'] + 1)
+        self.tx_index.truncate(0)
+        for height, (block_hash, transactions) in enumerate(snapshot['blocks']):
+            self.index.add_pruned(height, block_hash)
+            self.tx_index.add_block(height, [txid for txid, _, _ in transactions],
+                                    [{'sender': sender, 'receiver': receiver} for _, sender, receiver in transactions])
+        self.index.sync()
+        self.tx_index.sync()
+        self.state.balances = snapshot['balances']
+        self.state.height = snapshot['height']
+        self.state.snapshot()
+        self.tip.set_base(snapshot['height'], snapshot['hash'], snapshot['timestamp'])
+        print(f"Bootstrapped from snapshot at height {snapshot['height']}")
+        return snapshot['height']
 
     def append_block(self, block):
-        blockchain = self.get_blockchain()
         # Set block height
-        block['block_height'] = len(blockchain)
-        blockchain.append(block)
-        with open(self.storage_file, 'w') as f:
-            json.dump(blockchain, f, indent=4)
+        block['block_height'] = self.tip.height + 1
+        self._write_block(block)
         print(f"Block #{block['block_height']} added to chain")
         return block
 
     def get_blockchain(self):
-        with open(self.storage_file, 'r') as f:
-            return json.load(f)
+        return [decode_block(payload) for payload in self.log]
+
+    def get_block_by_height(self, height):
+        position = self.index.position(height)
+        if position is None:
+            return None
+        return decode_block(self.log.read(*position))
+
+    def get_block_by_hash(self, block_hash):
+        payload = self.get_block_payload(block_hash)
+        return None if payload is None else decode_block(payload)
+
+    def get_block_payload(self, block_hash):
+        # Read straight from the log: serving a block to a peer needs no decode
+        height = self.index.height_of(block_hash)
+        position = None if height is None else self.index.position(height)
+        if position is None:
+            return None
+        payload = self.log.read(*position)
+        return payload if view_block(payload).quantum_proof == block_hash else None
+
+    def iter_blocks(self, start=0, end=None):
+        """Yield blocks with start <= height < end, streaming from the log."""
+        for payload in self._iter_payloads(start, end):
+            yield decode_block(payload)
+
+    def iter_headers(self, start=0, end=None):
+        # Only the header fields are read; transactions are never decoded
+        for payload in self._iter_payloads(start, end):
+            yield block_header(view_block(payload))
+
+    def _iter_payloads(self, start, end):
+        end = self.index.next_height if end is None else min(end, self.index.next_height)
+        start = max(start, self.index.base_height)
+        if start >= end:
+            return
+        remaining = end - start
+        for _, _, payload in self.log.scan(self.index.position(start)):
+            yield payload
+            remaining -= 1
+            if not remaining:
+                return
+
+    def height_of(self, block_hash):
+        height = self.index.height_of(block_hash)
+        if height is None or height < self.index.base_height:
+            return height
+        position = self.index.position(height)
+        if position is None or view_block(self.log.read(*position)).quantum_proof != block_hash:
+            return None
+        return height
+
+    def _transaction_at(self, height, position, _views=None):
+        """Decode one transaction, reusing block views already read in this call."""
+        views = {} if _views is None else _views
+        if height not in views:
+            block_position = self.index.position(height)
+            if block_position is None:
+                return None
+            views[height] = view_block(self.log.read(*block_position))
+        tx = views[height]['transactions'][position]
+        return tx if isinstance(tx, dict) else tx.to_dict()
+
+    def get_transaction(self, txid):
+        location = self.tx_index.locate(txid)
+        if location is None:
+            return None
+        if location[0] < self.index.base_height:
+            # Bootstrapped from a snapshot: the location is known, the body is not
+            return _transaction_entry(txid, location[0], location[1], None)
+        transaction = self._transaction_at(*location)
+        if transaction is None or transaction_id(transaction) != txid:
+            return None
+        return _transaction_entry(txid, location[0], location[1], transaction)
+
+    def get_address_history(self, pubkey, offset=0, limit=50):
+        history = []
+        views = {}
+        for height, position in self.tx_index.history(pubkey, offset, limit):
+            if height < self.index.base_height:
+                history.append(_transaction_entry(None, height, position, None))
+                continue
+            transaction = self._transaction_at(height, position, views)
+            if transaction is None or pubkey not in (transaction['sender'], transaction['receiver']):
+                continue
+            history.append(_transaction_entry(transaction_id(transaction), height, position, transaction))
+        return history
+
+    def get_balance(self, pubkey):
+        return self.state.get_balance(pubkey)
+
+    def scan_blocks(self, verify=True):
+        """Zero-copy full-chain scan over memory-mapped log segments."""
+        for payload in self.log.iter_mapped(verify):
+            yield view_block(payload)
+
+    def get_tip(self):
+        """Return the chain tip's height, hash and timestamp without any disk access."""
+        return self.tip.as_dict()
 
     def get_last_block_hash(self):
-        blockchain = self.get_blockchain()
-        if blockchain:
-            return blockchain[-1]['quantum_proof']
-        return "GENESIS_HASH"
+        return self.tip.hash
+
+    def close(self):
+        self.log.close()
+        self.index.close()
+        self.tx_index.close()
+
+
+# The segment log was the only backend before the interface was split out
+Storage = FileStorage
+
+
+def create_storage(backend=STORAGE_BACKEND, path=None, **options):
+    """Build the storage backend named by `backend` ('file' or 'sqlite')."""
+    if backend == 'file':
+        return FileStorage(path or STORAGE_FILE, **options)
+    if backend == 'sqlite':
+        from .sqlite_storage import SQLiteStorage
+        return SQLiteStorage(path or SQLITE_FILE, **options)
+    raise ValueError(f"Unknown storage backend: {backend}")
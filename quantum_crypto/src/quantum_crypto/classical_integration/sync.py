@@ -0,0 +1,272 @@
+"""
+Headers-first chain synchronization.
+
+A node first downloads the header chain: `getheaders` carries a locator
+(hashes from our best header back to genesis, exponentially sparser), and
+the peer answers with up to MAX_HEADERS_PER_MESSAGE headers after the
+first hash it recognises. Headers are checked as they arrive (they must
+link, count up by one, and hash to their quantum proof), which costs no
+block bodies, and a full answer immediately asks for the next batch.
+
+Block bodies are then fetched by hash from every peer whose headers reach
+that height, each peer holding at most MAX_BLOCKS_IN_FLIGHT requests, over
+a window of BLOCK_DOWNLOAD_WINDOW heights past our tip. Bodies that arrive
+early wait in the window and are applied to storage strictly in height
+order as soon as the gap before them fills. Requests outstanding past
+BLOCK_DOWNLOAD_TIMEOUT, or held by a peer that disconnects, go to another
+peer. With many requests always in flight the download is limited by
+bandwidth and validation rather than round trips.
+"""
+import time
+
+from ..config.config import (
+    MAX_HEADERS_PER_MESSAGE, BLOCK_DOWNLOAD_WINDOW, MAX_BLOCKS_IN_FLIGHT, BLOCK_DOWNLOAD_TIMEOUT
+)
+from ..quantum_currency.quantum_block import compute_block_proof
+from .address_book import UNKNOWN_RTT
+from .chain_tip import GENESIS_HASH
+from .peer_manager import PENALTY_INVALID
+from .protocol import (
+    ProtocolError, encode_getheaders, encode_headers, encode_inv, block_inv_id,
+    CMD_GETHEADERS, CMD_HEADERS, CMD_GETDATA, INV_BLOCK, MAX_LOCATOR_SIZE
+)
+
+TIMEOUT_CHECK_INTERVAL = 1.0  # seconds between scans for stalled block requests
+
+
+def locator_heights(height):
+    """Heights for a block locator: the newest ten, then doubling steps back to genesis."""
+    heights = []
+    step = 1
+    while height >= 0 and len(heights) < MAX_LOCATOR_SIZE - 2:
+        heights.append(height)
+        if len(heights) >= 10:
+            step *= 2
+        height -= step
+    if heights and heights[-1] != 0:
+        heights.append(0)
+    return heights
+
+
+class ChainSync:
+    """
+    Sync state for one `Network`. Every method runs on the network's event
+    loop thread.
+
+    The header chain is kept as a list of block hashes starting at the
+    storage tip it was built on. If the tip moves anywhere else (a locally
+    created block, say) the header chain starts again from the new tip.
+    """
+
+    def __init__(self, network):
+        self.network = network
+        self.storage = network.node.storage
+        self.peer_best = {}  # peer -> highest header height it has shown us
+        self.peer_requests = {}  # peer -> heights requested from it
+        self.stats = {'headers_received': 0, 'blocks_requested': 0, 'blocks_applied': 0,
+                      'timeouts': 0, 'received_from': {}}
+        self._timer = None
+        self._reset(self.storage.get_tip())
+
+    def _reset(self, tip):
+        self.base_height = tip['height']
+        self.chain = [tip['hash']]  # chain[i] is the hash at base_height + i
+        self.heights = {tip['hash']: tip['height']}
+        self.in_flight = {}  # height -> (peer, deadline)
+        self.downloaded = {}  # height -> (block, peer), waiting for the blocks before it
+        self.retry = {}  # height -> peer that failed to deliver it
+        self.next_height = tip['height'] + 1  # lowest height never requested
+        for heights in self.peer_requests.values():
+            heights.clear()
+
+    @property
+    def best_height(self):
+        return self.base_height + len(self.chain) - 1
+
+    def _check_tip(self):
+        tip = self.storage.get_tip()
+        if self.heights.get(tip['hash']) != tip['height']:
+            self._reset(tip)
+        return tip['height']
+
+    def _hash_at(self, height):
+        if height >= self.base_height:
+            return self.chain[height - self.base_height]
+        header = next(self.storage.iter_headers(height, height + 1), None)
+        return header['quantum_proof'] if header else None
+
+    def locator(self):
+        self._check_tip()
+        hashes = [self._hash_at(height) for height in locator_heights(self.best_height)]
+        return [block_hash for block_hash in hashes if block_hash] + [GENESIS_HASH]
+
+    def request_headers(self, peer, after=None):
+        """Ask `peer` for the headers after our best header (or after hash `after`)."""
+        locator = self.locator()
+        if after is not None:
+            locator = [after] + locator[:MAX_LOCATOR_SIZE - 1]
+        peer.send_message(CMD_GETHEADERS, encode_getheaders(locator))
+
+    def peer_connected(self, peer):
+        # Outbound peers are the ones we chose, so they are the ones we sync from
+        if peer.outbound:
+            self.request_headers(peer)
+
+    def peer_lost(self, peer):
+        self.peer_best.pop(peer, None)
+        for height in self.peer_requests.pop(peer, ()):
+            if self.in_flight.pop(height, (None,))[0] is peer:
+                self.retry[height] = peer
+        self._schedule()
+
+    def on_getheaders(self, peer, locator):
+        start = 0
+        for block_hash in locator:
+            if block_hash == GENESIS_HASH:
+                break
+            height = self.storage.height_of(block_hash)
+            if height is not None:
+                start = height + 1
+                break
+        headers = list(self.storage.iter_headers(start, start + MAX_HEADERS_PER_MESSAGE))
+        peer.send_message(CMD_HEADERS, encode_headers(headers))
+
+    def on_headers(self, peer, headers):
+        tip_height = self._check_tip()
+        self.stats['headers_received'] += len(headers)
+        best = self.peer_best.get(peer, -1)
+        connected = True
+        for header in headers:
+            block_hash = header['quantum_proof']
+            height = self.heights.get(block_hash)
+            if height is None and header['block_height'] <= tip_height:
+                height = header['block_height']  # already stored below our tip
+            elif height is None:
+                if header['previous_hash'] != self.chain[-1]:
+                    print(f"⏭️ Headers from {peer.address} do not extend our best header")
+                    connected = False
+                    break
+                if header['block_height'] != self.best_height + 1:
+                    raise ProtocolError(f"Header at height {header['block_height']} should be {self.best_height + 1}")
+                if compute_block_proof(header) != block_hash:
+                    raise ProtocolError(f"Header {block_hash[:24]} does not match its proof")
+                height = header['block_height']
+                self.chain.append(block_hash)
+                self.heights[block_hash] = height
+            best = max(best, height)
+        self.peer_best[peer] = best
+        if connected and len(headers) == MAX_HEADERS_PER_MESSAGE:
+            self.request_headers(peer, after=headers[-1]['quantum_proof'])
+        self._schedule()
+
+    def _pick_peer(self, height, loads, avoid=None):
+        candidates = [peer for peer, peer_best in self.peer_best.items()
+                      if peer_best >= height and not peer.closed and loads.get(peer, 0) < MAX_BLOCKS_IN_FLIGHT]
+        # A retried height goes back to the peer that failed it only if nobody else can serve it
+        preferred = [peer for peer in candidates if peer is not avoid] or candidates
+        # Among equally loaded peers the one with the fastest measured round trip wins
+        return min(preferred, key=lambda peer: (loads.get(peer, 0), peer.rtt if peer.rtt is not None else UNKNOWN_RTT),
+                   default=None)
+
+    def _schedule(self):
+        """Request every height in the window that is not downloading yet, least-loaded peer first."""
+        if not self.peer_best:
+            return
+        tip_height = self._check_tip()
+        limit = min(self.best_height, tip_height + BLOCK_DOWNLOAD_WINDOW)
+        loads = {peer: len(heights) for peer, heights in self.peer_requests.items()}
+        batches = {}
+
+        def assign(height, avoid=None):
+            peer = self._pick_peer(height, loads, avoid)
+            if peer is None:
+                return False
+            loads[peer] = loads.get(peer, 0) + 1
+            batches.setdefault(peer, []).append(height)
+            return True
+
+        for height in sorted(self.retry):
+            if height <= tip_height or height in self.downloaded:
+                del self.retry[height]
+            elif height <= limit and assign(height, self.retry[height]):
+                del self.retry[height]
+        self.next_height = max(self.next_height, tip_height + 1)
+        while self.next_height <= limit and assign(self.next_height):
+            self.next_height += 1
+
+        deadline = time.monotonic() + BLOCK_DOWNLOAD_TIMEOUT
+        for peer, heights in batches.items():
+            self.peer_requests.setdefault(peer, set()).update(heights)
+            for height in heights:
+                self.in_flight[height] = (peer, deadline)
+            peer.send_message(CMD_GETDATA, encode_inv(
+                [(INV_BLOCK, block_inv_id(self._hash_at(height))) for height in heights]))
+            self.stats['blocks_requested'] += len(heights)
+        if self.in_flight and self._timer is None:
+            self._timer = self.network.loop.call_later(TIMEOUT_CHECK_INTERVAL, self._check_timeouts)
+
+    def _check_timeouts(self):
+        with self.network.node.lock:
+            self._expire_requests()
+
+    def _expire_requests(self):
+        self._timer = None
+        now = time.monotonic()
+        for height, (peer, deadline) in list(self.in_flight.items()):
+            if deadline <= now:
+                del self.in_flight[height]
+                self.peer_requests.get(peer, set()).discard(height)
+                self.retry[height] = peer
+                self.stats['timeouts'] += 1
+        self._schedule()
+
+    def block_received(self, peer, block):
+        """
+        Take a block body that belongs to the header chain. Returns False for
+        blocks sync does not know about, which the caller handles itself.
+        """
+        height = self.heights.get(block['quantum_proof'])
+        if height is None:
+            return False
+        tip_height = self._check_tip()
+        if height <= tip_height or height in self.downloaded:
+            return True  # already have it
+        if height > tip_height + BLOCK_DOWNLOAD_WINDOW:
+            return True  # too far ahead to buffer; it will be requested in turn
+        owner = self.in_flight.pop(height, (None,))[0]
+        if owner is not None:
+            self.peer_requests.get(owner, set()).discard(height)
+        self.retry.pop(height, None)
+        self.downloaded[height] = (block, peer)
+        received_from = self.stats['received_from']
+        received_from[peer.address] = received_from.get(peer.address, 0) + 1
+        self._apply(tip_height)
+        self._schedule()
+        return True
+
+    def _apply(self, tip_height):
+        """Store downloaded blocks that extend the tip, in height order."""
+        applied = None
+        while tip_height + 1 in self.downloaded:
+            block, peer = self.downloaded.pop(tip_height + 1)
+            try:
+                stored = self.network.node.receive_block(block)
+            except ValueError as e:
+                print(f"⚠️ Disconnecting {peer.address}: {e}")
+                self.retry[tip_height + 1] = peer
+                self.network.peer_manager.penalize(peer, PENALTY_INVALID, str(e))
+                peer.close()
+                break
+            if stored is None:
+                break  # the tip moved underneath us; the next _check_tip starts over
+            tip_height += 1
+            self.stats['blocks_applied'] += 1
+            applied = (stored, peer)
+        if applied is not None and tip_height == self.best_height:
+            # Announce only once caught up, not every block of a long download
+            self.network._announce_block(*applied)
+
+    def progress(self):
+        """Storage tip height, best header height and block requests outstanding."""
+        return {'height': self.storage.get_tip()['height'], 'best_header': self.best_height,
+                'in_flight': len(self.in_flight), 'downloaded': len(self.downloaded)}
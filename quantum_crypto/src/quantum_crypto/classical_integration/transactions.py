@@ -1,14 +1,109 @@
 import hashlib
+import numpy as np
+from .serialization import encode_transaction, decode_transaction, AMOUNT_INT, AMOUNT_FLOAT
 
 class Transaction:
-    def __init__(self, sender_pubkey, receiver_pubkey, amount, signature):
-        self.sender = sender_pubkey
-        self.receiver = receiver_pubkey
-        self.amount = amount
-        self.signature = signature
-        self.txid = None  # Will be generated by quantum_hash
-
-def create_transaction(sender, receiver, amount, signature):
+    """
+    Immutable transaction. Its canonical bytes and txid are computed on
+    first use and cached, so a transaction is serialized at most once no
+    matter how often it is hashed, relayed or stored. Supports read-only
+    dict-style access (`tx['amount']`) for code written against dicts.
+    """
+    __slots__ = ('sender', 'receiver', 'amount', 'signature', 'fee', '_serialized', '_txid')
+    FIELDS = ('sender', 'receiver', 'amount', 'signature', 'fee')
+
+    def __init__(self, sender_pubkey, receiver_pubkey, amount, signature, fee=0, _serialized=None):
+        setattr_ = object.__setattr__
+        setattr_(self, 'sender', sender_pubkey)
+        setattr_(self, 'receiver', receiver_pubkey)
+        setattr_(self, 'amount', amount)
+        setattr_(self, 'signature', signature)
+        setattr_(self, 'fee', fee)
+        setattr_(self, '_serialized', _serialized)
+        setattr_(self, '_txid', None)
+
+    @classmethod
+    def from_dict(cls, transaction):
+        if isinstance(transaction, cls):
+            return transaction
+        return cls(transaction['sender'], transaction['receiver'], transaction['amount'],
+                   transaction.get('signature', ''), transaction.get('fee', 0))
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Decode canonical bytes, keeping them as the cached serialization."""
+        data = bytes(data)
+        fields = decode_transaction(data)
+        return cls(fields['sender'], fields['receiver'], fields['amount'], fields['signature'],
+                   fields.get('fee', 0), data)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Transaction is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Transaction is immutable")
+
+    @property
+    def serialized(self):
+        if self._serialized is None:
+            object.__setattr__(self, '_serialized', encode_transaction(self))
+        return self._serialized
+
+    @property
+    def digest(self):
+        """Raw 32-byte txid; cached instead of the hex form to keep instances small."""
+        if self._txid is None:
+            object.__setattr__(self, '_txid', hashlib.sha256(self.serialized).digest())
+        return self._txid
+
+    @property
+    def txid(self):
+        return self.digest.hex()
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def keys(self):
+        return self.FIELDS
+
+    def to_dict(self):
+        # Matches decode_transaction: 'fee' only appears when there is one
+        transaction = {'sender': self.sender, 'receiver': self.receiver,
+                       'amount': self.amount, 'signature': self.signature}
+        if self.fee:
+            transaction['fee'] = self.fee
+        return transaction
+
+    def __eq__(self, other):
+        if not isinstance(other, Transaction):
+            return NotImplemented
+        return self.serialized == other.serialized
+
+    def __hash__(self):
+        return hash(self.digest)
+
+    def __repr__(self):
+        return f"Transaction({self.sender!r} -> {self.receiver!r}, {self.amount!r})"
+
+def create_transaction(sender, receiver, amount, signature, fee=0):
+    _check_fields(sender, receiver, amount, signature, fee)
+    return Transaction(sender, receiver, amount, signature, fee)
+
+def validate_transaction(transaction):
+    """Apply `create_transaction`'s checks to a transaction from elsewhere (e.g. a peer); raises ValueError."""
+    _check_fields(transaction['sender'], transaction['receiver'], transaction['amount'],
+                  transaction.get('signature', ''), transaction.get('fee', 0))
+    return transaction
+
+def _check_fields(sender, receiver, amount, signature, fee):
     # Input validation
     if not sender or not isinstance(sender, str):
         raise ValueError("Sender must be a non-empty string")
@@ -18,13 +113,183 @@ def create_transaction(sender, receiver, amount, signature):
         raise ValueError("Transaction amount must be a positive number")
     if not signature or not isinstance(signature, str):
         raise ValueError("Transaction must have a valid signature string")
-        
-    return {
-        'sender': sender,
-        'receiver': receiver,
-        'amount': amount,
-        'signature': signature
-    }
+    if not isinstance(fee, (int, float)) or fee < 0:
+        raise ValueError("Transaction fee must be a non-negative number")
 
 def serialize(transaction):
-    return f"{transaction['sender']}{transaction['receiver']}{transaction['amount']}{transaction['signature']}"
+    """Canonical bytes of a transaction (see `serialization.py`)."""
+    if isinstance(transaction, Transaction):
+        return transaction.serialized
+    return encode_transaction(transaction)
+
+def transaction_id(transaction):
+    """Hex sha256 of the transaction's canonical encoding."""
+    if isinstance(transaction, Transaction):
+        return transaction.txid
+    return hashlib.sha256(serialize(transaction)).hexdigest()
+
+AMOUNT_INVALID = 0xFF  # amount tag for values that are not int or float
+
+
+class TransactionBatch:
+    """
+    Columnar batch of transactions for bulk ingestion and analytics.
+
+    Parties are interned into `parties` and referenced by id; amounts and
+    fees keep their canonical int/float distinction as 64-bit words tagged like the
+    binary encoding; signatures live in one UTF-8 blob sliced by
+    `signature_offsets`. Validation runs as whole-array operations instead
+    of one `create_transaction` call per row.
+    """
+
+    def __init__(self, parties, sender_ids, receiver_ids, amount_tags, amount_bits,
+                 fee_tags, fee_bits, signature_data, signature_offsets):
+        self.parties = parties
+        self.sender_ids = sender_ids
+        self.receiver_ids = receiver_ids
+        self.amount_tags = amount_tags
+        self.amount_bits = amount_bits
+        self.fee_tags = fee_tags
+        self.fee_bits = fee_bits
+        self.signature_data = signature_data
+        self.signature_offsets = signature_offsets
+        # A party is usable only if it is a non-empty string
+        self._party_valid = np.array([bool(party) and isinstance(party, str) for party in parties], dtype=bool)
+
+    @classmethod
+    def from_columns(cls, senders, receivers, amounts, signatures, fees=None):
+        """Build a batch from parallel sequences (e.g. columns of an import file)."""
+        if fees is None:
+            fees = np.zeros(len(amounts), dtype=np.int64)
+        if not len(senders) == len(receivers) == len(amounts) == len(signatures) == len(fees):
+            raise ValueError("Transaction batch columns must have the same length")
+        table = {}
+        sender_ids = np.fromiter((table.setdefault(party, len(table)) for party in senders),
+                                 dtype=np.int32, count=len(senders))
+        receiver_ids = np.fromiter((table.setdefault(party, len(table)) for party in receivers),
+                                   dtype=np.int32, count=len(receivers))
+        amount_tags, amount_bits = _amount_columns(amounts)
+        fee_tags, fee_bits = _amount_columns(fees)
+        encoded = [signature.encode() if isinstance(signature, str) else b'' for signature in signatures]
+        signature_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(signature) for signature in encoded], out=signature_offsets[1:])
+        return cls(list(table), sender_ids, receiver_ids, amount_tags, amount_bits,
+                   fee_tags, fee_bits, b''.join(encoded), signature_offsets)
+
+    @classmethod
+    def from_transactions(cls, transactions):
+        transactions = list(transactions)
+        return cls.from_columns(
+            [tx['sender'] for tx in transactions],
+            [tx['receiver'] for tx in transactions],
+            [tx['amount'] for tx in transactions],
+            [tx.get('signature', '') for tx in transactions],
+            [tx.get('fee', 0) for tx in transactions]
+        )
+
+    def __len__(self):
+        return len(self.sender_ids)
+
+    @property
+    def amounts(self):
+        """Amounts as float64 for analytics (the exact values stay in `amount_bits`)."""
+        return _as_float(self.amount_tags, self.amount_bits)
+
+    @property
+    def fees(self):
+        return _as_float(self.fee_tags, self.fee_bits)
+
+    def valid_mask(self):
+        """Boolean array marking rows that pass `create_transaction`'s checks."""
+        return (self._party_valid[self.sender_ids] & self._party_valid[self.receiver_ids]
+                & _finite_where(self.amount_tags, self.amount_bits, np.greater)
+                & _finite_where(self.fee_tags, self.fee_bits, np.greater_equal)
+                & (np.diff(self.signature_offsets) > 0))
+
+    def validate(self):
+        """Raise ValueError describing the first invalid row, like `create_transaction`."""
+        mask = self.valid_mask()
+        if mask.all():
+            return
+        row = int(np.argmin(mask))
+        try:
+            create_transaction(*self._fields(row))
+        except ValueError as e:
+            raise ValueError(f"Transaction {row}: {e}")
+        raise ValueError(f"Transaction {row}: Transaction amount and fee must be finite")
+
+    def select(self, mask):
+        """Return a new batch holding only the rows where `mask` is true."""
+        rows = np.flatnonzero(mask)
+        lengths = np.diff(self.signature_offsets)[rows]
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        data = b''.join(self.signature_data[self.signature_offsets[row]:self.signature_offsets[row + 1]]
+                        for row in rows)
+        return TransactionBatch(self.parties, self.sender_ids[rows], self.receiver_ids[rows],
+                                self.amount_tags[rows], self.amount_bits[rows],
+                                self.fee_tags[rows], self.fee_bits[rows], data, offsets)
+
+    def _fields(self, row):
+        signature = self.signature_data[self.signature_offsets[row]:self.signature_offsets[row + 1]].decode()
+        return (self.parties[self.sender_ids[row]], self.parties[self.receiver_ids[row]],
+                _value_at(self.amount_tags, self.amount_bits, row), signature,
+                _value_at(self.fee_tags, self.fee_bits, row))
+
+    def __getitem__(self, row):
+        if not -len(self) <= row < len(self):
+            raise IndexError(row)
+        return Transaction(*self._fields(row % len(self)))
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield Transaction(*self._fields(row))
+
+
+def _as_float(tags, bits):
+    values = bits.view(np.float64).copy()
+    is_int = tags == AMOUNT_INT
+    values[is_int] = bits[is_int]
+    return values
+
+
+def _finite_where(tags, bits, compare):
+    """Rows whose value is a finite number satisfying `compare(value, 0)`."""
+    floats = bits.view(np.float64)
+    with np.errstate(invalid='ignore'):
+        return np.where(tags == AMOUNT_INT, compare(bits, 0),
+                        (tags == AMOUNT_FLOAT) & compare(floats, 0) & np.isfinite(floats))
+
+
+def _value_at(tags, bits, row):
+    if tags[row] == AMOUNT_INT:
+        return int(bits[row])
+    if tags[row] == AMOUNT_FLOAT:
+        return float(bits[row:row + 1].view(np.float64)[0])
+    return None
+
+
+def _amount_columns(amounts):
+    """Return (tags, 64-bit words) for a column of amounts."""
+    if isinstance(amounts, np.ndarray) and amounts.dtype.kind in 'iuf':
+        if amounts.dtype.kind == 'f':
+            bits = amounts.astype(np.float64).view(np.int64)
+            return np.full(len(amounts), AMOUNT_FLOAT, dtype=np.uint8), bits
+        return np.full(len(amounts), AMOUNT_INT, dtype=np.uint8), amounts.astype(np.int64)
+    tags = np.empty(len(amounts), dtype=np.uint8)
+    bits = np.zeros(len(amounts), dtype=np.int64)
+    words = bits.view(np.float64)
+    for row, amount in enumerate(amounts):
+        if not isinstance(amount, (int, float)):
+            tags[row] = AMOUNT_INVALID
+        elif isinstance(amount, int):
+            if -2 ** 63 <= amount < 2 ** 63:
+                tags[row] = AMOUNT_INT
+                bits[row] = amount
+            else:
+                tags[row] = AMOUNT_INVALID
+        else:
+            tags[row] = AMOUNT_FLOAT
+            words[row] = amount
+    return tags, bits
+
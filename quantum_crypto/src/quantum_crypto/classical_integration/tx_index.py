@@ -0,0 +1,90 @@
+import hashlib
+import os
+import struct
+
+from .sorted_index import SortedIndex
+
+# key, height, position. A txids.idx entry with position BLOCK_DONE marks the
+# end of a block, so a crash mid-block is detected and rolled back on open.
+ENTRY = struct.Struct('>QQI')
+BLOCK_DONE = 0xFFFFFFFF
+
+
+def index_key(value):
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+
+def _is_block_done(entry):
+    return entry[2] == BLOCK_DONE
+
+
+class TransactionIndex:
+    """
+    Persistent txid -> (height, position) and pubkey -> [(height, position)]
+    indexes. Keys are 64-bit digests, so callers confirm each hit against
+    the stored transaction. Both are `SortedIndex` files, so opening reads
+    only the entries not yet sorted into runs.
+    """
+
+    def __init__(self, directory):
+        self.txid_path = os.path.join(directory, 'txids.idx')
+        self.address_path = os.path.join(directory, 'addresses.idx')
+        self._txids = SortedIndex(self.txid_path, ENTRY, skip=_is_block_done)
+        self._addresses = SortedIndex(self.address_path, ENTRY)
+        self.next_height = 0
+        self._load()
+
+    def _load(self):
+        # Runs end on a block boundary, so the last covered entry is a BLOCK_DONE
+        for _, height, position in self._txids.entries(max(self._txids.covered - 1, 0)):
+            if position == BLOCK_DONE:
+                self.next_height = height + 1
+        self._txids.truncate(self.next_height)
+        self._addresses.truncate(self.next_height)
+
+    def add_block(self, height, txids, transactions):
+        """Index one block's transactions; blocks must arrive in height order."""
+        if height != self.next_height:
+            raise ValueError(f"Transaction index expected height {self.next_height}, got {height}")
+        txid_entries = []
+        address_entries = []
+        for position, (txid, tx) in enumerate(zip(txids, transactions)):
+            txid_entries.append((index_key(txid), height, position))
+            for pubkey in {tx['sender'], tx['receiver']}:
+                address_entries.append((index_key(pubkey), height, position))
+        txid_entries.append((0, height, BLOCK_DONE))
+        self._addresses.append(address_entries)
+        self._txids.append(txid_entries)
+        self.next_height = height + 1
+        self._addresses.compact()
+        self._txids.compact()
+
+    def locate(self, txid):
+        """Return the candidate (height, position) of `txid`, or None."""
+        entry = self._txids.last(index_key(txid))
+        return None if entry is None else entry[1:]
+
+    def history(self, pubkey, offset=0, limit=None):
+        """Return candidate (height, position) pairs touching `pubkey`, newest first."""
+        key = index_key(pubkey)
+        end = self._addresses.count_of(key) - offset
+        start = 0 if limit is None else max(end - limit, 0)
+        return [(height, position) for _, height, position in reversed(self._addresses.find(key, start, max(end, 0)))]
+
+    def history_size(self, pubkey):
+        return self._addresses.count_of(index_key(pubkey))
+
+    def truncate(self, height):
+        """Forget every block at or above `height` (the chain lost its tail)."""
+        self._txids.truncate(height)
+        self._addresses.truncate(height)
+        self.next_height = min(self.next_height, height)
+
+    def sync(self):
+        """fsync both files, for callers that cannot rebuild them from the log."""
+        self._txids.sync()
+        self._addresses.sync()
+
+    def close(self):
+        self._txids.close()
+        self._addresses.close()
@@ -6,7 +6,63 @@ ERROR_CORRECTION_ENABLED = True
 # Network configuration
 DEFAULT_PORT = 8333
 DEFAULT_HOST = '0.0.0.0'
+LISTEN_BACKLOG = 1024  # pending inbound connections queued by the kernel
+CONNECT_TIMEOUT = 10.0  # seconds to wait for an outbound connection
+READ_CHUNK_SIZE = 64 * 1024  # bytes requested per socket read
+NETWORK_MAGIC = b'QCM1'  # first bytes of every wire message; differs per network
+MAX_MESSAGE_SIZE = 32 * 1024 * 1024  # largest accepted message payload
+RELAY_SEEN_CAPACITY = 100000  # transactions and blocks remembered to suppress re-relay
+PEER_KNOWN_CAPACITY = 10000  # inventory remembered per peer to avoid echoing it back
+GETDATA_TIMEOUT = 30.0  # seconds before an unanswered getdata may go to another peer
+GETDATA_ALTERNATES = 8  # further announcers remembered per requested object, asked in turn on timeouts
+BLOCKTXN_TIMEOUT = 5.0  # seconds to wait for a blocktxn before fetching the full block instead
+SEND_QUEUE_POLICY = 'drop'  # on a full peer send queue: 'drop' the message or 'disconnect' the peer
+SEND_QUEUE_MAX_MESSAGES = 10000  # messages queued per peer while its socket is backed up
+SEND_QUEUE_MAX_BYTES = 16 * 1024 * 1024  # bytes queued per peer while its socket is backed up
+WRITE_BUFFER_HIGH_WATER = 1024 * 1024  # transport bytes in flight before a peer stops draining its queue
+INV_BATCH_SIZE = 500  # transaction announcements per inv before it is sent without waiting
+INV_FLUSH_INTERVAL = 0.05  # seconds a partial inv batch waits for more announcements
+COMPRESSION_CODECS = ('zstd', 'zlib')  # offered and preferred in this order; () turns compression off
+COMPRESSION_THRESHOLD = 1024  # block and sync payloads smaller than this are sent raw
+PEER_ADDRESS_FILE = 'peers.json'  # known peer addresses, kept across restarts
+TARGET_OUTBOUND_PEERS = 8  # outbound connections the peer manager keeps open
+PEER_MAINTENANCE_INTERVAL = 5.0  # seconds between peer manager rounds (dialling, pinging)
+PING_INTERVAL = 30.0  # seconds between pings measuring each peer's round-trip time
+RECONNECT_BACKOFF_BASE = 1.0  # seconds before retrying an address after its first failure
+RECONNECT_BACKOFF_MAX = 600.0  # cap on the doubling retry delay
+MISBEHAVIOR_BAN_SCORE = 100  # penalty points that get a host banned
+BAN_DURATION = 24 * 60 * 60  # seconds a banned host stays banned
+RATE_LIMIT_POLICY = 'throttle'  # over-budget peer: 'throttle' (pause reading it) or 'disconnect'
+RATE_LIMIT_MAX_DELAY = 10.0  # a throttled peer this many seconds in debt is disconnected anyway
+MESSAGE_RATE_LIMITS = {  # command: (messages per second, burst) accepted from one peer
+    'tx': (2000, 10000), 'inv': (200, 1000), 'getdata': (500, 2000),
+    'block': (200, 1000), 'cmpctblock': (20, 100), 'getblocktxn': (20, 100), 'blocktxn': (20, 100),
+    'headers': (50, 200), 'getheaders': (20, 100), 'ping': (5, 20), 'pong': (5, 20), 'version': (1, 2),
+}
+DEFAULT_MESSAGE_RATE_LIMIT = (10, 50)  # for commands not listed above
+PEER_BYTE_RATE = 32 * 1024 * 1024  # sustained bytes per second accepted from one peer
+PEER_BYTE_BURST = 64 * 1024 * 1024
+PEER_CPU_SHARE = 0.5  # seconds of handler time per second one peer may use
+PEER_CPU_BURST = 2.0
+MAX_HEADERS_PER_MESSAGE = 2000  # headers sent in answer to one getheaders
+BLOCK_DOWNLOAD_WINDOW = 1024  # blocks past our tip that may be downloading or waiting to be applied
+MAX_BLOCKS_IN_FLIGHT = 16  # block requests outstanding per peer during sync
+BLOCK_DOWNLOAD_TIMEOUT = 20.0  # seconds before a requested block is asked of another peer
 
 # Blockchain configuration
 BLOCK_SIZE = 1000  # transactions per block
 DIFFICULTY = 4  # number of leading zeros required in proof
+
+# Storage configuration
+STORAGE_BACKEND = 'file'  # 'file' (segment log) or 'sqlite'
+STORAGE_FILE = 'blockchain.json'  # file backend; its log lives in blockchain.chain/
+SQLITE_FILE = 'blockchain.db'
+STORAGE_FSYNC_POLICY = 'always'  # 'always', 'interval' or 'never'
+STORAGE_FSYNC_INTERVAL = 1.0  # seconds between fsyncs with the 'interval' policy
+STORAGE_SEGMENT_SIZE = 64 * 1024 * 1024  # bytes per block log segment
+STATE_SNAPSHOT_INTERVAL = 1000  # blocks between account balance snapshots
+
+# Mempool configuration
+MEMPOOL_POLICY = 'fee'  # 'fee' (highest fee per byte first) or 'arrival' (FIFO)
+MEMPOOL_MAX_COUNT = 300000  # pending transactions kept before evicting
+MEMPOOL_MAX_BYTES = 300 * 1024 * 1024  # estimated memory cap for pending transactions
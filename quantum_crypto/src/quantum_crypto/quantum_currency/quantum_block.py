@@ -1,14 +1,34 @@
 from .quantum_hash import quantum_hash
 from .quantum_merkle_tree import build_quantum_merkle_tree, generate_quantum_proof
+from ..classical_integration.serialization import encode_block_header
+from ..classical_integration.transactions import transaction_id
+import hashlib
 import time
 
-def create_quantum_block(transactions, previous_hash):
-    # Create block with actual transaction data
+def compute_block_proof(block):
+    # Commit to the canonical header, which covers the transactions through merkle_root
+    return generate_quantum_proof(hashlib.sha256(encode_block_header(block)).hexdigest())
+
+def assemble_quantum_block(transactions, merkle_root, previous_hash):
+    """Build and prove a block whose merkle root is already known."""
     block = {
         'transactions': transactions,
-        'quantum_proof': f"QPROOF_{abs(hash(str(transactions)))}", # Simple hash for now
+        'merkle_root': merkle_root,
         'timestamp': time.time(),
         'previous_hash': previous_hash,
         'block_height': 0  # Will be set by storage
     }
+    block['quantum_proof'] = compute_block_proof(block)
     return block
+
+def create_quantum_block(transactions, previous_hash):
+    # Create block with actual transaction data
+    txids = [transaction_id(tx) for tx in transactions]
+    return assemble_quantum_block(transactions, build_quantum_merkle_tree(txids), previous_hash)
+
+def verify_block_commitments(block):
+    # A received block must hash to its merkle root and quantum proof
+    txids = [transaction_id(tx) for tx in block['transactions']]
+    if block.get('merkle_root', '') != build_quantum_merkle_tree(txids):
+        return False
+    return block['quantum_proof'] == compute_block_proof(block)
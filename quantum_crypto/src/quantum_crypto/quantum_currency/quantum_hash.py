@@ -1,6 +1,10 @@
+from functools import lru_cache
 import numpy as np
 from quantum_crypto.config.config import WILLOW_QUBITS, WILLOW_COHERENCE_TIME, ERROR_CORRECTION_ENABLED
 
+H_MATRIX = np.array([[1, 1], [1, -1]]) / np.sqrt(2)
+P_MATRIX = np.array([[1, 0], [0, 1j]])
+
 def quantum_hash(data: bytes, qubits: int = WILLOW_QUBITS) -> bytes:
     """
     Generate a quantum-resistant hash using quantum superposition.
@@ -20,7 +24,7 @@ def quantum_hash(data: bytes, qubits: int = WILLOW_QUBITS) -> bytes:
     quantum_state[0] = 1  # Initialize to |0⟩
     
     # Apply quantum operations based on input data
-    for byte in data_array:
+    for byte in data_array.tolist():
         # Simulate quantum gates
         quantum_state = _apply_quantum_gates(quantum_state, byte, qubits)
         
@@ -40,56 +44,68 @@ def _apply_quantum_gates(state: np.ndarray, byte: int, qubits: int) -> np.ndarra
     # Hadamard gates
     for i in range(qubits):
         if byte & (1 << i):
-            state = _hadamard_transform(state)
+            state = _hadamard_transform(state, i)
             
     # Phase gates
     for i in range(qubits):
         if byte & (1 << i):
-            state = _phase_transform(state)
+            state = _phase_transform(state, i)
             
-    # CNOT gates
-    for i in range(qubits - 1):
-        if byte & (1 << i):
-            state = _cnot_transform(state, i, i + 1)
+    # CNOT gates: the chain selected by the byte is one precomputed permutation
+    chain = byte & ((1 << max(qubits - 1, 0)) - 1)
+    if chain:
+        state = state[_cnot_chain(len(state), chain)]
             
     return state
 
-def _hadamard_transform(state: np.ndarray) -> np.ndarray:
+def _single_qubit_transform(matrix: np.ndarray, state: np.ndarray, qubit: int) -> np.ndarray:
+    """Apply a 2x2 gate to one qubit by viewing the state as (high bits, qubit, low bits)."""
+    pairs = state.reshape(len(state) >> (qubit + 1), 2, 1 << qubit)
+    return np.matmul(matrix, pairs).reshape(len(state))
+
+def _hadamard_transform(state: np.ndarray, qubit: int = 0) -> np.ndarray:
     """Apply Hadamard transform."""
-    h_matrix = np.array([[1, 1], [1, -1]]) / np.sqrt(2)
-    return np.dot(h_matrix, state)
+    return _single_qubit_transform(H_MATRIX, state, qubit)
 
-def _phase_transform(state: np.ndarray) -> np.ndarray:
+def _phase_transform(state: np.ndarray, qubit: int = 0) -> np.ndarray:
     """Apply phase transform."""
-    p_matrix = np.array([[1, 0], [0, 1j]])
-    return np.dot(p_matrix, state)
+    return _single_qubit_transform(P_MATRIX, state, qubit)
+
+@lru_cache(maxsize=None)
+def _cnot_indexes(size: int, control: int, target: int) -> np.ndarray:
+    """Source index of each amplitude after a CNOT (the permutation is its own inverse)."""
+    indexes = np.arange(size)
+    return indexes ^ (((indexes >> control) & 1) << target)
+
+@lru_cache(maxsize=None)
+def _cnot_chain(size: int, chain: int) -> np.ndarray:
+    """Source indexes after CNOT(i, i + 1) for every bit i set in `chain`, in increasing i."""
+    indexes = np.arange(size)
+    i = 0
+    while chain >> i:
+        if chain & (1 << i):
+            indexes = indexes[_cnot_indexes(size, i, i + 1)]
+        i += 1
+    return indexes
 
 def _cnot_transform(state: np.ndarray, control: int, target: int) -> np.ndarray:
     """Apply CNOT transform."""
-    size = len(state)
-    new_state = np.zeros_like(state)
-    
-    for i in range(size):
-        if i & (1 << control):
-            new_state[i ^ (1 << target)] = state[i]
-        else:
-            new_state[i] = state[i]
-            
-    return new_state
+    return state[_cnot_indexes(len(state), control, target)]
+
+@lru_cache(maxsize=None)
+def _even_parity_mask(size: int) -> np.ndarray:
+    """True at basis states with an even number of 1 bits."""
+    parity = np.zeros(size, dtype=np.uint8)
+    bit = 1
+    while bit < size:
+        parity ^= ((np.arange(size) & bit) != 0).astype(np.uint8)
+        bit <<= 1
+    return parity == 0
 
 def _apply_error_correction(state: np.ndarray) -> np.ndarray:
     """Apply quantum error correction."""
-    # Implement 3-qubit bit flip code
-    size = len(state)
-    corrected_state = np.zeros_like(state)
-    
-    for i in range(size):
-        # Count number of 1s in binary representation
-        ones = bin(i).count('1')
-        if ones % 2 == 0:  # Even parity
-            corrected_state[i] = state[i]
-            
-    return corrected_state
+    # Implement 3-qubit bit flip code: keep only even-parity amplitudes
+    return np.where(_even_parity_mask(len(state)), state, 0)
 
 def _simulate_decoherence(state: np.ndarray, coherence_time: float) -> np.ndarray:
     """Simulate quantum decoherence."""
@@ -98,8 +114,14 @@ def _simulate_decoherence(state: np.ndarray, coherence_time: float) -> np.ndarra
 
 def _measure_quantum_state(state: np.ndarray) -> np.ndarray:
     """Perform quantum measurement."""
-    probabilities = np.abs(state) ** 2
-    probabilities /= np.sum(probabilities)  # Normalize
+    magnitudes = np.abs(state)
+    peak = magnitudes.max()
+    if peak == 0:
+        # Decoherence on long inputs underflows every amplitude: fully mixed state
+        probabilities = np.full(len(state), 1 / len(state))
+    else:
+        probabilities = (magnitudes / peak) ** 2  # scale first so squaring cannot underflow
+        probabilities /= np.sum(probabilities)  # Normalize
     
     # Collapse to classical state
     measured_state = np.zeros_like(state, dtype=np.uint8)
@@ -1,13 +1,46 @@
+import hashlib
+
+def _combine(left_root, right_root):
+    # Hash the concatenated child roots (sha256, so roots agree across nodes)
+    return "QMERKLE_" + hashlib.sha256((left_root + right_root).encode()).hexdigest()
+
+class MerkleAccumulator:
+    """
+    Running merkle root over txids appended one at a time.
+
+    The tree splits like RFC 6962 (the left subtree holds the largest power
+    of two leaves), so appending only merges the perfect subtrees ("peaks")
+    on the right edge: O(1) amortized per txid and O(log n) for the root.
+    """
+    __slots__ = ('_peaks', 'count')
+
+    def __init__(self):
+        self._peaks = []  # (leaf count, root) with strictly decreasing leaf counts
+        self.count = 0
+
+    def append(self, txid):
+        size, root = 1, txid
+        while self._peaks and self._peaks[-1][0] == size:
+            _, left_root = self._peaks.pop()
+            root = _combine(left_root, root)
+            size *= 2
+        self._peaks.append((size, root))
+        self.count += 1
+
+    def root(self):
+        if not self._peaks:
+            return ''
+        root = self._peaks[-1][1]
+        for _, left_root in reversed(self._peaks[:-1]):
+            root = _combine(left_root, root)
+        return root
+
 def build_quantum_merkle_tree(txids):
     # Construct a conceptual quantum merkle tree
-    # Combine states pairwise
-    if len(txids) == 1:
-        return txids[0]
-    # For simplicity, just hash pairs concatenation
-    mid = len(txids) // 2
-    left_root = build_quantum_merkle_tree(txids[:mid])
-    right_root = build_quantum_merkle_tree(txids[mid:])
-    return "QMERKLE_" + str(abs(hash(left_root + right_root)) % (10**16))
+    accumulator = MerkleAccumulator()
+    for txid in txids:
+        accumulator.append(txid)
+    return accumulator.root()
 
 def generate_quantum_proof(merkle_root):
     # Placeholder for a quantum proof state